@@ -0,0 +1,139 @@
+import heapq
+import os
+import pickle
+import tempfile
+
+
+def _fusionMoyenne(a, b):
+    return (a[0] + b[0], a[1] + b[1])
+
+
+def _fusionMax(a, b):
+    return (max(a[0], b[0]), a[1] + b[1])
+
+
+class Agregateur:
+    """
+    Agrège en flux les scores (ressourceS, ressourceC, prop, score) par couple de ressources.
+    Les ressources sont internées en entiers ; chaque couple garde une somme courante (somme, poids).
+    Modes : "moyenne", "max", "pondere" (poids par propriété).
+    Au-delà de budget couples en mémoire, la table est déversée triée sur disque puis fusionnée à la fin.
+    manquants(ressourceS, ressourceC) donne, par propriété, le nombre de couples de valeurs comparés mais
+    absents du flux (comparaisons en lot qui ne génèrent que les scores non nuls) : ils comptent pour 0.
+    """
+
+    def __init__(self, mode="moyenne", poids=None, budget=None, dossier=None, manquants=None):
+        if mode not in ("moyenne", "max", "pondere"):
+            raise ValueError("Mode d'agrégation inconnu : " + str(mode))
+        self.mode = mode
+        self.poids = poids if poids is not None else {}
+        self.budget = budget
+        self.dossier = dossier
+        self.manquants = manquants
+        self.fusion = _fusionMax if mode == "max" else _fusionMoyenne
+        self.ids = {}
+        self.ressources = []
+        self.table = {}
+        self.fichiers = []
+
+    def intern(self, ressource):
+        # Les identifiants entiers d'un magasin en colonnes servent de clé tels quels
+        cle = ressource if type(ressource) is int else str(ressource)
+        i = self.ids.get(cle)
+        if i is None:
+            i = len(self.ressources)
+            self.ids[cle] = i
+            self.ressources.append(ressource)
+        return i
+
+    def ajouter(self, ressourceS, ressourceC, score, prop=None):
+        cle = (self.intern(ressourceS), self.intern(ressourceC))
+        if self.mode == "pondere":
+            w = self.poids.get(str(prop), 1.0)
+            valeur = (score * w, w)
+        else:
+            valeur = (score, 1)
+        courant = self.table.get(cle)
+        self.table[cle] = valeur if courant is None else self.fusion(courant, valeur)
+        if self.budget is not None and len(self.table) > self.budget:
+            self.deverser()
+
+    def consommer(self, scores):
+        for ressourceS, ressourceC, prop, score in scores:
+            self.ajouter(ressourceS, ressourceC, score, prop)
+        return self
+
+    def deverser(self):
+        # Écrit la table triée par clé dans un fichier temporaire et la vide
+        fd, chemin = tempfile.mkstemp(prefix="agregation_", suffix=".run", dir=self.dossier)
+        with os.fdopen(fd, "wb") as f:
+            for cle in sorted(self.table):
+                pickle.dump((cle, self.table[cle]), f)
+        self.fichiers.append(chemin)
+        self.table = {}
+
+    def _lireRun(self, chemin):
+        with open(chemin, "rb") as f:
+            while True:
+                try:
+                    yield pickle.load(f)
+                except EOFError:
+                    return
+
+    def _completer(self, ressourceS, ressourceC, acc):
+        # Les couples de valeurs manquants ajoutent leur poids sans score ; le maximum n'en dépend pas
+        if self.manquants is None or self.mode == "max":
+            return acc
+        nb = 0.0
+        for prop, n in self.manquants(ressourceS, ressourceC).items():
+            nb += n * (self.poids.get(str(prop), 1.0) if self.mode == "pondere" else 1)
+        return (acc[0], acc[1] + nb) if nb else acc
+
+    def _valeur(self, acc):
+        if self.mode == "max":
+            return acc[0]
+        return acc[0] / acc[1] if acc[1] else 0.0
+
+    def ajouterAccumulateur(self, ressourceS, ressourceC, acc):
+        """Fusionne un agrégat partiel (par exemple calculé par un autre processus)"""
+        cle = (self.intern(ressourceS), self.intern(ressourceC))
+        courant = self.table.get(cle)
+        self.table[cle] = acc if courant is None else self.fusion(courant, acc)
+        if self.budget is not None and len(self.table) > self.budget:
+            self.deverser()
+
+    def accumulateurs(self):
+        """Renvoie un générateur de (ressourceS, ressourceC, (somme, poids))"""
+        if not self.fichiers:
+            for (i, j), acc in self.table.items():
+                yield self.ressources[i], self.ressources[j], acc
+            return
+        runs = [self._lireRun(chemin) for chemin in self.fichiers]
+        runs.append(iter(sorted(self.table.items())))
+        cleCourante = None
+        accCourant = None
+        try:
+            for cle, acc in heapq.merge(*runs, key=lambda item: item[0]):
+                if cle == cleCourante:
+                    accCourant = self.fusion(accCourant, acc)
+                    continue
+                if cleCourante is not None:
+                    yield self.ressources[cleCourante[0]], self.ressources[cleCourante[1]], accCourant
+                cleCourante, accCourant = cle, acc
+            if cleCourante is not None:
+                yield self.ressources[cleCourante[0]], self.ressources[cleCourante[1]], accCourant
+        finally:
+            # Les runs sur disque ne sont lus qu'une fois
+            self.nettoyer()
+            self.table = {}
+
+    def resultats(self):
+        """Renvoie un générateur de (ressourceS, ressourceC, score agrégé)"""
+        for ressourceS, ressourceC, acc in self.accumulateurs():
+            yield ressourceS, ressourceC, self._valeur(self._completer(ressourceS, ressourceC, acc))
+
+    def nettoyer(self):
+        for chemin in self.fichiers:
+            if os.path.exists(chemin):
+                os.remove(chemin)
+        self.fichiers = []
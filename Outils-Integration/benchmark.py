@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import measures
+import memo
+import parseRdf
+import profils
+import generateur
+from aggregation import Agregateur
+
+mesures = {
+    "Identity": measures.Identity,
+    "QGrams": measures.QGrams,
+    "Jaccard": measures.Jaccard,
+    "Jaro": measures.Jaro,
+    "JaroWinkler": measures.JaroWinkler,
+    "Levenshtein": measures.Levenshtein,
+    "Monge_elkan": measures.Monge_elkan,
+}
+
+# Bornes (en caractères) des classes de longueur des littéraux
+classesLongueur = {"court": (0, 20), "moyen": (20, 80), "long": (80, 100000)}
+
+proprietesParDefaut = [
+    "http://erlangen-crm.org/current/P102_has_title",
+    "http://erlangen-crm.org/current/P3_has_note",
+    "http://data.doremus.org/ontology#U11_has_key",
+    "http://data.doremus.org/ontology#U12_has_genre",
+]
+
+
+def metadonnees():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "systeme": platform.system(),
+    }
+
+
+def litterauxReels():
+    """Littéraux des expressions F22 des deux jeux fournis, répartis par classe de longueur"""
+    classes = {nom: ([], []) for nom in classesLongueur}
+    for cote, index in ((0, parseRdf.getIndexSource()), (1, parseRdf.getIndexCible())):
+        for couples in index.values():
+            for ressource, valeur in couples:
+                if not isinstance(valeur, parseRdf.Literal):
+                    continue
+                texte = str(valeur)
+                for nom, (mini, maxi) in classesLongueur.items():
+                    if mini <= len(texte) < maxi:
+                        classes[nom][cote].append(texte)
+    return classes
+
+
+def viderCaches():
+    """Vide les caches des mesures (profils, scores mémorisés, moteurs Monge-Elkan) : l'appel suivant est à froid"""
+    profils.vider()
+    memo.cacheScores.vider()
+    measures.moteursMongeElkan.clear()
+
+
+def duree(fonction, couples):
+    debut = time.perf_counter()
+    for s1, s2 in couples:
+        fonction(s1, s2)
+    return time.perf_counter() - debut
+
+
+def chronometrer(fonction, couples, repetitions):
+    """
+    Renvoie (froid, chaud) : meilleures durées d'un passage sur les couples à partir de caches vides,
+    puis d'un second passage sur les mêmes couples, caches remplis par le premier
+    """
+    froid = chaud = None
+    for _ in range(repetitions):
+        viderCaches()
+        d = duree(fonction, couples)
+        froid = d if froid is None else min(froid, d)
+        d = duree(fonction, couples)
+        chaud = d if chaud is None else min(chaud, d)
+    return froid, chaud
+
+
+def microBenchmarks(nbCouples=200, repetitions=3, graine=42):
+    alea = random.Random(graine)
+    resultats = []
+    for classe, (sources, cibles) in litterauxReels().items():
+        if not sources or not cibles:
+            continue
+        couples = [(alea.choice(sources), alea.choice(cibles)) for _ in range(nbCouples)]
+        for nom, fonction in mesures.items():
+            froid, chaud = chronometrer(fonction, couples, repetitions)
+            resultats.append({
+                "type": "micro",
+                "mesure": nom,
+                "classeLongueur": classe,
+                "appels": len(couples),
+                "dureeFroid": froid,
+                "dureeChaud": chaud,
+                "microsecondesParAppelFroid": froid / len(couples) * 1e6,
+                "microsecondesParAppelChaud": chaud / len(couples) * 1e6,
+            })
+    return resultats
+
+
+def etape(resultats, nom, fonction, **infos):
+    debut = time.perf_counter()
+    res = fonction()
+    entree = {"type": "e2e", "etape": nom, "duree": time.perf_counter() - debut}
+    entree.update(infos)
+    resultats.append(entree)
+    return res
+
+
+def boutEnBout(dossier, proprietes, measuresList, seuil, blocage=True, facteur=None, tailleMaxBloc=None):
+    """Chronomètre extraction, comparaison, agrégation et écriture sur un jeu de données généré, caches vides"""
+    resultats = []
+    viderCaches()
+    parseRdf.setFichierSource(os.path.join(dossier, "source.nt"))
+    parseRdf.setFichierCible(os.path.join(dossier, "cible.nt"))
+    infos = {"facteur": facteur, "mesures": measuresList, "blocage": blocage, "tailleMaxBloc": tailleMaxBloc}
+    etape(resultats, "chargement", lambda: (parseRdf.getGrapheSource(), parseRdf.getGrapheCible()), **infos)
+    extractions = etape(resultats, "extraction", lambda: parseRdf.extraireProprietes(proprietes), **infos)
+    candidats = None
+    if blocage:
+        candidats = etape(resultats, "blocage", lambda: parseRdf.grouperCandidats(
+            parseRdf.blocking.genererCandidats(extractions, tailleMaxBloc=tailleMaxBloc)), **infos)
+    # En lot (TF-IDF ou MinHash seuls), les couples de littéraux non générés comptent pour 0, comme dans compare
+    batchs = parseRdf.calculerLots(extractions, measuresList, seuil) \
+        if parseRdf.comparaisonEnLot(measuresList) else None
+    manquants = parseRdf.CouplesManquants(extractions, batchs) if batchs is not None else None
+    scores = etape(resultats, "comparaison",
+                   lambda: list(parseRdf.scorerCouples(extractions, measuresList, candidats, seuil, batchs=batchs)),
+                   **infos)
+    resultats[-1]["scores"] = len(scores)
+    agregateur = etape(resultats, "agregation", lambda: Agregateur(manquants=manquants).consommer(scores), **infos)
+    liste = [[s, c, v] for s, c, v in agregateur.resultats() if v >= seuil]
+    with tempfile.TemporaryDirectory() as temporaire:
+        etape(resultats, "ecriture", lambda: parseRdf.openResultFile(liste, os.path.join(temporaire, "resultat.ttl")),
+              couples=len(liste), **infos)
+    return resultats
+
+
+def rappelMinHash(dossier, proprietes, seuil, nbPermutations=128, facteur=None):
+    """Jaccard seule, jointure exacte contre jointure MinHash-LSH : rappel et durées (sans blocage, caches vides)"""
+    viderCaches()
+    parseRdf.setFichierSource(os.path.join(dossier, "source.nt"))
+    parseRdf.setFichierCible(os.path.join(dossier, "cible.nt"))
+    parseRdf.getGrapheSource(), parseRdf.getGrapheCible()
+    entree = {"type": "minhash", "facteur": facteur, "proprietes": proprietes}
+    entree.update(parseRdf.evaluerMinHash(proprietes, seuil, nbPermutations))
+    return [entree]
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Benchmarks des mesures et de la chaîne de liage")
+    parser.add_argument("mode", choices=["micro", "e2e", "minhash", "tout"])
+    parser.add_argument("--facteurs", type=int, nargs="+", default=[10],
+                        help="tailles des jeux générés, en multiples du jeu fourni (10, 100, 1000)")
+    parser.add_argument("--dossier", default=None, help="dossier des jeux générés (réutilisés s'ils existent)")
+    parser.add_argument("--mesures", type=int, nargs="+", default=[0])
+    parser.add_argument("--seuil", type=float, default=0.8)
+    parser.add_argument("--sans-blocage", action="store_true")
+    parser.add_argument("--taille-max-bloc", type=int, default=10000)
+    parser.add_argument("--couples", type=int, default=200)
+    parser.add_argument("--permutations", type=int, default=128, help="permutations MinHash (mode minhash)")
+    parser.add_argument("--sortie", default=None, help="fichier JSON lines auquel ajouter le résultat")
+    args = parser.parse_args(arguments)
+
+    resultats = []
+    if args.mode in ("micro", "tout"):
+        resultats += microBenchmarks(args.couples)
+    if args.mode in ("e2e", "minhash", "tout"):
+        racine = args.dossier or tempfile.mkdtemp(prefix="bench_doremus_")
+        for facteur in args.facteurs:
+            dossier = os.path.join(racine, "x%d" % facteur)
+            if not os.path.exists(os.path.join(dossier, "referenceFile")):
+                generateur.generer(facteur, dossier)
+            if args.mode != "minhash":
+                resultats += boutEnBout(dossier, proprietesParDefaut, args.mesures, args.seuil,
+                                         not args.sans_blocage, facteur, args.taille_max_bloc)
+            if args.mode != "e2e":
+                # Les notes sont les littéraux longs pour lesquels la jointure approchée est faite
+                resultats += rappelMinHash(dossier, [proprietesParDefaut[1]], args.seuil, args.permutations, facteur)
+    execution = {"meta": metadonnees(), "resultats": resultats}
+    if args.sortie:
+        with open(args.sortie, "a") as f:
+            f.write(json.dumps(execution) + "\n")
+    else:
+        json.dump(execution, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import re
+import unicodedata
+from rdflib import URIRef, Literal
+
+from measures import Tokenisation
+
+# Mots trop fréquents dans les notes DOREMUS pour servir de clé de blocage
+motsVides = {"de", "du", "des", "la", "le", "les", "et", "en", "pour", "a", "au", "aux", "un", "une",
+             "sur", "par", "dans", "the", "of", "and", "op", "no"}
+
+
+def normaliser(valeur):
+    """Renvoie la valeur en minuscules et sans accents"""
+    valeur = unicodedata.normalize("NFKD", str(valeur).lower())
+    return "".join(c for c in valeur if not unicodedata.combining(c))
+
+
+def cleUri(prop, valeur):
+    """Clé exacte pour les valeurs URI du vocabulaire (U11_has_key, U12_has_genre)"""
+    if isinstance(valeur, URIRef):
+        token = Tokenisation(valeur)
+        if token is not None:
+            return {(str(prop), token)}
+    return set()
+
+
+def cleTokens(prop, valeur, tailleMin=3):
+    """Clés normalisées pour les littéraux : un bloc par token significatif"""
+    if isinstance(valeur, Literal):
+        tokens = re.split(r"\W+", normaliser(valeur))
+        return {(str(prop), t) for t in tokens if len(t) >= tailleMin and t not in motsVides}
+    return set()
+
+
+def cleComposee(*cles):
+    """Combine plusieurs fonctions de clé en une seule clé conjointe (produit des clés)"""
+    def cle(prop, valeur):
+        resultat = {()}
+        for f in cles:
+            partielle = f(prop, valeur)
+            resultat = {r + (k,) for r in resultat for k in partielle}
+        return resultat
+    return cle
+
+
+clesParDefaut = [cleUri, cleTokens]
+
+
+def indexerBlocs(listValues, prop, cles, blocs=None):
+    """Ajoute dans blocs les ressources de listValues rangées par clé de blocage"""
+    if blocs is None:
+        blocs = {}
+    for ressource, valeur in listValues:
+        for f in cles:
+            for k in f(prop, valeur):
+                blocs.setdefault(k, set()).add(ressource)
+    return blocs
+
+
+def genererCandidats(extractions, cles=None, tailleMaxBloc=None):
+    """
+    Renvoie l'ensemble des couples (ressourceS, ressourceC) partageant au moins une clé de blocage.
+    extractions : liste de (prop, listSource, listCible) ; les blocs de taille (|S| x |C|)
+    supérieure à tailleMaxBloc sont ignorés car trop peu discriminants.
+    """
+    if cles is None:
+        cles = clesParDefaut
+    blocsSource = {}
+    blocsCible = {}
+    for prop, listSource, listCible in extractions:
+        indexerBlocs(listSource, prop, cles, blocsSource)
+        indexerBlocs(listCible, prop, cles, blocsCible)
+    candidats = set()
+    for k, ressourcesS in blocsSource.items():
+        ressourcesC = blocsCible.get(k)
+        if not ressourcesC:
+            continue
+        if tailleMaxBloc is not None and len(ressourcesS) * len(ressourcesC) > tailleMaxBloc:
+            continue
+        for rs in ressourcesS:
+            for rc in ressourcesC:
+                candidats.add((rs, rc))
+    return candidats
+
+
+def rapportBlocage(candidats, extractions, reference):
+    """Taux de réduction et complétude des paires par rapport à l'alignement de référence"""
+    ressourcesS = set()
+    ressourcesC = set()
+    for prop, listSource, listCible in extractions:
+        ressourcesS.update(r for r, v in listSource)
+        ressourcesC.update(r for r, v in listCible)
+    total = len(ressourcesS) * len(ressourcesC)
+    couples = {(str(rs), str(rc)) for rs, rc in candidats}
+    trouves = sum(1 for couple in reference if couple in couples)
+    return {
+        "candidats": len(candidats),
+        "total": total,
+        "reduction": 1 - len(candidats) / total if total else 0.0,
+        "completude": trouves / len(reference) if reference else 0.0,
+    }
@@ -0,0 +1,211 @@
+import random
+import time
+
+from measures import Identity, Jaccard, Jaro, JaroBorne, JaroWinkler, JaroWinklerBorne, Levenshtein, \
+    LevenshteinBorne, QGrams, QGramsBorne, _winkler, borneJaro
+from profils import profil
+
+# Marge des comparaisons au seuil (arrondis des sommes de majorants)
+epsilon = 1e-9
+
+# Cascade des mesures : chaque couple de ressources n'est mesuré que tant que son score agrégé peut encore
+# atteindre le seuil. Les majorants bon marché de toutes les mesures sont calculés d'abord, puis les mesures
+# exactes, par propriété, dans l'ordre de leur coût mesuré (l'identité et les q-grammes avant la distance
+# d'édition). Les couples restants sont ensuite scorés normalement : leurs scores ne changent pas.
+
+
+def majorantJaro(str1, str2):
+    if str1 == str2:
+        return 1.0
+    return borneJaro(str1, str2)
+
+
+def majorantJaroWinkler(str1, str2):
+    if str1 == str2:
+        return 1.0
+    # Jaro-Winkler est croissant en Jaro pour un préfixe commun donné
+    return _winkler(str1, str2, borneJaro(str1, str2))
+
+
+def majorantLevenshtein(str1, str2):
+    maxLen = max(len(str1), len(str2))
+    if maxLen == 0:
+        return 1.0
+    # La distance d'édition est au moins l'écart des longueurs
+    return 1 - abs(len(str1) - len(str2)) / maxLen
+
+
+def majorantQGrams(str1, str2):
+    # Recouvrement dans [0, 1] ; nul sans q-gramme commun
+    profil1 = profil(str1)
+    profil2 = profil(str2)
+    if min(profil1.nbGrammes, profil2.nbGrammes) == 0:
+        return 1.0 if profil1.minuscule == profil2.minuscule else 0.0
+    return 0.0 if profil1.ensembleGrammes.isdisjoint(profil2.ensembleGrammes) else 1.0
+
+
+def majorantJaccard(str1, str2):
+    ensemble1 = profil(str1).ensembleGrammes
+    ensemble2 = profil(str2).ensembleGrammes
+    if ensemble1 == ensemble2:
+        return 1.0
+    if not ensemble1 or not ensemble2:
+        return 0.0
+    return min(len(ensemble1), len(ensemble2)) / max(len(ensemble1), len(ensemble2))
+
+
+def majorantMongeElkan(str1, str2):
+    # Moyenne de maxima de mesures à valeurs dans [0, 1]
+    return 1.0
+
+
+def majorant(mesure, *args):
+    """Majorant bon marché de mesure(str1, str2, *args) ; les variantes bornées valent le score exact ou 0"""
+    if mesure is Identity:
+        return Identity
+    if mesure in (Jaro, JaroBorne):
+        return majorantJaro
+    if mesure in (JaroWinkler, JaroWinklerBorne):
+        return majorantJaroWinkler
+    if mesure in (Levenshtein, LevenshteinBorne):
+        return majorantLevenshtein
+    if mesure in (QGrams, QGramsBorne):
+        return majorantQGrams
+    if mesure is Jaccard:
+        return majorantJaccard
+    return majorantMongeElkan
+
+
+class Paire:
+    """
+    Couple de valeurs distinctes d'une propriété, partagé par les couples de ressources qui le portent.
+    exact est la somme des mesures déjà calculées, majorants donne un majorant de chaque mesure restante :
+    le score de la paire, (exact + somme des mesures restantes) / compteur, est celui de useMeasure.
+    """
+
+    __slots__ = ("prop", "valeurs", "chaines", "exact", "compteur", "majorants", "couples")
+
+    def __init__(self, prop, valeurs, chaines, exact, compteur, restantes=()):
+        self.prop = prop
+        self.valeurs = valeurs
+        self.chaines = chaines
+        self.exact = exact
+        self.compteur = compteur
+        self.majorants = dict.fromkeys(restantes, 1.0)
+        self.couples = []
+
+    def majorant(self):
+        return (self.exact + sum(self.majorants.values())) / self.compteur
+
+
+def coutMesure(fonction, chaines, taille=30, graine=0):
+    """Durée moyenne d'un appel de fonction sur un échantillon des couples de chaînes"""
+    echantillon = random.Random(graine).sample(chaines, min(taille, len(chaines)))
+    if not echantillon:
+        return 0.0
+    debut = time.perf_counter()
+    for str1, str2 in echantillon:
+        fonction(str1, str2)
+    return (time.perf_counter() - debut) / len(echantillon)
+
+
+def planifier(paires, mesures):
+    """
+    Niveaux (propriété, mesure) par coût moyen mesuré croissant.
+    mesures : {nom: (exacte, brute, majorant)} ; brute, sans cache, sert au chronométrage.
+    """
+    chainesParNiveau = {}
+    for paire in paires:
+        for nom in paire.majorants:
+            chainesParNiveau.setdefault((paire.prop, nom), set()).add(paire.chaines)
+    couts = {niveau: coutMesure(mesures[niveau[1]][1], sorted(chaines))
+             for niveau, chaines in chainesParNiveau.items()}
+    return sorted(couts, key=lambda niveau: (couts[niveau], str(niveau[0]), niveau[1]))
+
+
+class Bornes:
+    """
+    Majorant du score agrégé de chaque couple de ressources, pour les modes de aggregation.Agregateur.
+    Moyenne et pondéré : somme (pondérée) des majorants des paires de chaque couple, tenue à jour quand le
+    majorant d'une paire baisse (ajuster) ; max : recalculé depuis les paires du couple.
+    """
+
+    def __init__(self, paires, mode="moyenne", poids=None):
+        self.mode = mode
+        self.poids = poids if poids is not None else {}
+        # Max : paires de chaque couple ; sinon [somme pondérée des majorants, somme des poids] de chaque couple
+        self.couples = {}
+        for paire in paires:
+            if mode == "max":
+                for couple in paire.couples:
+                    self.couples.setdefault(couple, []).append(paire)
+                continue
+            w = self.poidsPaire(paire)
+            m = w * paire.majorant()
+            for couple in paire.couples:
+                acc = self.couples.get(couple)
+                if acc is None:
+                    self.couples[couple] = [m, w]
+                else:
+                    acc[0] += m
+                    acc[1] += w
+
+    def poidsPaire(self, paire):
+        return self.poids.get(str(paire.prop), 1.0) if self.mode == "pondere" else 1.0
+
+    def ajuster(self, paire, avant):
+        """Reporte sur les couples de paire la baisse de son majorant depuis avant"""
+        if self.mode == "max":
+            return
+        delta = self.poidsPaire(paire) * (paire.majorant() - avant)
+        for couple in paire.couples:
+            self.couples[couple][0] += delta
+
+    def majorant(self, couple):
+        if self.mode == "max":
+            return max(paire.majorant() for paire in self.couples[couple])
+        somme, total = self.couples[couple]
+        return somme / total if total else 0.0
+
+
+def elaguer(paires, mesures, seuil, mode="moyenne", poids=None):
+    """
+    Cascade sur les paires (voir Paire) : majorants de toutes les mesures, puis mesures exactes niveau par
+    niveau (planifier) ; après chaque niveau, les couples de ressources dont le score agrégé ne peut plus
+    atteindre seuil sont abandonnés. Renvoie (couples restants, rapport [{niveau, propriete, evalues, elagues}]).
+    """
+    majorantsCalcules = {}
+    for paire in paires:
+        for nom in paire.majorants:
+            cle = (nom, paire.chaines)
+            m = majorantsCalcules.get(cle)
+            if m is None:
+                m = mesures[nom][2](*paire.chaines)
+                majorantsCalcules[cle] = m
+            paire.majorants[nom] = m
+    bornes = Bornes(paires, mode, poids)
+    vivants = {couple for couple in bornes.couples if bornes.majorant(couple) >= seuil - epsilon}
+    rapport = [{"niveau": "bornes", "propriete": None, "evalues": len(paires),
+                "elagues": len(bornes.couples) - len(vivants)}]
+    parNiveau = {}
+    for paire in paires:
+        for nom in paire.majorants:
+            parNiveau.setdefault((paire.prop, nom), []).append(paire)
+    for prop, nom in planifier(paires, mesures):
+        exacte = mesures[nom][0]
+        touches = set()
+        evalues = 0
+        for paire in parNiveau[(prop, nom)]:
+            if not any(couple in vivants for couple in paire.couples):
+                continue
+            score = exacte(*paire.chaines)
+            evalues += 1
+            avant = paire.majorant()
+            del paire.majorants[nom]
+            paire.exact += score
+            bornes.ajuster(paire, avant)
+            touches.update(paire.couples)
+        elagues = {couple for couple in touches & vivants if bornes.majorant(couple) < seuil - epsilon}
+        vivants -= elagues
+        rapport.append({"niveau": nom, "propriete": prop, "evalues": evalues, "elagues": len(elagues)})
+    return vivants, rapport
@@ -0,0 +1,238 @@
+import json
+import mmap
+import os
+from array import array
+
+from rdflib import BNode, Literal, URIRef
+
+# Nature des valeurs stockées
+LITTERAL, URI, NOEUD = 0, 1, 2
+COTES = {"source": 0, "cible": 1}
+
+
+class TamponChaines:
+    """
+    Chaînes stockées une seule fois, bout à bout dans un tampon UTF-8, repérées par leur identifiant.
+    Le tampon peut être relu depuis le disque en mémoire partagée (mmap) : les processus fils ne le copient pas.
+    """
+
+    def __init__(self):
+        self.tampon = bytearray()
+        self.debuts = array("Q", [0])
+        self.ids = {}
+
+    def intern(self, texte):
+        i = self.ids.get(texte)
+        if i is None:
+            i = len(self.debuts) - 1
+            self.ids[texte] = i
+            self.tampon += texte.encode("utf-8")
+            self.debuts.append(len(self.tampon))
+        return i
+
+    def chercher(self, texte):
+        """Identifiant de texte, None s'il n'a jamais été interné (demande l'index, voir figer)"""
+        if self.ids is None:
+            self.ids = {self[i]: i for i in range(len(self))}
+        return self.ids.get(texte)
+
+    def figer(self):
+        # L'index texte -> identifiant ne sert qu'à la construction ; chercher() le reconstruit au besoin
+        self.ids = None
+
+    def __getitem__(self, i):
+        return bytes(self.tampon[self.debuts[i]:self.debuts[i + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.debuts) - 1
+
+    def octets(self):
+        return len(self.tampon) + self.debuts.itemsize * len(self.debuts)
+
+    def sauver(self, chemin):
+        with open(chemin + ".txt", "wb") as f:
+            f.write(self.tampon)
+        with open(chemin + ".pos", "wb") as f:
+            self.debuts.tofile(f)
+
+    @classmethod
+    def ouvrir(cls, chemin, partage=True):
+        tampon = cls()
+        tampon.ids = None
+        taille = os.path.getsize(chemin + ".pos") // tampon.debuts.itemsize
+        tampon.debuts = array("Q")
+        with open(chemin + ".pos", "rb") as f:
+            tampon.debuts.fromfile(f, taille)
+        with open(chemin + ".txt", "rb") as f:
+            if partage and os.path.getsize(chemin + ".txt") > 0:
+                tampon.tampon = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                tampon.tampon = bytearray(f.read())
+        return tampon
+
+
+class MagasinColonnes:
+    """
+    Triplets extraits (côté, ressource, propriété, valeur) en colonnes d'entiers.
+    Ressources, propriétés et valeurs sont internées : une valeur est (nature, forme lexicale, langue ou datatype),
+    sa forme lexicale étant dans un TamponChaines. Les valeurs identiques des deux côtés ont le même identifiant.
+    """
+
+    def __init__(self):
+        self.ressources = TamponChaines()
+        self.proprietes = TamponChaines()
+        self.lexiques = TamponChaines()
+        # Langue ("@fr") ou datatype ("^^uri") des littéraux ; 0 = aucun
+        self.annotations = TamponChaines()
+        self.annotations.intern("")
+        self.natures = array("B")
+        self.lexiqueValeur = array("I")
+        self.annotationValeur = array("I")
+        self.idsValeurs = {}
+        self.cote = array("B")
+        self.sujet = array("I")
+        self.propriete = array("I")
+        self.valeur = array("I")
+        self.termes = {}
+        self.parPropriete = None
+
+    def internValeur(self, terme):
+        if isinstance(terme, Literal):
+            nature = LITTERAL
+            if terme.language:
+                annotation = "@" + terme.language
+            elif terme.datatype is not None:
+                annotation = "^^" + str(terme.datatype)
+            else:
+                annotation = ""
+        else:
+            nature = NOEUD if isinstance(terme, BNode) else URI
+            annotation = ""
+        cle = (nature, str(terme), annotation)
+        i = self.idsValeurs.get(cle)
+        if i is None:
+            i = len(self.natures)
+            self.idsValeurs[cle] = i
+            self.natures.append(nature)
+            self.lexiqueValeur.append(self.lexiques.intern(cle[1]))
+            self.annotationValeur.append(self.annotations.intern(annotation))
+        return i
+
+    def ajouter(self, cote, ressource, prop, terme):
+        self.parPropriete = None
+        self.cote.append(COTES[cote])
+        self.sujet.append(self.ressources.intern(str(ressource)))
+        self.propriete.append(self.proprietes.intern(str(prop)))
+        self.valeur.append(self.internValeur(terme))
+
+    def ajouterIndex(self, cote, index, proprietes=None):
+        """Ajoute une extraction {propriété: [(ressource, valeur)]} (index d'un graphe ou lecture en flux)"""
+        for prop, couples in index.items():
+            if proprietes is not None and prop not in proprietes:
+                continue
+            for ressource, terme in couples:
+                self.ajouter(cote, ressource, prop, terme)
+
+    def garder(self, masque):
+        """
+        Ne conserve que les lignes dont le masque est vrai. Les tampons de chaînes et les valeurs internées ne sont
+        pas compactés : les chaînes des lignes écartées y restent (la lecture en flux n'interne que les triplets
+        gardés, voir streaming.FiltreColonnes).
+        """
+        self.parPropriete = None
+        for nom in ("cote", "sujet", "propriete", "valeur"):
+            colonne = getattr(self, nom)
+            setattr(self, nom, array(colonne.typecode, (x for x, m in zip(colonne, masque) if m)))
+
+    def figer(self):
+        """Fin de construction : libère les index de chaînes, inutiles pour la comparaison"""
+        self.idsValeurs = None
+        self.ressources.figer()
+        self.lexiques.figer()
+
+    def terme(self, i):
+        """Valeur rdflib reconstruite à la demande, une seule fois par identifiant"""
+        terme = self.termes.get(i)
+        if terme is None:
+            lexique = self.lexiques[self.lexiqueValeur[i]]
+            nature = self.natures[i]
+            if nature == URI:
+                terme = URIRef(lexique)
+            elif nature == NOEUD:
+                terme = BNode(lexique)
+            else:
+                annotation = self.annotations[self.annotationValeur[i]]
+                if annotation.startswith("@"):
+                    terme = Literal(lexique, lang=annotation[1:])
+                elif annotation.startswith("^^"):
+                    terme = Literal(lexique, datatype=URIRef(annotation[2:]))
+                else:
+                    terme = Literal(lexique)
+            self.termes[i] = terme
+        return terme
+
+    def uri(self, ressource):
+        return URIRef(self.ressources[ressource])
+
+    def lignes(self):
+        """Numéros de lignes par (côté, propriété), calculés en une passe sur les colonnes"""
+        if self.parPropriete is None:
+            self.parPropriete = {}
+            for i, (c, p) in enumerate(zip(self.cote, self.propriete)):
+                lignes = self.parPropriete.get((c, p))
+                if lignes is None:
+                    lignes = self.parPropriete[(c, p)] = array("I")
+                lignes.append(i)
+        return self.parPropriete
+
+    def extraction(self, prop, cote):
+        """
+        [(identifiant de ressource, valeur rdflib)] de la propriété pour un côté. Les valeurs rdflib sont
+        reconstruites une fois par valeur distincte (voir terme) : les mesures comparent leurs chaînes comme
+        pour une extraction de graphe, le magasin ne réduit que la mémoire de l'extraction.
+        """
+        p = self.proprietes.chercher(str(prop))
+        if p is None:
+            return []
+        sujet, valeur = self.sujet, self.valeur
+        return [(sujet[i], self.terme(valeur[i])) for i in self.lignes().get((COTES[cote], p), ())]
+
+    def listeProprietes(self, cote):
+        c = COTES[cote]
+        return [self.proprietes[p] for cs, p in sorted(self.lignes()) if cs == c]
+
+    def octets(self):
+        """Taille approximative des données (colonnes et tampons), hors valeurs rdflib reconstruites"""
+        colonnes = (self.cote, self.sujet, self.propriete, self.valeur, self.natures, self.lexiqueValeur,
+                    self.annotationValeur)
+        return sum(c.itemsize * len(c) for c in colonnes) + sum(
+            t.octets() for t in (self.ressources, self.proprietes, self.lexiques, self.annotations))
+
+    def sauver(self, dossier):
+        os.makedirs(dossier, exist_ok=True)
+        for nom in ("ressources", "proprietes", "lexiques", "annotations"):
+            getattr(self, nom).sauver(os.path.join(dossier, nom))
+        tailles = {}
+        for nom in ("cote", "sujet", "propriete", "valeur", "natures", "lexiqueValeur", "annotationValeur"):
+            colonne = getattr(self, nom)
+            tailles[nom] = [colonne.typecode, len(colonne)]
+            with open(os.path.join(dossier, nom + ".col"), "wb") as f:
+                colonne.tofile(f)
+        with open(os.path.join(dossier, "colonnes.json"), "w") as f:
+            json.dump(tailles, f)
+
+    @classmethod
+    def ouvrir(cls, dossier, partage=True):
+        """Relit un magasin sauvé ; avec partage, les tampons de chaînes sont projetés en mémoire (mmap)"""
+        magasin = cls()
+        for nom in ("ressources", "proprietes", "lexiques", "annotations"):
+            setattr(magasin, nom, TamponChaines.ouvrir(os.path.join(dossier, nom), partage))
+        with open(os.path.join(dossier, "colonnes.json")) as f:
+            tailles = json.load(f)
+        for nom, (typecode, taille) in tailles.items():
+            colonne = array(typecode)
+            with open(os.path.join(dossier, nom + ".col"), "rb") as f:
+                colonne.fromfile(f, taille)
+            setattr(magasin, nom, colonne)
+        magasin.idsValeurs = None
+        return magasin
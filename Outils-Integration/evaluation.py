@@ -0,0 +1,83 @@
+import json
+import re
+
+motifEntite = re.compile(r'<entity([12]) rdf:resource="(.*?)"')
+motifResultat = re.compile(r"<(.+)>owl:sameAs<(.+)>")
+
+
+def lireReference(lignesRef):
+    """Couples (entity1, entity2) d'un alignement au format Alignment, dans l'ordre du fichier"""
+    ressourcesSimRef = []
+    entite1 = None
+    for ligne in lignesRef:
+        match = motifEntite.search(ligne)
+        if match is None:
+            continue
+        if match.group(1) == "1":
+            entite1 = match.group(2)
+        elif entite1 is not None:
+            ressourcesSimRef.append((entite1, match.group(2)))
+            entite1 = None
+    return ressourcesSimRef
+
+
+def chargerReference(chemin="referenceFile"):
+    with open(chemin, "r") as fileRef:
+        return set(lireReference(fileRef))
+
+
+def chargerResultat(chemin="resultat.ttl"):
+    with open(chemin, "r") as fileResult:
+        return {(m.group(1), m.group(2)) for m in map(motifResultat.match, fileResult) if m}
+
+
+def mesuresQualite(vraisPositifs, retenus, attendus):
+    precision = vraisPositifs / retenus if retenus else 0.0
+    rappel = vraisPositifs / attendus if attendus else 0.0
+    fMesure = 2 * precision * rappel / (precision + rappel) if precision + rappel else 0.0
+    return precision, rappel, fMesure
+
+
+def balayage(couplesScores, reference):
+    """
+    Précision, rappel et F-mesure pour chaque seuil possible en un seul parcours des couples triés.
+    couplesScores : (ressourceS, ressourceC, score) ; reference : ensemble de couples (str, str).
+    Renvoie les points de la courbe par seuil décroissant : un couple est retenu si son score >= seuil.
+    """
+    # Un couple présent plusieurs fois garde son meilleur score
+    meilleurs = {}
+    for ressourceS, ressourceC, score in couplesScores:
+        cle = (str(ressourceS), str(ressourceC))
+        if score > meilleurs.get(cle, float("-inf")):
+            meilleurs[cle] = score
+    tries = sorted(((score, cle in reference) for cle, score in meilleurs.items()), reverse=True)
+    courbe = []
+    vraisPositifs = 0
+    for i, (score, correct) in enumerate(tries):
+        vraisPositifs += correct
+        # Un point par score distinct, une fois tous les ex aequo retenus
+        if i + 1 < len(tries) and tries[i + 1][0] == score:
+            continue
+        precision, rappel, fMesure = mesuresQualite(vraisPositifs, i + 1, len(reference))
+        courbe.append({"seuil": score, "retenus": i + 1, "vraisPositifs": vraisPositifs,
+                       "precision": precision, "rappel": rappel, "fMesure": fMesure})
+    return courbe
+
+
+def meilleurSeuil(courbe):
+    """Point de F-mesure maximale ; à égalité, le seuil le plus haut"""
+    meilleur = None
+    for point in courbe:
+        if meilleur is None or point["fMesure"] > meilleur["fMesure"]:
+            meilleur = point
+    return meilleur
+
+
+def evaluer(couplesScores, reference):
+    courbe = balayage(couplesScores, reference)
+    return {"alignementsReference": len(reference), "meilleur": meilleurSeuil(courbe), "courbe": courbe}
+
+
+def exporterCourbe(evaluation, chemin):
+    with open(chemin, "w") as f:
+        json.dump(evaluation, f, indent=2)
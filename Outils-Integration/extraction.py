@@ -0,0 +1,78 @@
+import weakref
+
+from rdflib import URIRef
+from rdflib.namespace import RDF
+
+classeF22 = URIRef("http://erlangen-crm.org/efrbroo/F22_Self-Contained_Expression")
+
+# Un index par graphe, libéré avec le graphe
+_index = weakref.WeakKeyDictionary()
+
+
+def indexerProprietes(graphe, classe=classeF22):
+    """
+    Parcourt une seule fois les triplets des ressources de type classe.
+    Renvoie {propriété: [(ressource, objet)]} pour toutes les propriétés, quel que soit leur espace de noms.
+    """
+    index = {}
+    vues = set()
+    for ressource in graphe.subjects(RDF.type, classe):
+        if ressource in vues:
+            continue
+        vues.add(ressource)
+        for p, o in graphe.predicate_objects(ressource):
+            if p == RDF.type:
+                continue
+            index.setdefault(str(p), []).append((ressource, o))
+    return index
+
+
+def indexDe(graphe, classe=classeF22):
+    parClasse = _index.get(graphe)
+    if parClasse is None:
+        parClasse = {}
+        _index[graphe] = parClasse
+    index = parClasse.get(classe)
+    if index is None:
+        index = indexerProprietes(graphe, classe)
+        parClasse[classe] = index
+    return index
+
+
+# Chemins de propriétés vers les valeurs imbriquées dans des nœuds anonymes ou d'autres ressources.
+# Étapes séparées par " / " ; une étape préfixée par "^" est parcourue en sens inverse.
+separateurChemin = " / "
+chemins = {
+    "opus": "http://data.doremus.org/ontology#U17_has_opus_statement / "
+            "http://data.doremus.org/ontology#U42_has_opus_number",
+    "catalogue": "http://data.doremus.org/ontology#U16_has_catalogue_statement / "
+                 "http://erlangen-crm.org/current/P3_has_note",
+    "date": "^http://erlangen-crm.org/efrbroo/R17_created / "
+            "http://erlangen-crm.org/current/P4_has_time-span / "
+            "http://erlangen-crm.org/current/P82_at_some_time_within",
+}
+
+
+def estChemin(prop):
+    return separateurChemin in str(prop) or str(prop).startswith("^")
+
+
+def etapesChemin(chemin):
+    etapes = []
+    for etape in str(chemin).split(separateurChemin):
+        etape = etape.strip()
+        etapes.append((URIRef(etape[1:]), True) if etape.startswith("^") else (URIRef(etape), False))
+    return etapes
+
+
+def valeursChemin(graphe, chemin, classe=classeF22):
+    """Renvoie [(ressource, valeur)] au bout du chemin pour chaque ressource de type classe"""
+    etapes = etapesChemin(chemin)
+    valeurs = []
+    for ressource in dict.fromkeys(graphe.subjects(RDF.type, classe)):
+        noeuds = [ressource]
+        for p, inverse in etapes:
+            noeuds = [n for noeud in noeuds
+                      for n in (graphe.subjects(p, noeud) if inverse else graphe.objects(noeud, p))]
+        valeurs += [(ressource, valeur) for valeur in dict.fromkeys(noeuds)]
+    return valeurs
@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import time
+
+import lier
+
+# Liage découpé en fragments indépendants selon l'empreinte de l'URI des ressources sources :
+#   python fragments.py preparer manifeste.json --fragments 4 -- --source s.ttl --cible c.ttl ...
+#   python fragments.py lancer manifeste.json --processus 2   (fragments manquants puis fusion)
+#   python fragments.py executer manifeste.json 3              (un seul fragment, par exemple après un échec)
+#   python fragments.py fusionner manifeste.json
+# Chaque fragment relit et indexe toutes les données source et cible (TF-IDF, blocage et voisinage portent sur
+# l'ensemble) : le découpage répartit la comparaison et l'agrégation, pas la mémoire du chargement.
+
+
+def numeroFragment(uri, nombre):
+    """Fragment d'une ressource : empreinte stable de son URI (hash() change d'un processus à l'autre)"""
+    return int.from_bytes(hashlib.blake2b(str(uri).encode(), digest_size=8).digest(), "big") % nombre
+
+
+def preparer(chemin, nombre, configuration, dossier=None):
+    """Écrit le manifeste : configuration commune et, par fragment, entrées, propriétés, mesures, seuil et sortie"""
+    if nombre < 1:
+        raise ValueError("il faut au moins un fragment")
+    if configuration["magasin"]:
+        raise ValueError("--magasin ne se combine pas avec les fragments")
+    if dossier is None:
+        dossier = os.path.splitext(chemin)[0] + "_fragments"
+    manifeste = {
+        "configuration": configuration,
+        "dossier": dossier,
+        "fragments": [{
+            "indice": i,
+            "nombre": nombre,
+            "source": configuration["source"],
+            "cible": configuration["cible"],
+            "proprietes": configuration["proprietes"],
+            "mesures": configuration["mesures"],
+            # Avec une référence, tous les couples sont gardés pour évaluer chaque seuil à la fusion
+            "seuil": 0.0 if configuration["reference"] else configuration["seuil"],
+            "sortie": os.path.join(dossier, "fragment-%03d.json" % i),
+        } for i in range(nombre)],
+    }
+    with open(chemin, "w") as f:
+        json.dump(manifeste, f, indent=2)
+    return manifeste
+
+
+def lireManifeste(chemin):
+    with open(chemin) as f:
+        return json.load(f)
+
+
+# Réglages sans effet sur les couples d'un fragment : sorties, sélection faite à la fusion, ceux que
+# la description du fragment remplace (entrées, propriétés, mesures, seuil), mode de lecture et profilage
+clesHorsSignature = ("sortie", "rapport", "courbe",
+                     "k", "unAUn",
+                     "source", "cible", "proprietes", "mesures", "seuil",
+                     "deuxPasses", "profil")
+
+
+def signature(fragment, configuration):
+    """
+    Description du fragment, réglages de la comparaison (blocage, agrégation, bornes, cascade...) et contenu
+    de ses entrées : une sortie de même signature est à jour
+    """
+    reglages = {cle: valeur for cle, valeur in configuration.items() if cle not in clesHorsSignature}
+    h = hashlib.sha256(json.dumps([fragment, reglages], sort_keys=True).encode())
+    for entree in (fragment["source"], fragment["cible"]):
+        if "://" in entree:
+            # Point d'accès SPARQL : seule son URL entre dans la signature (pages en cache local)
+            continue
+        with open(entree, "rb") as f:
+            for bloc in iter(lambda: f.read(1 << 20), b""):
+                h.update(bloc)
+    return h.hexdigest()
+
+
+def lireSortie(fragment, configuration, attendue=None):
+    """Sortie du fragment si elle existe et correspond à sa signature, None sinon"""
+    try:
+        with open(fragment["sortie"]) as f:
+            sortie = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if sortie.get("signature") != (attendue or signature(fragment, configuration)):
+        return None
+    return sortie
+
+
+def executer(manifeste, indice, forcer=False):
+    """
+    Compare les sources d'un fragment et écrit ses couples agrégés (avant sélection top-k / un-à-un,
+    faite à la fusion). Une sortie déjà à jour n'est pas recalculée ; l'écriture est atomique.
+    """
+    fragment = manifeste["fragments"][indice]
+    attendue = signature(fragment, manifeste["configuration"])
+    if not forcer and lireSortie(fragment, manifeste["configuration"], attendue) is not None:
+        return False
+    import parseRdf
+    from instrumentation import instr
+
+    configuration = dict(manifeste["configuration"])
+    for cle in ("source", "cible", "proprietes", "mesures"):
+        configuration[cle] = fragment[cle]
+    proprietes, options = lier.charger(configuration)
+    options.update(k=None, unAUn=None)
+    chargement = instr.instantane()
+    debut = time.perf_counter()
+    couples = parseRdf.compare(proprietes, fragment["seuil"], fragment["mesures"],
+                               fragment=(indice, fragment["nombre"]), **options)
+    instr.fusionner(chargement)
+    sortie = {
+        "signature": attendue,
+        "indice": indice,
+        "duree": time.perf_counter() - debut,
+        "couples": [[str(s), str(c), score] for s, c, score in couples],
+        "rapport": instr.rapport(),
+    }
+    os.makedirs(os.path.dirname(fragment["sortie"]) or ".", exist_ok=True)
+    temporaire = fragment["sortie"] + ".tmp"
+    with open(temporaire, "w") as f:
+        json.dump(sortie, f)
+    os.replace(temporaire, fragment["sortie"])
+    return True
+
+
+def manquants(manifeste):
+    return [fragment["indice"] for fragment in manifeste["fragments"]
+            if lireSortie(fragment, manifeste["configuration"]) is None]
+
+
+def fusionner(manifeste):
+    """
+    Réunit les sorties dans l'ordre des fragments, applique la sélection de la configuration,
+    écrit le fichier de résultats et, avec une référence, le rapport d'évaluation.
+    """
+    import parseRdf
+    from rdflib import URIRef
+
+    configuration = manifeste["configuration"]
+    absents = manquants(manifeste)
+    if absents:
+        raise ValueError("fragments absents ou périmés : " + ", ".join(map(str, absents)))
+    sorties = [lireSortie(fragment, configuration) for fragment in manifeste["fragments"]]
+    couples = ((URIRef(s), URIRef(c), score) for sortie in sorties for s, c, score in sortie["couples"])
+    seuil = configuration["seuil"]
+    retenus = parseRdf.selection.selectionner(couples, 0.0 if configuration["reference"] else seuil,
+                                              configuration["k"], configuration["unAUn"])
+    if configuration["reference"]:
+        resume = parseRdf.evaluation.evaluer(retenus, parseRdf.evaluation.chargerReference(configuration["reference"]))
+        resume["fragments"] = [{"indice": sortie["indice"], "couples": len(sortie["couples"]),
+                                "duree": sortie["duree"]} for sortie in sorties]
+        lier.afficherEvaluation(resume, seuil)
+        parseRdf.evaluation.exporterCourbe(
+            resume, configuration["courbe"] or os.path.join(manifeste["dossier"], "evaluation.json"))
+        retenus = [couple for couple in retenus if couple[2] >= seuil]
+    parseRdf.openResultFile(retenus, configuration["sortie"])
+    if configuration["rapport"]:
+        with open(configuration["rapport"], "w") as f:
+            json.dump({"fragments": [dict(sortie["rapport"], indice=sortie["indice"]) for sortie in sorties]}, f,
+                      indent=2)
+    return retenus
+
+
+def lancer(chemin, nbProcessus=1, forcer=False):
+    """Exécute chaque fragment à refaire dans son propre processus, au plus nbProcessus à la fois, puis fusionne"""
+    manifeste = lireManifeste(chemin)
+    aFaire = [f["indice"] for f in manifeste["fragments"]] if forcer else manquants(manifeste)
+    commande = [sys.executable, os.path.abspath(__file__), "executer", chemin]
+    if forcer:
+        commande.append("--forcer")
+    enCours = []
+    echecs = []
+    while aFaire or enCours:
+        while aFaire and len(enCours) < nbProcessus:
+            indice = aFaire.pop(0)
+            enCours.append((indice, subprocess.Popen(commande + [str(indice)])))
+        indice, processus = enCours.pop(0)
+        if processus.wait() != 0:
+            echecs.append(indice)
+    if echecs:
+        raise ValueError("fragments en échec (à relancer) : " + ", ".join(map(str, sorted(echecs))))
+    return fusionner(manifeste)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Liage découpé en fragments exécutés séparément puis fusionnés")
+    commandes = parser.add_subparsers(dest="commande", required=True)
+    commande = commandes.add_parser("preparer", help="écrit le manifeste (options de lier.py après --)")
+    commande.add_argument("manifeste")
+    commande.add_argument("--fragments", type=int, required=True)
+    commande.add_argument("--dossier", default=None, help="dossier des sorties des fragments")
+    commande = commandes.add_parser("executer", help="exécute un fragment")
+    commande.add_argument("manifeste")
+    commande.add_argument("indice", type=int)
+    commande.add_argument("--forcer", action="store_true", help="recalcule même une sortie à jour")
+    commande = commandes.add_parser("fusionner", help="réunit les sorties des fragments")
+    commande.add_argument("manifeste")
+    commande = commandes.add_parser("lancer", help="exécute les fragments manquants en processus locaux puis fusionne")
+    commande.add_argument("manifeste")
+    commande.add_argument("--processus", type=int, default=1)
+    commande.add_argument("--forcer", action="store_true")
+    arguments = list(sys.argv[1:] if arguments is None else arguments)
+    # Ce qui suit -- est transmis tel quel à lier.lireConfiguration
+    options = []
+    if "--" in arguments:
+        i = arguments.index("--")
+        arguments, options = arguments[:i], arguments[i + 1:]
+    args = parser.parse_args(arguments)
+
+    try:
+        if args.commande == "preparer":
+            manifeste = preparer(args.manifeste, args.fragments, lier.lireConfiguration(options), args.dossier)
+            print("%d fragments décrits dans %s" % (len(manifeste["fragments"]), args.manifeste), file=sys.stderr)
+        elif args.commande == "executer":
+            manifeste = lireManifeste(args.manifeste)
+            if not 0 <= args.indice < len(manifeste["fragments"]):
+                parser.error("indice de fragment hors du manifeste : %d" % args.indice)
+            if not executer(manifeste, args.indice, args.forcer):
+                print("fragment %d déjà à jour" % args.indice, file=sys.stderr)
+        else:
+            if args.commande == "fusionner":
+                resultats = fusionner(lireManifeste(args.manifeste))
+            else:
+                resultats = lancer(args.manifeste, args.processus, args.forcer)
+            print("%d couples écrits" % len(resultats), file=sys.stderr)
+    except (OSError, ValueError) as e:
+        print("erreur : %s" % e, file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
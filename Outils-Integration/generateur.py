@@ -0,0 +1,140 @@
+import argparse
+import os
+import random
+import uuid
+
+from rdflib import BNode, Literal, URIRef
+from rdflib.namespace import RDF
+from rdflib.plugins.serializers.nt import _nt_row
+from rdflib.util import guess_format
+
+import parseRdf
+from extraction import classeF22
+from loader import chargerGraphe
+
+# Jeu DOREMUS fourni, multiplié par generer : lu à côté de ce module, jamais dans le graphe chargé par parseRdf
+dossierModule = os.path.dirname(os.path.abspath(__file__))
+sourceParDefaut = os.path.join(dossierModule, "source.ttl")
+cibleParDefaut = os.path.join(dossierModule, "cible.ttl")
+referenceParDefaut = os.path.join(dossierModule, "referenceFile")
+
+alphabet = "abcdefghijklmnopqrstuvwxyzéèàç0123456789 "
+
+
+def perturber(texte, alea):
+    """Applique une faute de frappe (suppression, insertion ou substitution d'un caractère)"""
+    if not texte:
+        return texte
+    i = alea.randrange(len(texte))
+    choix = alea.random()
+    if choix < 1 / 3:
+        return texte[:i] + texte[i + 1:]
+    if choix < 2 / 3:
+        return texte[:i] + alea.choice(alphabet) + texte[i:]
+    return texte[:i] + alea.choice(alphabet) + texte[i + 1:]
+
+
+def copieUri(uri, k):
+    # La copie 0 garde l'URI d'origine pour rester alignée avec referenceFile
+    if k == 0:
+        return uri
+    return URIRef("http://data.doremus.org/expression/" + str(uuid.uuid5(uuid.NAMESPACE_URL, "%s#%d" % (uri, k))))
+
+
+class EcrivainNTriples:
+    def __init__(self, fichier):
+        self.fichier = fichier
+        self.compteurBNode = 0
+        self.triples = 0
+
+    def nouveauBNode(self):
+        self.compteurBNode += 1
+        return BNode("b%d" % self.compteurBNode)
+
+    def ecrire(self, s, p, o):
+        # _nt_row échappe les littéraux multilignes, contrairement à n3()
+        self.fichier.write(_nt_row((s, p, o)))
+        self.triples += 1
+
+
+def copierRessource(graphe, ecrivain, sujet, nouveauSujet, alea, tauxPerturbation, profondeur=3):
+    for p, o in graphe.predicate_objects(sujet):
+        if isinstance(o, BNode):
+            if profondeur == 0:
+                continue
+            nouveau = ecrivain.nouveauBNode()
+            ecrivain.ecrire(nouveauSujet, p, nouveau)
+            copierRessource(graphe, ecrivain, o, nouveau, alea, tauxPerturbation, profondeur - 1)
+            continue
+        if isinstance(o, Literal) and alea.random() < tauxPerturbation:
+            o = Literal(perturber(str(o), alea), lang=o.language, datatype=o.datatype)
+        ecrivain.ecrire(nouveauSujet, p, o)
+
+
+def ecrireGraphe(graphe, chemin, facteur, alea, tauxPerturbation):
+    ressources = sorted(set(graphe.subjects(RDF.type, classeF22)), key=str)
+    with open(chemin, "w", encoding="utf-8") as f:
+        ecrivain = EcrivainNTriples(f)
+        for k in range(facteur):
+            for ressource in ressources:
+                copie = copieUri(ressource, k)
+                copierRessource(graphe, ecrivain, ressource, copie, alea, tauxPerturbation)
+    return len(ressources) * facteur, ecrivain.triples
+
+
+def ecrireReference(reference, chemin, facteur):
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+        f.write('<rdf:RDF xmlns="http://knowledgeweb.semanticweb.org/heterogeneity/alignment"\n')
+        f.write('xmlns:rdf="http://www.w3.org/1999/02/22-rdf-syntax-ns#"\n')
+        f.write('xmlns:xsd="http://www.w3.org/2001/XMLSchema#">\n<Alignment>\n<xml>yes</xml>\n<level>0</level>\n<type>??</type>\n')
+        for k in range(facteur):
+            for r1, r2 in reference:
+                f.write("<map>\n<Cell>\n")
+                f.write('<entity1 rdf:resource="%s"/>\n' % copieUri(URIRef(r1), k))
+                f.write('<entity2 rdf:resource="%s"/>\n' % copieUri(URIRef(r2), k))
+                f.write('<measure rdf:datatype="xsd:float">1.0</measure>\n<relation>=</relation>\n</Cell>\n</map>\n')
+        f.write("</Alignment>\n</rdf:RDF>\n")
+
+
+def generer(facteur, dossier, graine=42, tauxPerturbation=0.1, source=None, cible=None, fichierRef=None):
+    """
+    Écrit dans dossier source.nt, cible.nt et referenceFile : facteur copies des expressions F22
+    de source et cible (par défaut le jeu fourni avec le module, quel que soit le graphe chargé par parseRdf),
+    les littéraux cibles étant perturbés avec la probabilité tauxPerturbation.
+    """
+    source = source or sourceParDefaut
+    cible = cible or cibleParDefaut
+    fichierRef = fichierRef or referenceParDefaut
+    alea = random.Random(graine)
+    os.makedirs(dossier, exist_ok=True)
+    with open(fichierRef, "r") as fileRef:
+        reference = parseRdf.lireReference(fileRef.readlines())
+    nbSource, triplesSource = ecrireGraphe(chargerGraphe(source, guess_format(source) or "turtle"),
+                                           os.path.join(dossier, "source.nt"), facteur, alea, 0.0)
+    nbCible, triplesCible = ecrireGraphe(chargerGraphe(cible, guess_format(cible) or "turtle"),
+                                         os.path.join(dossier, "cible.nt"), facteur, alea, tauxPerturbation)
+    ecrireReference(reference, os.path.join(dossier, "referenceFile"), facteur)
+    return {
+        "facteur": facteur,
+        "ressourcesSource": nbSource,
+        "ressourcesCible": nbCible,
+        "triplesSource": triplesSource,
+        "triplesCible": triplesCible,
+        "alignements": len(reference) * facteur,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un jeu de données DOREMUS synthétique avec son alignement")
+    parser.add_argument("--facteur", type=int, default=10)
+    parser.add_argument("--dossier", default=None)
+    parser.add_argument("--graine", type=int, default=42)
+    parser.add_argument("--perturbation", type=float, default=0.1)
+    parser.add_argument("--source", default=None, help="jeu source à multiplier (source.ttl du module par défaut)")
+    parser.add_argument("--cible", default=None, help="jeu cible à multiplier (cible.ttl du module par défaut)")
+    parser.add_argument("--reference", default=None,
+                        help="alignement de référence (referenceFile du module par défaut)")
+    args = parser.parse_args()
+    dossier = args.dossier or "donnees_x%d" % args.facteur
+    print(generer(args.facteur, dossier, args.graine, args.perturbation, args.source, args.cible, args.reference))
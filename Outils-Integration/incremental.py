@@ -0,0 +1,139 @@
+import hashlib
+import json
+import sqlite3
+from itertools import groupby
+
+schema = """
+CREATE TABLE IF NOT EXISTS configuration (signature TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS empreintes (
+    cote TEXT NOT NULL,
+    ressource TEXT NOT NULL,
+    empreinte BLOB NOT NULL,
+    PRIMARY KEY (cote, ressource)
+);
+CREATE TABLE IF NOT EXISTS scores (
+    source TEXT NOT NULL,
+    cible TEXT NOT NULL,
+    prop TEXT NOT NULL,
+    somme REAL NOT NULL,
+    nombre INTEGER NOT NULL,
+    maximum REAL NOT NULL,
+    PRIMARY KEY (source, cible, prop)
+);
+CREATE INDEX IF NOT EXISTS scoresCible ON scores (cible);
+"""
+
+
+def signature(**parametres):
+    """Paramètres dont dépendent les scores stockés : s'ils changent, le magasin est vidé"""
+    return json.dumps(parametres, sort_keys=True, default=str)
+
+
+def empreintesRessources(extractions, cote):
+    """Empreinte de l'ensemble des (propriété, valeur) de chaque ressource ; cote vaut 1 (source) ou 2 (cible)"""
+    valeurs = {}
+    for extraction in extractions:
+        prop = str(extraction[0])
+        for ressource, valeur in extraction[cote]:
+            valeurs.setdefault(str(ressource), []).append(prop + "\t" + valeur.n3())
+    return {ressource: hashlib.blake2b("\n".join(sorted(lignes)).encode(), digest_size=16).digest()
+            for ressource, lignes in valeurs.items()}
+
+
+def differences(anciennes, nouvelles):
+    """Ressources ajoutées ou modifiées, et ressources supprimées"""
+    modifiees = {r for r, e in nouvelles.items() if anciennes.get(r) != e}
+    supprimees = set(anciennes) - set(nouvelles)
+    return modifiees, supprimees
+
+
+def agreger(accumulateurs, mode="moyenne", poids=None):
+    """Même agrégation que aggregation.Agregateur à partir des sommes par propriété"""
+    poids = poids if poids is not None else {}
+    for source, cible, parProp in accumulateurs:
+        if mode == "max":
+            yield source, cible, max(maximum for somme, nombre, maximum in parProp.values())
+            continue
+        total = 0.0
+        nb = 0.0
+        for prop, (somme, nombre, maximum) in parProp.items():
+            w = poids.get(prop, 1.0) if mode == "pondere" else 1.0
+            total += somme * w
+            nb += nombre * w
+        yield source, cible, total / nb if nb else 0.0
+
+
+class MagasinScores:
+    """
+    Base SQLite des empreintes de ressources et des scores par couple et par propriété d'une exécution
+    à l'autre. Chaque propriété d'un couple garde (somme, nombre, maximum) de ses scores, ce qui suffit
+    à reconstituer toutes les agrégations.
+    """
+
+    def __init__(self, chemin="scores.sqlite"):
+        self.chemin = chemin
+        self.connexion = sqlite3.connect(chemin)
+        self.connexion.executescript(schema)
+
+    def signature(self):
+        ligne = self.connexion.execute("SELECT signature FROM configuration").fetchone()
+        return ligne[0] if ligne else None
+
+    def reinitialiser(self, nouvelleSignature):
+        self.connexion.execute("DELETE FROM configuration")
+        self.connexion.execute("DELETE FROM empreintes")
+        self.connexion.execute("DELETE FROM scores")
+        self.connexion.execute("INSERT INTO configuration VALUES (?)", (nouvelleSignature,))
+
+    def empreintes(self, cote):
+        return dict(self.connexion.execute("SELECT ressource, empreinte FROM empreintes WHERE cote = ?", (cote,)))
+
+    def majEmpreintes(self, cote, empreintes, modifiees, supprimees):
+        self.connexion.executemany("DELETE FROM empreintes WHERE cote = ? AND ressource = ?",
+                                   ((cote, r) for r in supprimees))
+        self.connexion.executemany("INSERT OR REPLACE INTO empreintes VALUES (?, ?, ?)",
+                                   ((cote, r, empreintes[r]) for r in modifiees))
+
+    def supprimerCouples(self, sources, cibles):
+        """Retire les scores des couples dont la source ou la cible a changé ou disparu"""
+        self.connexion.executemany("DELETE FROM scores WHERE source = ?", ((r,) for r in sources))
+        self.connexion.executemany("DELETE FROM scores WHERE cible = ?", ((r,) for r in cibles))
+
+    def ajouterScores(self, scores, manquants=None):
+        """
+        scores : (ressourceS, ressourceC, prop, score) ; plusieurs couples de valeurs par propriété s'additionnent.
+        manquants (voir aggregation.Agregateur) ajoute aux couples reçus leurs couples de valeurs de score nul.
+        """
+        table = {}
+        couples = {}
+        for ressourceS, ressourceC, prop, score in scores:
+            cle = (str(ressourceS), str(ressourceC), str(prop))
+            courant = table.get(cle)
+            table[cle] = (score, 1, score) if courant is None else \
+                (courant[0] + score, courant[1] + 1, max(courant[2], score))
+            if manquants is not None:
+                couples[(ressourceS, ressourceC)] = None
+        for ressourceS, ressourceC in couples:
+            for prop, n in manquants(ressourceS, ressourceC).items():
+                cle = (str(ressourceS), str(ressourceC), str(prop))
+                courant = table.get(cle)
+                table[cle] = (0.0, n, 0.0) if courant is None else (courant[0], courant[1] + n, max(courant[2], 0.0))
+        self.connexion.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?, ?)",
+                                   (cle + acc for cle, acc in table.items()))
+        return len(table)
+
+    def accumulateurs(self):
+        """(source, cible, {prop: (somme, nombre, maximum)}) pour chaque couple stocké"""
+        lignes = self.connexion.execute(
+            "SELECT source, cible, prop, somme, nombre, maximum FROM scores ORDER BY source, cible")
+        for (source, cible), groupe in groupby(lignes, key=lambda ligne: (ligne[0], ligne[1])):
+            yield source, cible, {prop: (somme, nombre, maximum) for s, c, prop, somme, nombre, maximum in groupe}
+
+    def valider(self):
+        self.connexion.commit()
+
+    def annuler(self):
+        self.connexion.rollback()
+
+    def fermer(self):
+        self.connexion.close()
@@ -0,0 +1,156 @@
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+journal = logging.getLogger("outils_integration")
+
+
+def picMemoire():
+    """Pic de mémoire résidente du processus, en octets (None si indisponible)"""
+    if resource is None:
+        return None
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sous macOS, en kilo-octets sous Linux
+    return pic if sys.platform == "darwin" else pic * 1024
+
+
+class Echantillonneur:
+    """Profileur par échantillonnage : relève périodiquement la pile d'un thread dans un thread annexe"""
+
+    def __init__(self, intervalle=0.005, profondeur=1):
+        self.intervalle = intervalle
+        self.profondeur = profondeur
+        self.echantillons = Counter()
+        self.cible = None
+        self.arret = threading.Event()
+        self.thread = None
+
+    def demarrer(self):
+        self.cible = threading.get_ident()
+        self.arret.clear()
+        self.thread = threading.Thread(target=self._boucle, daemon=True)
+        self.thread.start()
+
+    def arreter(self):
+        self.arret.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def enCours(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def _boucle(self):
+        while not self.arret.wait(self.intervalle):
+            frame = sys._current_frames().get(self.cible)
+            pile = []
+            while frame is not None and len(pile) < self.profondeur:
+                code = frame.f_code
+                pile.append("%s:%s:%s" % (code.co_filename.rsplit("/", 1)[-1], code.co_name, frame.f_lineno))
+                frame = frame.f_back
+            if pile:
+                self.echantillons[" <- ".join(pile)] += 1
+
+    def plusFrequents(self, n=20):
+        return [{"pile": pile, "echantillons": nb} for pile, nb in self.echantillons.most_common(n)]
+
+
+class Instrumentation:
+    """
+    Temps, nombre d'appels et compteurs de chaque étape de la chaîne de liage.
+    Les étapes sont toujours chronométrées ; le détail par mesure (un chronométrage par appel) n'est
+    relevé que si actif est vrai (lier --profil).
+    """
+
+    def __init__(self, actif=False):
+        self.actif = actif
+        self.echantillonneur = None
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        self.etapes = {}
+        self.compteurs = Counter()
+        # Un échantillonnage en cours (profil) continue, sans les échantillons déjà relevés
+        if self.echantillonneur is not None and self.echantillonneur.enCours():
+            self.echantillonneur.echantillons.clear()
+        else:
+            self.echantillonneur = None
+
+    def instantane(self):
+        """Copie des étapes et compteurs relevés jusqu'ici, à remettre avec fusionner après un reinitialiser"""
+        return {nom: dict(stats) for nom, stats in self.etapes.items()}, Counter(self.compteurs)
+
+    def fusionner(self, instantane):
+        etapes, compteurs = instantane
+        for nom, stats in etapes.items():
+            self.ajouterDuree(nom, stats["duree"], stats["appels"])
+        self.compteurs.update(compteurs)
+
+    @contextmanager
+    def etape(self, nom):
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.ajouterDuree(nom, time.perf_counter() - debut)
+
+    def ajouterDuree(self, nom, duree, appels=1):
+        stats = self.etapes.get(nom)
+        if stats is None:
+            stats = {"duree": 0.0, "appels": 0}
+            self.etapes[nom] = stats
+        stats["duree"] += duree
+        stats["appels"] += appels
+
+    def compter(self, nom, n=1):
+        self.compteurs[nom] += n
+
+    def mesurer(self, nom, fonction, *args):
+        """Appelle fonction en relevant sa durée sous le nom de la mesure si l'instrumentation est active"""
+        if not self.actif:
+            return fonction(*args)
+        debut = time.perf_counter()
+        res = fonction(*args)
+        self.ajouterDuree("mesure:" + nom, time.perf_counter() - debut)
+        return res
+
+    @contextmanager
+    def profil(self, intervalle=0.005, profondeur=1):
+        """Échantillonne la pile du thread courant pendant le bloc"""
+        self.echantillonneur = Echantillonneur(intervalle, profondeur)
+        self.echantillonneur.demarrer()
+        try:
+            yield self.echantillonneur
+        finally:
+            self.echantillonneur.arreter()
+
+    def rapport(self):
+        rapport = {
+            "etapes": self.etapes,
+            "compteurs": dict(self.compteurs),
+            "picMemoire": picMemoire(),
+        }
+        if self.echantillonneur is not None:
+            rapport["profil"] = self.echantillonneur.plusFrequents()
+        return rapport
+
+    def exporterJson(self, chemin):
+        with open(chemin, "w") as f:
+            json.dump(self.rapport(), f, indent=2)
+
+    def journaliser(self, niveau=logging.INFO):
+        """Écrit une ligne de journal JSON par étape puis une pour les compteurs"""
+        for nom, stats in self.etapes.items():
+            journal.log(niveau, json.dumps(dict(stats, etape=nom)))
+        journal.log(niveau, json.dumps({"compteurs": dict(self.compteurs), "picMemoire": picMemoire()}))
+
+
+instr = Instrumentation()
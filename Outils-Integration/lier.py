@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import json
+import sys
+
+# Identifiants des mesures attendus par parseRdf.compare (mêmes numéros que les cases de main.py)
+idsMesures = {
+    "jaro": 0,
+    "jarowinkler": 1,
+    "identity": 2,
+    "levenshtein": 3,
+    "qgrams": 4,
+    "mongeelkan": 5,
+    "jaccard": 6,
+    "tfidf": 7,
+}
+
+# Valeurs par défaut, écrasées par le fichier de configuration puis par la ligne de commande
+configurationParDefaut = {
+    "source": "source.ttl",
+    "cible": "cible.ttl",
+    "proprietes": None,
+    "mesures": ["jaro"],
+    "seuil": 0.8,
+    "sortie": "resultat.ttl",
+    "blocage": False,
+    "tailleMaxBloc": None,
+    "processus": 1,
+    "bornes": False,
+    "cascade": False,
+    "flux": False,
+    "colonnes": False,
+    "deuxPasses": False,
+    "profil": False,
+    "rapport": None,
+    "reference": None,
+    "courbe": None,
+    "magasin": None,
+    "k": None,
+    "unAUn": None,
+    "tolerances": {},
+    "fenetre": None,
+    "interne": "jaro",
+    "minhash": None,
+    "taillePage": 10000,
+    "connexions": 4,
+    "cacheSparql": True,
+}
+
+# Mesures internes possibles pour Monge-Elkan
+mesuresInternes = ["jaro", "jarowinkler", "levenshtein", "qgrams", "identity"]
+
+
+def idMesure(nom):
+    cle = nom.lower().replace("_", "").replace("-", "")
+    if cle.isdigit() and int(cle) in idsMesures.values():
+        return int(cle)
+    if cle not in idsMesures:
+        raise ValueError("mesure inconnue : %s (disponibles : %s)" % (nom, ", ".join(idsMesures)))
+    return idsMesures[cle]
+
+
+def resoudreProprietes(noms, disponibles, chemins=None):
+    """
+    Accepte des URI complètes, des noms locaux (P102_has_title) résolus parmi les propriétés disponibles
+    et les noms des chemins de extraction.chemins (opus, catalogue, date)
+    """
+    chemins = chemins or {}
+    proprietes = []
+    for nom in noms:
+        if nom in chemins:
+            proprietes.append(chemins[nom])
+            continue
+        if "://" in nom:
+            proprietes.append(nom)
+            continue
+        trouvees = [str(p) for p in disponibles if str(p).rsplit("#", 1)[-1].rsplit("/", 1)[-1] == nom]
+        if not trouvees:
+            raise ValueError("propriété introuvable dans les données : %s" % nom)
+        proprietes += trouvees
+    return proprietes
+
+
+def lireConfiguration(arguments=None):
+    parser = argparse.ArgumentParser(description="Liage de deux jeux RDF sans interface graphique")
+    parser.add_argument("--config", default=None, help="fichier JSON reprenant les options ci-dessous")
+    parser.add_argument("--source", default=None, help="fichier RDF ou URL d'un point d'accès SPARQL")
+    parser.add_argument("--cible", default=None, help="fichier RDF ou URL d'un point d'accès SPARQL")
+    parser.add_argument("--proprietes", nargs="+", default=None,
+                        help="URI ou noms locaux des propriétés à comparer (toutes par défaut)")
+    parser.add_argument("--mesures", nargs="+", default=None, help=", ".join(idsMesures))
+    parser.add_argument("--seuil", type=float, default=None)
+    parser.add_argument("--sortie", default=None)
+    parser.add_argument("--blocage", action="store_true", default=None)
+    parser.add_argument("--taille-max-bloc", dest="tailleMaxBloc", type=int, default=None)
+    parser.add_argument("--processus", type=int, default=None)
+    parser.add_argument("--bornes", action="store_true", default=None,
+                        help="noyaux bornés par le seuil (scores sous le seuil ramenés à 0)")
+    parser.add_argument("--cascade", action="store_true", default=None,
+                        help="mesures les moins coûteuses d'abord, couples abandonnés dès qu'ils ne peuvent "
+                             "plus atteindre le seuil (scores retenus inchangés)")
+    parser.add_argument("--flux", action="store_true", default=None,
+                        help="lecture filtrée en flux des fichiers (propriétés à donner en URI complètes)")
+    parser.add_argument("--colonnes", action="store_true", default=None,
+                        help="données internées en colonnes d'entiers (lues en flux avec --flux)")
+    parser.add_argument("--deux-passes", dest="deuxPasses", action="store_true", default=None,
+                        help="avec --flux, relève d'abord les ressources typées : rien n'est mis en attente")
+    parser.add_argument("--rapport", default=None, help="fichier JSON du rapport d'instrumentation")
+    parser.add_argument("--profil", action="store_true", default=None,
+                        help="chronomètre chaque mesure et échantillonne la pile pendant la comparaison (voir --rapport)")
+    parser.add_argument("--reference", default=None,
+                        help="alignement de référence : évalue tous les seuils en une seule comparaison")
+    parser.add_argument("--courbe", default=None, help="fichier JSON de la courbe précision/rappel (avec --reference)")
+    parser.add_argument("--top-k", dest="k", type=int, default=None, help="au plus k cibles par source")
+    parser.add_argument("--un-a-un", dest="unAUn", choices=["glouton", "optimal"], default=None,
+                        help="affectation un-à-un des couples retenus")
+    parser.add_argument("--tolerance", nargs="+", default=None, metavar="TYPE=ECART",
+                        help="écart toléré par type comparé par voisinage trié (nombre, catalogue, date en années)")
+    parser.add_argument("--fenetre", type=int, default=None, help="nombre maximal de voisins par valeur source")
+    parser.add_argument("--interne", choices=mesuresInternes, default=None,
+                        help="mesure appliquée aux couples de jetons par Monge-Elkan")
+    parser.add_argument("--minhash", type=int, default=None, metavar="PERMUTATIONS",
+                        help="avec jaccard pour seule mesure, jointure approchée MinHash-LSH (128 permutations usuelles)")
+    parser.add_argument("--taille-page", dest="taillePage", type=int, default=None,
+                        help="résultats par page demandés aux points d'accès SPARQL")
+    parser.add_argument("--connexions", type=int, default=None,
+                        help="pages demandées en parallèle à un point d'accès SPARQL")
+    parser.add_argument("--sans-cache-sparql", dest="cacheSparql", action="store_false", default=None,
+                        help="redemande les pages même si elles sont dans le cache local")
+    parser.add_argument("--magasin", default=None,
+                        help="base SQLite des scores : seules les ressources ajoutées ou modifiées sont recomparées")
+    args = parser.parse_args(arguments)
+
+    configuration = dict(configurationParDefaut)
+    if args.config:
+        with open(args.config) as f:
+            fichier = json.load(f)
+        inconnues = set(fichier) - set(configuration)
+        if inconnues:
+            parser.error("clés inconnues dans %s : %s" % (args.config, ", ".join(sorted(inconnues))))
+        configuration.update(fichier)
+    for cle, valeur in vars(args).items():
+        if cle not in ("config", "tolerance") and valeur is not None:
+            configuration[cle] = valeur
+    configuration["tolerances"] = dict(configuration["tolerances"])
+    for tolerance in args.tolerance or []:
+        typeValeur, _, ecart = tolerance.partition("=")
+        try:
+            configuration["tolerances"][typeValeur] = float(ecart)
+        except ValueError:
+            parser.error("--tolerance attend TYPE=ECART : " + tolerance)
+    try:
+        configuration["mesures"] = [idMesure(str(m)) for m in configuration["mesures"]]
+    except ValueError as e:
+        parser.error(str(e))
+    if configuration["flux"] and configuration["proprietes"] and \
+            any("://" not in p for p in configuration["proprietes"]):
+        parser.error("--flux demande des URI complètes pour --proprietes")
+    if configuration["magasin"] and configuration["reference"]:
+        parser.error("--magasin et --reference ne se combinent pas")
+    if configuration["magasin"] and configuration["processus"] != 1:
+        parser.error("--magasin ne compare qu'en série")
+    return configuration
+
+
+def charger(configuration):
+    """
+    Charge source et cible et applique les réglages de la configuration ;
+    renvoie les propriétés à comparer et les options de parseRdf.compare
+    """
+    # parseRdf charge rdflib et les mesures : importé seulement une fois les arguments validés
+    import parseRdf
+
+    entrees = (("source", configuration["source"]), ("cible", configuration["cible"]))
+    distantes = [parseRdf.sparql.estPointAcces(chemin) for cote, chemin in entrees]
+    parseRdf.streaming.setDeuxPasses(configuration["deuxPasses"])
+    if configuration["flux"] and configuration["colonnes"] and not any(distantes):
+        parseRdf.chargerEnColonnes(configuration["source"], configuration["cible"], configuration["proprietes"])
+    else:
+        # Les noms locaux de propriétés ne sont résolus qu'après extraction : le point d'accès renvoie tout
+        proprietes = configuration["proprietes"]
+        if proprietes and any("://" not in p for p in proprietes):
+            proprietes = None
+        for (cote, chemin), distante in zip(entrees, distantes):
+            if distante:
+                parseRdf.chargerDistant(chemin, cote, proprietes, configuration["taillePage"],
+                                        configuration["connexions"], configuration["cacheSparql"])
+            elif configuration["flux"]:
+                parseRdf.chargerEnFlux(chemin, cote, configuration["proprietes"])
+            elif cote == "source":
+                parseRdf.setFichierSource(chemin)
+            else:
+                parseRdf.setFichierCible(chemin)
+
+    for typeValeur, ecart in configuration["tolerances"].items():
+        if typeValeur not in parseRdf.tolerances:
+            raise ValueError("type inconnu pour --tolerance : " + typeValeur)
+        parseRdf.tolerances[typeValeur] = ecart
+    parseRdf.fenetreVoisinage = configuration["fenetre"]
+    parseRdf.mesureInterneMongeElkan = {
+        "jaro": parseRdf.Jaro, "jarowinkler": parseRdf.JaroWinkler, "levenshtein": parseRdf.Levenshtein,
+        "qgrams": parseRdf.QGrams, "identity": parseRdf.Identity}[configuration["interne"]]
+    parseRdf.permutationsMinHash = configuration["minhash"]
+
+    noms = configuration["proprietes"]
+    chemins = parseRdf.extraction.chemins
+    if noms and all("://" in p or p in chemins for p in noms):
+        proprietes = resoudreProprietes(noms, [], chemins)
+    else:
+        disponibles = parseRdf.getAllProperty()
+        proprietes = resoudreProprietes(noms, disponibles, chemins) if noms else [str(p) for p in disponibles]
+    if configuration["colonnes"] and parseRdf.magasinColonnes is None:
+        # Les graphes ne servent qu'à remplir le magasin puis sont libérés
+        parseRdf.colonnesDepuisGraphes(proprietes)
+        parseRdf.sourceParesseuse.liberer()
+        parseRdf.cibleParesseuse.liberer()
+
+    blocage = parseRdf.blocking.clesParDefaut if configuration["blocage"] else None
+    options = {"blocage": blocage, "tailleMaxBloc": configuration["tailleMaxBloc"],
+               "nbProcessus": configuration["processus"], "bornes": configuration["bornes"],
+               "cascade": configuration["cascade"],
+               "k": configuration["k"], "unAUn": configuration["unAUn"]}
+    return proprietes, options
+
+
+def lier(configuration):
+    import parseRdf
+    from instrumentation import instr
+
+    proprietes, options = charger(configuration)
+    # compare remet l'instrumentation à zéro : les étapes du chargement sont rajoutées ensuite au rapport
+    chargement = instr.instantane()
+    instr.actif = configuration["profil"]
+    with instr.profil() if configuration["profil"] else contextlib.nullcontext():
+        if configuration["reference"]:
+            # Tous les couples agrégés sont gardés pour l'évaluation, seuls ceux au-dessus du seuil sont écrits
+            couples, resume = parseRdf.evaluerSeuils(proprietes, configuration["mesures"], configuration["reference"],
+                                                     **options)
+            resultats = [couple for couple in couples if couple[2] >= configuration["seuil"]]
+            afficherEvaluation(resume, configuration["seuil"])
+            if configuration["courbe"]:
+                parseRdf.evaluation.exporterCourbe(resume, configuration["courbe"])
+        elif configuration["magasin"]:
+            del options["nbProcessus"]
+            # Les scores stockés doivent rester complets : pas de cascade avec le magasin
+            del options["cascade"]
+            magasin = parseRdf.incremental.MagasinScores(configuration["magasin"])
+            try:
+                resultats = parseRdf.compareIncremental(proprietes, configuration["seuil"], configuration["mesures"],
+                                                        magasin, **options)
+            finally:
+                magasin.fermer()
+        else:
+            resultats = parseRdf.compare(proprietes, configuration["seuil"], configuration["mesures"], **options)
+    instr.fusionner(chargement)
+    parseRdf.openResultFile(resultats, configuration["sortie"])
+    if configuration["rapport"]:
+        instr.exporterJson(configuration["rapport"])
+    return resultats
+
+
+def afficherEvaluation(resume, seuil):
+    # Dernier point dont le seuil est atteint par les couples écrits
+    courant = None
+    for point in resume["courbe"]:
+        if point["seuil"] < seuil:
+            break
+        courant = point
+    meilleur = resume["meilleur"]
+    for nom, point in (("seuil %.3f" % seuil, courant), ("meilleur seuil", meilleur)):
+        if point is not None:
+            print("%s : seuil=%.4f précision=%.4f rappel=%.4f F1=%.4f" % (
+                nom, point["seuil"], point["precision"], point["rappel"], point["fMesure"]), file=sys.stderr)
+
+
+def main(arguments=None):
+    configuration = lireConfiguration(arguments)
+    try:
+        resultats = lier(configuration)
+    except (OSError, ValueError) as e:
+        print("erreur : %s" % e, file=sys.stderr)
+        return 1
+    print("%d couples écrits dans %s" % (len(resultats), configuration["sortie"]), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import hashlib
+import os
+import pickle
+
+import rdflib as rdf
+
+from instrumentation import instr
+
+# À incrémenter si le format de l'instantané change
+versionInstantane = 1
+versionParseur = "rdflib-%s-%d" % (rdf.__version__, versionInstantane)
+dossierCache = os.environ.get("OUTILS_INTEGRATION_CACHE", ".cache_graphes")
+
+
+def empreinte(chemin, format):
+    """Empreinte du contenu du fichier, du format et de la version du parseur"""
+    h = hashlib.sha256()
+    h.update(versionParseur.encode())
+    h.update(format.encode())
+    with open(chemin, "rb") as f:
+        for bloc in iter(lambda: f.read(1 << 20), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def chargerGraphe(chemin, format="turtle", cache=True):
+    """Charge un graphe RDF, depuis l'instantané binaire s'il existe pour ce contenu"""
+    if not cache:
+        graphe = rdf.Graph()
+        graphe.parse(chemin, format=format)
+        return graphe
+    cle = empreinte(chemin, format)
+    instantane = os.path.join(dossierCache, cle + ".pickle")
+    if os.path.exists(instantane):
+        try:
+            with open(instantane, "rb") as f:
+                return pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            # Instantané corrompu ou incompatible : on reparse
+            pass
+    graphe = rdf.Graph()
+    graphe.parse(chemin, format=format)
+    os.makedirs(dossierCache, exist_ok=True)
+    temporaire = instantane + ".%d.tmp" % os.getpid()
+    with open(temporaire, "wb") as f:
+        pickle.dump(graphe, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temporaire, instantane)
+    return graphe
+
+
+class GrapheParesseux:
+    """Graphe chargé au premier accès, depuis un chemin modifiable à l'exécution"""
+
+    def __init__(self, chemin, format="turtle"):
+        self.chemin = chemin
+        self.format = format
+        self.graphe = None
+
+    def setChemin(self, chemin, format=None):
+        if chemin != self.chemin or (format is not None and format != self.format):
+            self.chemin = chemin
+            if format is not None:
+                self.format = format
+            self.graphe = None
+
+    def get(self):
+        if self.graphe is None:
+            with instr.etape("chargement"):
+                self.graphe = chargerGraphe(self.chemin, self.format)
+        return self.graphe
+
+    def liberer(self):
+        # Le graphe sera relu (depuis l'instantané) au prochain accès
+        self.graphe = None
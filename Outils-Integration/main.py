@@ -1,4 +1,5 @@
 import rdflib
+import threading
 import tkinter as tk
 from tkinter import StringVar, filedialog
 from tkinter.ttk import *
@@ -7,9 +8,13 @@ import tkinter.ttk as ttk
 import command
 import bridge
 import parseRdf
+import suivi
 
 pont = bridge.Bridge()
 
+# Liage en cours : le calcul tourne dans un thread, l'interface relit son avancement périodiquement
+travail = {"thread": None, "suivi": None, "resultat": None, "erreur": None}
+
 propertySelected = []
 
 def get_last_part_of_url(urls):
@@ -27,8 +32,63 @@ def find_url_by_last_part(urls, last_part):#Fonction inverse de get_last_part_of
     return None
 
 def confirm(properties, seuil, measures):
-    result = parseRdf.compare(properties, float(seuil), measures)
-    parseRdf.openResultFile(result)
+    if travail["thread"] is not None and travail["thread"].is_alive():
+        return
+    try:
+        seuil = float(seuil)
+    except (TypeError, ValueError):
+        label_avancement.config(text="Seuil invalide")
+        return
+    travail.update(suivi=suivi.Suivi(), resultat=None, erreur=None)
+    travail["thread"] = threading.Thread(target=lier, args=(list(properties), seuil, list(measures), travail["suivi"]),
+                                         daemon=True)
+    for bouton in (confirmButton, sourceValider, cibleValider, addPorpertyButton):
+        bouton.config(state=tk.DISABLED)
+    annulerButton.config(state=tk.NORMAL)
+    travail["thread"].start()
+    rafraichirAvancement()
+
+
+def lier(properties, seuil, measures, suiviLiage):
+    """Exécuté dans le thread de travail : ne touche pas aux widgets Tk"""
+    try:
+        result = parseRdf.compare(properties, seuil, measures, suivi=suiviLiage)
+        parseRdf.openResultFile(result)
+        travail["resultat"] = result
+    except suivi.Annulation:
+        travail["erreur"] = "Liage annulé"
+    except Exception as e:
+        travail["erreur"] = "Erreur : %s" % e
+
+
+def annuler():
+    if travail["suivi"] is not None:
+        travail["suivi"].annuler()
+        annulerButton.config(state=tk.DISABLED)
+
+
+def rafraichirAvancement():
+    etat = travail["suivi"].etat()
+    if etat["estimes"]:
+        barre_avancement.config(mode="determinate", maximum=etat["estimes"], value=min(etat["scores"], etat["estimes"]))
+    texte = "%s : %d / %d couples mesurés" % (etat["etape"] or "préparation", etat["scores"], etat["estimes"])
+    listbox_meilleurs.delete(0, tk.END)
+    for score, ressourceS, ressourceC, prop in etat["meilleurs"]:
+        detail = "" if prop is None else " (%s)" % prop.split('/')[-1]
+        listbox_meilleurs.insert(tk.END, "%.3f  %s -> %s%s" % (score, ressourceS.split('/')[-1],
+                                                              ressourceC.split('/')[-1], detail))
+    if travail["thread"].is_alive():
+        label_avancement.config(text=texte)
+        root.after(200, rafraichirAvancement)
+        return
+    if travail["erreur"] is not None:
+        label_avancement.config(text=travail["erreur"])
+    else:
+        barre_avancement.config(value=barre_avancement.cget("maximum"))
+        label_avancement.config(text="%d couples écrits dans resultat.ttl" % len(travail["resultat"]))
+    for bouton in (confirmButton, sourceValider, cibleValider, addPorpertyButton):
+        bouton.config(state=tk.NORMAL)
+    annulerButton.config(state=tk.DISABLED)
 
 def selectionProp():
     select = listbox_properties.get()
@@ -39,11 +99,18 @@ def selectionProp():
       listbox_propSelect['values'] = get_last_part_of_url(propertySelected)
       print("Vous avez sélectionné : ", propertySelected)
 
+def rafraichirProprietes():
+  """Met à jour la liste des propriétés après un changement de fichier"""
+  listbox_properties['values'] = get_last_part_of_url(parseRdf.getAllProperty())
+
+
 def validerSource():
   filepath = filedialog.askopenfilename(title="Ouvrir un fichier source")
   sourceEntree.delete(0, tk.END)
   sourceEntree.insert(0, filepath)
   pont.setFichierSource(filepath)
+  parseRdf.setFichierSource(filepath)
+  rafraichirProprietes()
 
 
 def validerCible():
@@ -51,6 +118,8 @@ def validerCible():
   cibleEntree.delete(0, tk.END)
   cibleEntree.insert(0, filepath)
   pont.setFichierCible(filepath)
+  parseRdf.setFichierCible(filepath)
+  rafraichirProprietes()
 
 
 def validerSeuil():
@@ -141,6 +210,7 @@ varJaro = tk.BooleanVar()
 varJaroWinkler = tk.BooleanVar()
 varLevenshtein = tk.BooleanVar()
 varMongeElkan = tk.BooleanVar()
+varTfIdf = tk.BooleanVar()
 
 # A faire dans une boucle car plus propre si le temps
 checkIdentity = tk.Checkbutton(canvas, text="Identity",
@@ -188,10 +258,29 @@ checkMongeElkan = tk.Checkbutton(canvas,
                                  command=lambda: on_checked(varMongeElkan, 5))
 canvas.create_window(480, 320, window=checkMongeElkan)
 
+checkTfIdf = tk.Checkbutton(canvas,
+                            text="TF-IDF",
+                            variable=varTfIdf,
+                            bg="#263D42", fg="#FFFF00", selectcolor="black",
+                            command=lambda: on_checked(varTfIdf, 7))
+canvas.create_window(480, 340, window=checkTfIdf)
+
 confirmButton = tk.Button(root, text="Confirmer",
                           command=lambda: [validerSeuil(),confirm(propertySelected, pont.getSeuil(), pont.getListSimilarity())])
 confirmButton.pack()
 
+# Avancement du liage en cours
+label_avancement = tk.Label(canvas, text="", bg="#263D42", fg="#FFFF00")
+canvas.create_window(300, 380, window=label_avancement)
+barre_avancement = ttk.Progressbar(canvas, length=400, mode="determinate")
+canvas.create_window(260, 405, window=barre_avancement)
+annulerButton = tk.Button(canvas, text="Annuler", bg="white", state=tk.DISABLED, command=annuler)
+canvas.create_window(510, 405, window=annulerButton)
+label_meilleurs = tk.Label(canvas, text="Meilleurs couples :", bg="#263D42", fg="#FFFF00")
+canvas.create_window(80, 435, window=label_meilleurs)
+listbox_meilleurs = tk.Listbox(canvas, width=80, height=8)
+canvas.create_window(300, 520, window=listbox_meilleurs)
+
 root.mainloop()
 
 # See PyCharm help at https://www.jetbrains.com/help/pycharm/
@@ -1,25 +1,27 @@
-import nltk
-import py_stringmatching as psm
-from nltk.metrics.distance import jaro_winkler_similarity
-from py_stringmatching import Jaccard
-from sklearn.feature_extraction.text import TfidfVectorizer
-import numpy as np
-from scipy.spatial.distance import hamming
+from collections import OrderedDict
+
+from profils import ngrams, profil
+
+# nltk, scikit-learn et scipy sont lents à importer : ils ne le sont
+# qu'à la première utilisation d'une mesure qui en a besoin
+# Les mesures de chaînes lisent les pré-traitements (q-grammes, positions...) dans le profil de chaque valeur
+
+
+def _grammesCommuns(profil1, profil2):
+    # Taille de l'intersection des multi-ensembles de q-grammes (au plus le nombre de q-grammes de chaque chaîne)
+    grammes2 = profil2.grammes
+    return sum(min(n, grammes2[g]) for g, n in profil1.grammes.items() if g in grammes2)
+
 
 def QGrams(str1,str2):
-    n=3
-    str1NGram=list(nltk.ngrams(str1.lower(),n))
-    str2NGram=list(nltk.ngrams(str2.lower(),n))
-    compteur=0
-    for item in str1NGram:
-        if item in str2NGram:
-            compteur=+1
-    minLen=min(len(str1NGram),len(str2NGram))
-    div=minLen-n+1
-    if(div != 0):
-        return (compteur/div)
-    else :
-        return 0.0
+    # Coefficient de recouvrement des q-grammes (formes en minuscules) : 1 pour deux chaînes identiques
+    profil1=profil(str1)
+    profil2=profil(str2)
+    minGrammes=min(profil1.nbGrammes,profil2.nbGrammes)
+    if minGrammes==0:
+        # Chaîne trop courte pour avoir un q-gramme : seule l'égalité compte
+        return 1.0 if profil1.minuscule==profil2.minuscule else 0.0
+    return _grammesCommuns(profil1,profil2)/minGrammes
 
 def Identity(str1,str2):
     if str1==str2 :
@@ -28,61 +30,356 @@ def Identity(str1,str2):
         return 0.0
 
 def Jaccard(expr1,expr2):
-    n=3
-    expr1=expr1.lower()
-    expr2=expr2.lower()
-    ngrams1=set(nltk.ngrams(expr1,n))
-    ngrams2=set(nltk.ngrams(expr2,n))
-    extJaccard=Jaccard()
-    return extJaccard.get_sim_score(ngrams1,ngrams2)
+    # Même score que py_stringmatching.Jaccard sur les ensembles de 3-grammes des formes en minuscules
+    ngrams1=profil(expr1).ensembleGrammes
+    ngrams2=profil(expr2).ensembleGrammes
+    if ngrams1==ngrams2:
+        return 1.0
+    if not ngrams1 or not ngrams2:
+        return 0
+    return len(ngrams1 & ngrams2)/len(ngrams1 | ngrams2)
 
-def Jaro(str1, str2):
+def positionsCaracteres(chaine):
+    """Pré-traitement réutilisable : positions de chaque caractère de la chaîne (lues dans son profil)"""
+    return profil(chaine).positions
+
+
+def _jaro(str1, str2, positions1, positions2):
+    # Même appariement glouton que l'algorithme de référence (nltk.jaro_similarity). Une position de str2 ne
+    # s'apparie qu'au même caractère : l'appariement se fait caractère commun par caractère commun, en parcourant
+    # ensemble ses positions dans les deux chaînes (les positions dépassées sont sous la fenêtre ou déjà prises)
+    if str1 == str2:
+        return 1.0
     len_str1 = len(str1)
     len_str2 = len(str2)
-    max_dist = (max(len_str1, len_str2) // 2) - 1
-    common_chars_str1 = []
-    common_chars_str2 = []
-    for i, char1 in enumerate(str1):
-        for j in range(max(0, i - max_dist), min(len_str2, i + max_dist + 1)):
-            if char1 == str2[j] and j not in common_chars_str2:
-                common_chars_str1.append(i)
-                common_chars_str2.append(j)
+    if len_str1 == 0 or len_str2 == 0:
+        return 0.0
+    max_dist = max(len_str1, len_str2) // 2 - 1
+    indices1 = []
+    indices2 = []
+    for c in positions1.keys() & positions2.keys():
+        p2 = positions2[c]
+        n = len(p2)
+        k = 0
+        for i in positions1[c]:
+            bas = i - max_dist
+            while k < n and p2[k] < bas:
+                k += 1
+            if k == n:
                 break
-    num_common_chars = len(common_chars_str1)
+            if p2[k] <= i + max_dist:
+                indices1.append(i)
+                indices2.append(p2[k])
+                k += 1
+    num_common_chars = len(indices1)
     if num_common_chars == 0:
         return 0.0
+    # Transpositions : caractères appariés des deux chaînes pris dans l'ordre de leurs positions
+    indices1.sort()
+    indices2.sort()
     num_transpositions = 0
-    for i, j in zip(common_chars_str1, common_chars_str2):
+    for i, j in zip(indices1, indices2):
         if str1[i] != str2[j]:
             num_transpositions += 1
+    return 1 / 3 * (num_common_chars / len_str1 + num_common_chars / len_str2 +
+                    (num_common_chars - num_transpositions // 2) / num_common_chars)
+
 
-    num_transpositions /= 2
+def _winkler(str1, str2, jaro, p=0.1, max_l=4):
+    l = 0
+    for c1, c2 in zip(str1, str2):
+        if c1 == c2:
+            l += 1
+        else:
+            break
+        if l == max_l:
+            break
+    return jaro + (l * p * (1 - jaro))
 
-    return ((num_common_chars / len_str1) +
-                (num_common_chars / len_str2) +
-                ((num_common_chars - num_transpositions) / num_common_chars)) / 3.0
+
+def Jaro(str1, str2):
+    return _jaro(str1, str2, positionsCaracteres(str1), positionsCaracteres(str2))
+
+
+def JaroWinkler(str1, str2):
+    return _winkler(str1, str2, _jaro(str1, str2, positionsCaracteres(str1), positionsCaracteres(str2)))
+
+
+def JaroPlusieurs(valeur, valeurs, winkler=False, seuil=None):
+    """
+    Scores Jaro(valeur, autre) (ou Jaro-Winkler) de valeur contre toute la liste valeurs en un appel,
+    identiques à ceux de Jaro ; les positions des caractères de valeur ne sont lues qu'une fois.
+    Avec seuil, les scores inférieurs sont ramenés à 0.
+    """
+    positions = positionsCaracteres(valeur)
+    scores = []
+    for autre in valeurs:
+        res = _jaro(valeur, autre, positions, positionsCaracteres(autre))
+        if winkler:
+            res = _winkler(valeur, autre, res)
+        if seuil is not None and res < seuil:
+            res = 0.0
+        scores.append(res)
+    return scores
 
 
 def Levenshtein(str1,str2):
+    import nltk
     levenshteinDistance=nltk.edit_distance(str1,str2)
     return (1-(levenshteinDistance/max(len(str1),len(str2))))
 
-def JaroWinkler(str1,str2):
-    return jaro_winkler_similarity(str1,str2)
+# Variantes bornées : elles renvoient le score exact s'il atteint seuil, 0.0 sinon (sans finir le calcul)
+
+def QGramsBorne(str1,str2,seuil):
+    profil1=profil(str1)
+    profil2=profil(str2)
+    if min(profil1.nbGrammes,profil2.nbGrammes)==0:
+        res=QGrams(str1,str2)
+        return res if res>=seuil else 0.0
+    # Filtre de comptage : sans q-gramme commun le score est nul
+    if seuil>0 and profil1.ensembleGrammes.isdisjoint(profil2.ensembleGrammes):
+        return 0.0
+    res=QGrams(str1,str2)
+    return res if res>=seuil else 0.0
+
+
+def borneJaro(str1,str2):
+    """Majorant de Jaro : nombre de caractères communs au plus égal à l'intersection des multi-ensembles"""
+    len1=len(str1)
+    len2=len(str2)
+    if len1==0 or len2==0:
+        return 0.0
+    communs=sum((profil(str1).caracteres & profil(str2).caracteres).values())
+    if communs==0:
+        return 0.0
+    return (communs/len1+communs/len2+1)/3.0
+
+
+def JaroBorne(str1,str2,seuil):
+    if str1==str2:
+        return 1.0
+    len1=len(str1)
+    len2=len(str2)
+    if len1==0 or len2==0:
+        return 0.0
+    # Borne sur les longueurs seules avant de compter les caractères
+    if (min(len1,len2)/len1+min(len1,len2)/len2+1)/3.0<seuil or borneJaro(str1,str2)<seuil:
+        return 0.0
+    res=Jaro(str1,str2)
+    return res if res>=seuil else 0.0
+
+
+def JaroWinklerBorne(str1,str2,seuil,p=0.1,max_l=4):
+    if str1==str2:
+        return 1.0
+    l=0
+    for c1,c2 in zip(str1,str2):
+        if c1!=c2 or l==max_l:
+            break
+        l+=1
+    # Jaro-Winkler est croissant en Jaro : on majore avec le majorant de Jaro
+    majorant=borneJaro(str1,str2)
+    if majorant+l*p*(1-majorant)<seuil:
+        return 0.0
+    res=_winkler(str1,str2,Jaro(str1,str2),p,max_l)
+    return res if res>=seuil else 0.0
+
+
+def LevenshteinBorne(str1,str2,seuil):
+    maxLen=max(len(str1),len(str2))
+    if maxLen==0:
+        return 1.0
+    # Distance maximale autorisée pour atteindre seuil
+    k=int((1-seuil)*maxLen+1e-9)
+    if abs(len(str1)-len(str2))>k:
+        return 0.0
+    if len(str1)>len(str2):
+        str1,str2=str2,str1
+    infini=k+1
+    # Programmation dynamique limitée à la bande |i-j|<=k, arrêt dès que la ligne dépasse k
+    precedente=[j if j<=k else infini for j in range(len(str2)+1)]
+    for i in range(1,len(str1)+1):
+        debut=max(1,i-k)
+        fin=min(len(str2),i+k)
+        courante=[infini]*(len(str2)+1)
+        if i<=k:
+            courante[0]=i
+        minLigne=courante[0]
+        c1=str1[i-1]
+        for j in range(debut,fin+1):
+            cout=precedente[j-1]+(c1!=str2[j-1])
+            if precedente[j]+1<cout:
+                cout=precedente[j]+1
+            if courante[j-1]+1<cout:
+                cout=courante[j-1]+1
+            if cout>infini:
+                cout=infini
+            courante[j]=cout
+            if cout<minLigne:
+                minLigne=cout
+        if minLigne>k:
+            return 0.0
+        precedente=courante
+    distance=precedente[len(str2)]
+    if distance>k:
+        return 0.0
+    return 1-(distance/maxLen)
+
+
+class MongeElkan:
+    """
+    Monge-Elkan sur des jetons internés pour tout le corpus : chaque chaîne n'est découpée qu'une fois,
+    la similarité interne de deux jetons n'est calculée qu'une fois, et le score d'un couple est la moyenne
+    des maxima par ligne de la matrice jetons source x jetons cible (une ligne par jeton source distinct).
+    preparer() calcule d'avance toute la matrice du vocabulaire (comparaison sans blocage) ; sinon les
+    similarités sont calculées à la demande et gardées dans la limite de simsMax.
+    """
+
+    def __init__(self, sim_func, simsMax=5000000):
+        self.sim_func = sim_func
+        self.simsMax = simsMax
+        # sim(jeton, jeton) vaut 1, la valeur maximale : inutile de parcourir la ligne
+        self.reflexive = sim_func in (Jaro, JaroWinkler, Levenshtein, Identity, QGrams)
+        # Jaro et Jaro-Winkler calculent une ligne entière en un appel
+        if sim_func is Jaro:
+            self.enLot = lambda mot, mots: JaroPlusieurs(mot, mots)
+        elif sim_func is JaroWinkler:
+            self.enLot = lambda mot, mots: JaroPlusieurs(mot, mots, winkler=True)
+        else:
+            self.enLot = lambda mot, mots: [sim_func(mot, autre) for autre in mots]
+        self.ids = {}
+        self.vocabulaire = []
+        self.chaines = {}
+        self.lignes = OrderedDict()
+        self.nbSims = 0
+        self.matrice = None
+        self.lignesMatrice = {}
+        self.colonnesMatrice = {}
+
+    def jetons(self, chaine):
+        """Identifiants des jetons de la chaîne, dans l'ordre, et identifiants distincts"""
+        res = self.chaines.get(chaine)
+        if res is None:
+            ids = []
+            for mot in profil(chaine).jetons:
+                i = self.ids.get(mot)
+                if i is None:
+                    i = len(self.vocabulaire)
+                    self.ids[mot] = i
+                    self.vocabulaire.append(mot)
+                ids.append(i)
+            res = (ids, frozenset(ids))
+            self.chaines[chaine] = res
+        return res
+
+    def preparer(self, valeursS, valeursC, cellulesMax=20000000):
+        """
+        Calcule la matrice des similarités entre tous les jetons de valeursS et tous ceux de valeursC.
+        Renvoie False sans rien calculer si elle dépasse cellulesMax cellules.
+        """
+        import numpy as np
+
+        jetonsS = list(dict.fromkeys(i for v in valeursS for i in self.jetons(v)[0]))
+        jetonsC = list(dict.fromkeys(i for v in valeursC for i in self.jetons(v)[0]))
+        if len(jetonsS) * len(jetonsC) > cellulesMax:
+            return False
+        motsC = [self.vocabulaire[j] for j in jetonsC]
+        self.matrice = np.zeros((len(jetonsS), len(jetonsC)))
+        for ligne, i in enumerate(jetonsS):
+            if motsC:
+                self.matrice[ligne, :] = self.enLot(self.vocabulaire[i], motsC)
+        lignesMatrice = {i: ligne for ligne, i in enumerate(jetonsS)}
+        colonnesMatrice = {j: colonne for colonne, j in enumerate(jetonsC)}
+        # Par chaîne source : lignes de ses jetons distincts et, pour chaque jeton, la position de sa ligne
+        self.lignesMatrice = {}
+        for v in valeursS:
+            ids, distincts = self.jetons(v)
+            ordre = list(dict.fromkeys(ids))
+            position = {i: k for k, i in enumerate(ordre)}
+            self.lignesMatrice[v] = (np.array([lignesMatrice[i] for i in ordre])[:, None],
+                                     np.array([position[i] for i in ids]))
+        self.colonnesMatrice = {v: np.array([colonnesMatrice[j] for j in self.jetons(v)[1]]) for v in valeursC}
+        return True
+
+    def maxLigne(self, i, colonnes):
+        # Un jeton présent des deux côtés atteint le maximum 1 des mesures réflexives
+        if self.reflexive and i in colonnes:
+            return 1.0
+        ligne = self.lignes.get(i)
+        if ligne is None:
+            ligne = {}
+            self.lignes[i] = ligne
+        else:
+            self.lignes.move_to_end(i)
+            try:
+                return max(map(ligne.__getitem__, colonnes), default=0)
+            except KeyError:
+                pass
+        manquantes = [j for j in colonnes if j not in ligne]
+        ligne.update(zip(manquantes, self.enLot(self.vocabulaire[i], [self.vocabulaire[j] for j in manquantes])))
+        self.nbSims += len(manquantes)
+        # Mémoire bornée : les lignes les moins récemment utilisées sont oubliées
+        while self.nbSims > self.simsMax and len(self.lignes) > 1:
+            ancienne, contenu = self.lignes.popitem(last=False)
+            self.nbSims -= len(contenu)
+        return max(map(ligne.__getitem__, colonnes), default=0)
+
+    def score(self, s1, s2):
+        ids1, distincts1 = self.jetons(s1)
+        ids2, distincts2 = self.jetons(s2)
+        if not ids1:
+            return 1.0 if not ids2 else 0.0
+        lignes = self.lignesMatrice.get(s1)
+        colonnes = self.colonnesMatrice.get(s2)
+        if lignes is not None and colonnes is not None and len(colonnes):
+            # Maxima par ligne de la sous-matrice, remis dans l'ordre des jetons de s1
+            maxima = self.matrice[lignes[0], colonnes].max(axis=1).take(lignes[1]).tolist()
+        else:
+            parJeton = {i: self.maxLigne(i, distincts2) for i in distincts1}
+            maxima = [parJeton[i] for i in ids1]
+        # Somme dans l'ordre des jetons, comme la version naïve, pour des scores identiques
+        return sum(maxima) / len(ids1)
+
+    def vider(self):
+        self.__init__(self.sim_func, self.simsMax)
+
+
+# Un moteur par mesure interne, partagé par tous les appels
+moteursMongeElkan = {}
+
+
+def moteurMongeElkan(sim_func):
+    moteur = moteursMongeElkan.get(sim_func)
+    if moteur is None:
+        moteur = MongeElkan(sim_func)
+        moteursMongeElkan[sim_func] = moteur
+    return moteur
+
+
+def Monge_elkan(s1,s2,sim_func=None):
+    """Moyenne, sur les jetons de s1, de la meilleure similarité sim_func (Jaro par défaut) avec un jeton de s2"""
+    return moteurMongeElkan(sim_func or Jaro).score(s1, s2)
+
 
-def Monge_elkan(s1,s2,sim_func):
-    words1 = s1.split()
-    words2 = s2.split()
-    sim = 0
-    for w1 in words1:
-        max_sim = 0
-        for w2 in words2:
-            current_sim = sim_func(w1, w2)
-            if current_sim > max_sim:
-                max_sim = current_sim
-        sim += max_sim
-    sim /= len(words1)
-    return sim
+def TfIdfBatch(valeursSource, valeursCible, seuil=0.0, n=3):
+    """
+    Similarité cosinus TF-IDF (n-grammes de caractères) de toutes les valeurs source contre toutes les valeurs cible.
+    Renvoie une matrice creuse (ligne = valeur source, colonne = valeur cible) sans les scores inférieurs à seuil.
+    """
+    from scipy.sparse import csr_matrix
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    if len(valeursSource) == 0 or len(valeursCible) == 0:
+        return csr_matrix((len(valeursSource), len(valeursCible)))
+    vectoriseur = TfidfVectorizer(analyzer="char_wb", ngram_range=(n, n), lowercase=True)
+    vectoriseur.fit(list(valeursSource) + list(valeursCible))
+    matriceSource = vectoriseur.transform(valeursSource)
+    matriceCible = vectoriseur.transform(valeursCible)
+    # Les lignes sont normalisées (L2) : le produit scalaire est le cosinus
+    scores = (matriceSource @ matriceCible.T).tocsr()
+    if seuil > 0:
+        scores.data[scores.data < seuil] = 0
+        scores.eliminate_zeros()
+    return scores
 
 
 def Tokenisation(uri):
@@ -97,7 +394,6 @@ def Tokenisation(uri):
         value = list[len(list) - 1]
         return value
 
-print(Tokenisation("http://data.doremus.org/vocabulary/iaml/genre/salut"))
 
 
 
@@ -0,0 +1,58 @@
+from collections import OrderedDict
+
+# Coût approximatif d'une entrée en plus des deux chaînes (tuple, float, nœud de l'OrderedDict)
+surcoutEntree = 200
+
+
+class CacheScores:
+    """
+    Cache LRU des scores indexé par (mesure, valeurS, valeurC, paramètres éventuels comme le seuil).
+    Borné en nombre d'entrées et en octets approximatifs ; les entrées les moins récentes sont évincées.
+    """
+
+    def __init__(self, tailleMax=200000, octetsMax=64 * 1024 * 1024):
+        self.tailleMax = tailleMax
+        self.octetsMax = octetsMax
+        self.entrees = OrderedDict()
+        self.octets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def score(self, measure, valueS, valueC, *args):
+        cle = (measure, valueS, valueC) + args
+        res = self.entrees.get(cle)
+        if res is not None:
+            self.hits += 1
+            self.entrees.move_to_end(cle)
+            return res
+        self.misses += 1
+        res = measure(valueS, valueC, *args)
+        self.entrees[cle] = res
+        self.octets += len(valueS) + len(valueC) + surcoutEntree
+        while len(self.entrees) > self.tailleMax or self.octets > self.octetsMax:
+            (m, s, c, *parametres), _ = self.entrees.popitem(last=False)
+            self.octets -= len(s) + len(c) + surcoutEntree
+            self.evictions += 1
+        return res
+
+    def statistiques(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "tauxHits": self.hits / total if total else 0.0,
+            "entrees": len(self.entrees),
+            "octets": self.octets,
+            "evictions": self.evictions,
+        }
+
+    def vider(self):
+        self.entrees.clear()
+        self.octets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+cacheScores = CacheScores()
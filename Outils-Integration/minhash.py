@@ -0,0 +1,129 @@
+from instrumentation import instr
+from profils import profil
+
+# Hachage universel modulo un premier de Mersenne : a * x + b tient sur 64 bits pour x < 2^31
+premier = (1 << 31) - 1
+
+
+def qgrammes(chaine):
+    """Ensemble des q-grammes comparés par measures.Jaccard, lu dans le profil de la chaîne"""
+    return profil(chaine).ensembleGrammes
+
+
+def jaccard(grammes1, grammes2):
+    """Même score que measures.Jaccard à partir des ensembles de q-grammes"""
+    if grammes1 == grammes2:
+        return 1.0
+    if not grammes1 or not grammes2:
+        return 0.0
+    return len(grammes1 & grammes2) / len(grammes1 | grammes2)
+
+
+def probabiliteCollision(similarite, bandes, lignes):
+    """Probabilité qu'un couple de similarité donnée partage au moins une bande"""
+    return 1.0 - (1.0 - similarite ** lignes) ** bandes
+
+
+def _integrale(f, debut, fin, pas=100):
+    if fin <= debut:
+        return 0.0
+    largeur = (fin - debut) / pas
+    return sum(f(debut + (i + 0.5) * largeur) for i in range(pas)) * largeur
+
+
+def parametres(seuil, nbPermutations=128, poidsFauxNegatifs=0.9):
+    """
+    (bandes, lignes) avec bandes * lignes <= nbPermutations minimisant l'aire des faux positifs (similarité
+    sous le seuil) et des faux négatifs (au-dessus), ces derniers pesant plus car ils sont perdus pour le rappel
+    """
+    meilleur = None
+    for bandes in range(1, nbPermutations + 1):
+        for lignes in range(1, nbPermutations // bandes + 1):
+            fauxPositifs = _integrale(lambda s: probabiliteCollision(s, bandes, lignes), 0.0, seuil)
+            fauxNegatifs = _integrale(lambda s: 1.0 - probabiliteCollision(s, bandes, lignes), seuil, 1.0)
+            cout = (1 - poidsFauxNegatifs) * fauxPositifs + poidsFauxNegatifs * fauxNegatifs
+            if meilleur is None or cout < meilleur[0]:
+                meilleur = (cout, bandes, lignes)
+    return meilleur[1], meilleur[2]
+
+
+def signatures(valeurs, nbPermutations=128, graine=1):
+    """
+    Matrice (valeurs x permutations) des minimums des q-grammes hachés (vecteur du profil, crc32 : les signatures
+    restent les mêmes d'un processus à l'autre) ; une valeur sans q-gramme vaut premier partout
+    """
+    import numpy as np
+
+    alea = np.random.RandomState(graine)
+    a = alea.randint(1, premier, size=nbPermutations).astype(np.uint64)[:, None]
+    b = alea.randint(0, premier, size=nbPermutations).astype(np.uint64)[:, None]
+    resultat = np.full((len(valeurs), nbPermutations), premier, dtype=np.uint64)
+    for i, valeur in enumerate(valeurs):
+        hachages = profil(valeur).vecteur
+        if hachages:
+            x = np.fromiter(hachages, dtype=np.uint64, count=len(hachages)) % premier
+            resultat[i] = ((a * x + b) % premier).min(axis=1)
+    return resultat
+
+
+def collisions(signaturesS, signaturesC, bandes, lignes):
+    """Couples (i, j) de valeurs source et cible partageant au moins une bande de leurs signatures"""
+    couples = set()
+    for bande in range(bandes):
+        debut = bande * lignes
+        seaux = {}
+        for j, ligne in enumerate(signaturesC[:, debut:debut + lignes]):
+            seaux.setdefault(ligne.tobytes(), []).append(j)
+        for i, ligne in enumerate(signaturesS[:, debut:debut + lignes]):
+            for j in seaux.get(ligne.tobytes(), ()):
+                couples.add((i, j))
+    return couples
+
+
+def jointure(valeursS, valeursC, seuil, nbPermutations=128, graine=1, garder=None):
+    """
+    Jointure approchée sur la similarité de Jaccard des q-grammes : seuls les couples de valeurs dont les
+    signatures MinHash partagent une bande LSH (réglée pour seuil) sont mesurés exactement.
+    Génère (i, j, score) pour score >= garder (seuil par défaut).
+    """
+    if garder is None:
+        garder = seuil
+    grammesS = [qgrammes(v) for v in valeursS]
+    grammesC = [qgrammes(v) for v in valeursC]
+    bandes, lignes = parametres(seuil, nbPermutations)
+    with instr.etape("minhash"):
+        couples = collisions(signatures(valeursS, nbPermutations, graine), signatures(valeursC, nbPermutations, graine),
+                             bandes, lignes)
+    instr.compter("couplesCandidatsLsh", len(couples))
+    instr.compter("couplesPossiblesLsh", len(valeursS) * len(valeursC))
+    for i, j in sorted(couples):
+        score = jaccard(grammesS[i], grammesC[j])
+        if score >= garder:
+            yield i, j, score
+
+
+def jointureExacte(valeursS, valeursC, seuil):
+    """Référence de la jointure approchée : tous les couples mesurés, (i, j, score) pour score >= seuil"""
+    grammesS = [qgrammes(v) for v in valeursS]
+    grammesC = [qgrammes(v) for v in valeursC]
+    for i, a in enumerate(grammesS):
+        for j, b in enumerate(grammesC):
+            score = jaccard(a, b)
+            if score >= seuil:
+                yield i, j, score
+
+
+def precision(approches, exacts):
+    """Part des couples de la jointure approchée que la jointure exacte retient aussi"""
+    approches = {(str(c[0]), str(c[1])) for c in approches}
+    if not approches:
+        return 1.0
+    return len(approches & {(str(c[0]), str(c[1])) for c in exacts}) / len(approches)
+
+
+def rappel(approches, exacts):
+    """Part des couples de la jointure exacte retrouvés par la jointure approchée"""
+    exacts = {(str(c[0]), str(c[1])) for c in exacts}
+    if not exacts:
+        return 1.0
+    return len(exacts & {(str(c[0]), str(c[1])) for c in approches}) / len(exacts)
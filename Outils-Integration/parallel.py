@@ -0,0 +1,124 @@
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import selection
+from aggregation import Agregateur
+from instrumentation import instr
+
+# Instantané hérité par les processus fils au fork : seules les bornes des lots transitent par pickle
+_etat = {}
+
+
+def forkDisponible():
+    return "fork" in multiprocessing.get_all_start_methods()
+
+
+# Chaque lot renvoie aussi l'instantané de l'instrumentation du processus fils pour ce lot (étapes, mesures,
+# compteurs), que le processus parent fusionne dans la sienne : les durées s'y additionnent entre processus
+
+def _scorerLot(bornes):
+    instr.reinitialiser()
+    debut, fin = bornes
+    lot = set(_etat["sources"][debut:fin])
+    agregateur = Agregateur(_etat["agregation"], _etat["poids"])
+    agregateur.consommer(_etat["scorer"](lot))
+    return list(agregateur.accumulateurs()), instr.instantane()
+
+
+def _resultatsLot(bornes):
+    instr.reinitialiser()
+    debut, fin = bornes
+    agregateur = Agregateur(_etat["agregation"], _etat["poids"], manquants=_etat["manquants"])
+    agregateur.consommer(_etat["scorer"](set(_etat["sources"][debut:fin])))
+    return garderLot(agregateur.resultats(), _etat["k"], _etat["seuil"]), instr.instantane()
+
+
+def garderLot(resultats, k=None, seuil=None):
+    """
+    Scores agrégés d'un lot qui peuvent encore être sélectionnés : au moins seuil, et au plus k cibles par
+    source plus les ex aequo du k-ième score, que selection.topK départage ensuite sur tous les lots.
+    """
+    if seuil is not None:
+        resultats = (resultat for resultat in resultats if resultat[2] >= seuil)
+    resultats = list(resultats)
+    if k is None:
+        return resultats
+    minimums = {}
+    for ressourceS, ressourceC, score in selection.topK(resultats, k):
+        # topK range les cibles de chaque source par score décroissant : la dernière donne le minimum
+        minimums[ressourceS] = score
+    return [resultat for resultat in resultats if resultat[2] >= minimums[resultat[0]]]
+
+
+def _enOrdre(executor, fonction, lots, nbProcessus):
+    # Comme executor.map, mais au plus nbProcessus lots en cours ou en attente d'être lus
+    enCours = deque()
+    for lot in lots:
+        if len(enCours) >= nbProcessus:
+            yield enCours.popleft().result()
+        enCours.append(executor.submit(fonction, lot))
+    while enCours:
+        yield enCours.popleft().result()
+
+
+def decouperLots(nbSources, nbProcessus, tailleLot=None):
+    if tailleLot is None:
+        # Quelques lots par processus pour équilibrer la charge
+        tailleLot = max(1, -(-nbSources // (nbProcessus * 4)))
+    return [(debut, min(debut + tailleLot, nbSources)) for debut in range(0, nbSources, tailleLot)]
+
+
+def agregerEnParallele(scorer, sources, agregation="moyenne", poids=None, budget=None, nbProcessus=None,
+                       tailleLot=None, manquants=None):
+    """
+    Répartit les ressources sources en lots sur un pool de processus.
+    scorer(lot) doit générer les scores (ressourceS, ressourceC, prop, score) des ressources du lot.
+    Les agrégats partiels sont fusionnés dans l'ordre des lots, donc de façon déterministe.
+    manquants est celui de aggregation.Agregateur, appliqué par l'agrégateur renvoyé.
+    """
+    if nbProcessus is None:
+        nbProcessus = multiprocessing.cpu_count()
+    sources = sorted(sources, key=str)
+    final = Agregateur(agregation, poids, budget, manquants=manquants)
+    if nbProcessus <= 1 or not forkDisponible():
+        return final.consommer(scorer(set(sources)))
+    _etat.update(scorer=scorer, sources=sources, agregation=agregation, poids=poids)
+    try:
+        contexte = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=nbProcessus, mp_context=contexte) as executor:
+            lots = decouperLots(len(sources), nbProcessus, tailleLot)
+            for partiel, instantane in _enOrdre(executor, _scorerLot, lots, nbProcessus):
+                instr.fusionner(instantane)
+                for ressourceS, ressourceC, acc in partiel:
+                    final.ajouterAccumulateur(ressourceS, ressourceC, acc)
+    finally:
+        _etat.clear()
+    return final
+
+
+def resultatsParLots(scorer, sources, agregation="moyenne", poids=None, nbProcessus=1, tailleLot=None,
+                     manquants=None, k=None, seuil=None):
+    """
+    Génère les scores agrégés (ressourceS, ressourceC, score) lot de sources par lot, dans l'ordre des lots.
+    Tous les scores d'un couple viennent du lot de sa source : le couple est complet à la sortie du lot,
+    et seul un lot par processus est agrégé en mémoire à la fois. Avec k ou seuil, chaque lot ne renvoie que
+    les couples qui peuvent encore être sélectionnés (voir garderLot) : les autres ne quittent pas le processus.
+    """
+    sources = sorted(sources, key=str)
+    lots = decouperLots(len(sources), nbProcessus, tailleLot)
+    if nbProcessus <= 1 or not forkDisponible():
+        for debut, fin in lots:
+            agregateur = Agregateur(agregation, poids, manquants=manquants).consommer(scorer(set(sources[debut:fin])))
+            yield from garderLot(agregateur.resultats(), k, seuil)
+        return
+    _etat.update(scorer=scorer, sources=sources, agregation=agregation, poids=poids, manquants=manquants, k=k,
+                 seuil=seuil)
+    try:
+        contexte = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=nbProcessus, mp_context=contexte) as executor:
+            for resultats, instantane in _enOrdre(executor, _resultatsLot, lots, nbProcessus):
+                instr.fusionner(instantane)
+                yield from resultats
+    finally:
+        _etat.clear()
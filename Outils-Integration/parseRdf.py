@@ -1,85 +1,239 @@
 import rdflib as rdf
 import rdflib.term
 from rdflib import Namespace, URIRef, Literal, BNode
-import SPARQLWrapper
-from SPARQLWrapper import SPARQLWrapper, JSON
-from rdflib.plugins.sparql import prepareQuery
-from measures import Jaro,JaroWinkler,Identity,Levenshtein,QGrams,Monge_elkan,Jaccard,Tokenisation
+from measures import Jaro,JaroWinkler,Identity,Levenshtein,QGrams,Monge_elkan,Jaccard,Tokenisation,TfIdfBatch
+from measures import moteurMongeElkan
+from measures import JaroBorne,JaroWinklerBorne,LevenshteinBorne,QGramsBorne
+import blocking
+from aggregation import Agregateur
+import parallel
+import memo
+from instrumentation import instr
+from rdflib.util import guess_format
+from loader import GrapheParesseux
+from extraction import indexDe, classeF22
+import extraction
+import streaming
+import colonnes
+import fragments
+import minhash
+import sparql
+import profils
+import cascade
+import evaluation
+import incremental
+import selection
+import voisinage
+from evaluation import lireReference
+import bisect
 import re
+import time
 
-grapheSource = rdf.Graph()
-grapheSource.parse("source.ttl", format="turtle")
-grapheCible = rdf.Graph()
-grapheCible.parse("cible.ttl", format="turtle")
+# Graphes chargés au premier usage (instantané binaire réutilisé si le fichier n'a pas changé)
+sourceParesseuse = GrapheParesseux("source.ttl")
+cibleParesseuse = GrapheParesseux("cible.ttl")
+
+# Classe des ressources comparées et extractions obtenues en flux (à la place des graphes)
+classeExpression = classeF22
+extractionSource = None
+extractionCible = None
+# Magasin en colonnes (colonnes.MagasinColonnes) des deux côtés : s'il est chargé, il remplace graphes et extractions
+# et les ressources circulent sous forme d'identifiants entiers jusqu'à la sélection des couples
+magasinColonnes = None
+
+# Propriétés comparées par voisinage trié plutôt que par mesure de chaînes, avec leur type.
+# Les propriétés non déclarées dont tous les littéraux ont un datatype date ou numérique sont reconnues seules.
+proprietesTypees = {
+    "http://data.doremus.org/ontology#U42_has_opus_number": "nombre",
+    extraction.chemins["opus"]: "nombre",
+    extraction.chemins["catalogue"]: "catalogue",
+    extraction.chemins["date"]: "date",
+}
+# Écart toléré par type (en unités pour les nombres et les catalogues, en années pour les dates)
+# et nombre maximal de voisins par valeur source (None : tous ceux dans la tolérance)
+tolerances = {"nombre": 0, "catalogue": 0, "date": 0}
+fenetreVoisinage = None
+
+# Mesure appliquée aux couples de jetons par Monge-Elkan
+mesureInterneMongeElkan = Jaro
+
+# Nombre de permutations MinHash : si Jaccard est la seule mesure, jointure approchée par LSH (None : exacte)
+permutationsMinHash = None
+
+# Top-k sans budgetMemoire : nombre de couples agrégés par lot de sources (les lots suivent le nombre de cibles)
+couplesParLot = 1000000
+
+# Cascade : nombre de couples de ressources bornés à la fois (les lots de sources suivent le nombre de cibles)
+couplesParLotCascade = 5000
 
 mus="http://data.doremus.org/ontology#"
 uriU11="http://data.doremus.org/ontology#U11_has_key"
 uriU12="http://data.doremus.org/ontology#U12_has_genre"
 
 
-def parseSource():
-    propertySource = []
-    for s, p, o in grapheSource:
-        namespace = p
-        if namespace not in propertySource:
-            propertySource.append(namespace)
-
-    req = """
-        PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-        PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-
-        SELECT DISTINCT ?property
-        WHERE{
-            ?resource ?property ?object.
-            ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-        }
-    """
+def setFichierSource(chemin, format=None):
+    global extractionSource, magasinColonnes
+    extractionSource = None
+    magasinColonnes = None
+    sourceParesseuse.setChemin(chemin, format or guess_format(chemin) or "turtle")
 
-    result = grapheSource.query(req)
-    resultFinal = []
-    for r in result:
-        if (str(r[0]) != "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"):
-            resultFinal.append(str(r[0]))
 
-    return resultFinal
+def setFichierCible(chemin, format=None):
+    global extractionCible, magasinColonnes
+    extractionCible = None
+    magasinColonnes = None
+    cibleParesseuse.setChemin(chemin, format or guess_format(chemin) or "turtle")
 
 
-def parseCible():
-    propertyCible = []
+def setTypePropriete(prop, typeValeur):
+    """typeValeur : "nombre", "catalogue", "date", ou None pour revenir aux mesures de chaînes"""
+    if typeValeur is None:
+        proprietesTypees.pop(str(prop), None)
+    elif typeValeur not in voisinage.normaliseurs:
+        raise ValueError("Type de propriété inconnu : " + str(typeValeur))
+    else:
+        proprietesTypees[str(prop)] = typeValeur
 
-    for s, p, o in grapheCible:
-        namespace = p
-        if namespace not in propertyCible:
-            propertyCible.append(namespace)
 
-    req = """
-            PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
+def typePropriete(prop, listSource, listCible):
+    """Type de la propriété si elle se compare par voisinage trié, None sinon"""
+    if str(prop) in proprietesTypees:
+        return proprietesTypees[str(prop)]
+    return voisinage.typeDatatype(listSource, listCible)
 
-            SELECT DISTINCT  ?property
-            WHERE{
-                ?resource ?property ?object.
-                ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-            }
-        """
 
-    result = grapheCible.query(req)
-    resultFinal = []
-    for r in result:
-        if (str(r[0]) != "http://www.w3.org/1999/02/22-rdf-syntax-ns#type"):
-            resultFinal.append(str(r[0]))
-    return resultFinal
+def setClasse(uri):
+    global classeExpression
+    classeExpression = URIRef(uri)
 
 
-def getAllProperty():
-    propertySource = parseSource()
-    propertyCible = parseCible()
-    commonProprety = propertySource
-    for ps in propertySource:
-        for pc in propertyCible:
-            if ps != pc and pc not in commonProprety:
-                commonProprety.append(pc)
+def chargerEnFlux(chemin, cote, proprietes=None, format=None):
+    """Remplace le graphe source ou cible (cote) par une extraction filtrée lue en flux ; renvoie le rapport"""
+    global extractionSource, extractionCible, magasinColonnes
+    index, rapport = streaming.extraireEnFlux(chemin, classeExpression, proprietes, format)
+    magasinColonnes = None
+    if cote == "source":
+        extractionSource = index
+    elif cote == "cible":
+        extractionCible = index
+    else:
+        raise ValueError("cote doit valoir 'source' ou 'cible'")
+    return rapport
+
+
+def chargerDistant(url, cote, proprietes=None, taillePage=10000, connexions=4, cache=True):
+    """Remplace le graphe source ou cible (cote) par l'extraction faite sur un point d'accès SPARQL ; renvoie le rapport"""
+    global extractionSource, extractionCible, magasinColonnes
+    with instr.etape("extractionDistante"):
+        index, rapport = sparql.extraireDistant(url, classeExpression, proprietes, taillePage, connexions, cache)
+    magasinColonnes = None
+    if cote == "source":
+        extractionSource = index
+    elif cote == "cible":
+        extractionCible = index
+    else:
+        raise ValueError("cote doit valoir 'source' ou 'cible'")
+    return rapport
+
+
+def chargerEnColonnes(cheminSource, cheminCible, proprietes=None, formatSource=None, formatCible=None):
+    """Lit source et cible en flux directement dans un magasin en colonnes ; renvoie les deux rapports"""
+    global extractionSource, extractionCible, magasinColonnes
+    magasin = colonnes.MagasinColonnes()
+    with instr.etape("lectureColonnes"):
+        rapports = [streaming.extraireEnColonnes(cheminSource, magasin, "source", classeExpression, proprietes,
+                                                 formatSource),
+                    streaming.extraireEnColonnes(cheminCible, magasin, "cible", classeExpression, proprietes,
+                                                 formatCible)]
+    magasin.figer()
+    extractionSource = extractionCible = None
+    magasinColonnes = magasin
+    instr.compter("octetsColonnes", magasin.octets())
+    return rapports
+
+
+def colonnesDepuisGraphes(propertiesList=None):
+    """Range dans un magasin en colonnes les propriétés (chemins compris) des graphes ou extractions chargés"""
+    global magasinColonnes
+    if propertiesList is None:
+        propertiesList = getAllProperty()
+    magasin = colonnes.MagasinColonnes()
+    for prop, listSource, listCible in extraireProprietes(propertiesList):
+        magasin.ajouterIndex("source", {str(prop): listSource})
+        magasin.ajouterIndex("cible", {str(prop): listCible})
+    magasin.figer()
+    magasinColonnes = magasin
+    instr.compter("octetsColonnes", magasin.octets())
+    return magasin
+
+
+def sauverColonnes(dossier):
+    magasinColonnes.sauver(dossier)
+
+
+def ouvrirColonnes(dossier, partage=True):
+    """Reprend un magasin sauvé ; avec partage, ses chaînes sont projetées en mémoire et partagées entre processus"""
+    global magasinColonnes
+    magasinColonnes = colonnes.MagasinColonnes.ouvrir(dossier, partage)
+    return magasinColonnes
+
+
+def versUris(extractions):
+    """Extractions dont les identifiants du magasin en colonnes sont remplacés par les URI des ressources"""
+    if magasinColonnes is None:
+        return extractions
+    uri = magasinColonnes.uri
+    return [(prop, [(uri(r), v) for r, v in listSource], [(uri(r), v) for r, v in listCible])
+            for prop, listSource, listCible in extractions]
+
+
+def getIndexSource():
+    if extractionSource is not None:
+        return extractionSource
+    return indexDe(getGrapheSource(), classeExpression)
+
+
+def getIndexCible():
+    if extractionCible is not None:
+        return extractionCible
+    return indexDe(getGrapheCible(), classeExpression)
+
+
+def getGrapheSource():
+    return sourceParesseuse.get()
+
+
+def getGrapheCible():
+    return cibleParesseuse.get()
+
+
+def __getattr__(nom):
+    # parseRdf.grapheSource / parseRdf.grapheCible restent accessibles mais ne sont chargés qu'à la demande
+    if nom == "grapheSource":
+        return getGrapheSource()
+    if nom == "grapheCible":
+        return getGrapheCible()
+    raise AttributeError("module 'parseRdf' has no attribute '%s'" % nom)
+
+
+def parseSource():
+    if magasinColonnes is not None:
+        return magasinColonnes.listeProprietes("source")
+    return list(getIndexSource())
 
+
+def parseCible():
+    if magasinColonnes is not None:
+        return magasinColonnes.listeProprietes("cible")
+    return list(getIndexCible())
+
+
+def getAllProperty():
+    with instr.etape("decouverteProprietes"):
+        propertySource = parseSource()
+        propertyCible = parseCible()
+        dejaVues = set(propertySource)
+        commonProprety = propertySource + [pc for pc in propertyCible if pc not in dejaVues]
     return commonProprety
 
 def isValueMus(prop,uri):
@@ -92,88 +246,485 @@ def isValueMus(prop,uri):
 
 
 def getSubObjSource(property, graph):
-    namespace = None
-    uriProperty = None
-    list = []
-    if (property.find("#") == -1):
-        list = property.split("/")
-        namespace = list[len(list) - 1]
-        list.remove(namespace)
-        uriProperty = "/".join(list) + "/"
+    # Lecture dans l'index construit en une passe sur les expressions F22 du graphe
+    return indexDe(graph, classeExpression).get(str(property), [])
+
+
+def valeursChemin(chemin, extractionFlux, getGraphe):
+    # Les chemins parcourent le graphe : ils ne sont pas disponibles après une lecture en flux
+    if extractionFlux is not None:
+        raise ValueError("chemin de propriétés indisponible après une lecture en flux : " + str(chemin))
+    return extraction.valeursChemin(getGraphe(), chemin, classeExpression)
+
+
+def extraireProprietes(propertiesList):
+    extractions = []
+    for prop in propertiesList:
+        with instr.etape("extraction:" + re.split("[/#]", str(prop))[-1]):
+            if magasinColonnes is not None:
+                listSource = magasinColonnes.extraction(prop, "source")
+                listCible = magasinColonnes.extraction(prop, "cible")
+            elif extraction.estChemin(prop):
+                listSource = valeursChemin(prop, extractionSource, getGrapheSource)
+                listCible = valeursChemin(prop, extractionCible, getGrapheCible)
+            else:
+                listSource = list(getIndexSource().get(str(prop), []))
+                listCible = list(getIndexCible().get(str(prop), []))
+        extractions.append((prop, listSource, listCible))
+    return extractions
+
+
+def couplesAComparer(listSource, listCible, candidats):
+    # Sans blocage : produit cartésien complet
+    if candidats is None:
+        for ressourceS, valueS in listSource:
+            for ressourceC, valueC in listCible:
+                yield ressourceS, valueS, ressourceC, valueC
+        return
+    valeursCible = {}
+    for ressourceC, valueC in listCible:
+        valeursCible.setdefault(ressourceC, []).append(valueC)
+    for ressourceS, valueS in listSource:
+        for ressourceC in candidats.get(ressourceS, ()):
+            for valueC in valeursCible.get(ressourceC, ()):
+                yield ressourceS, valueS, ressourceC, valueC
+
+
+def grouperValeurs(listValues):
+    groupes = {}
+    for ressource, value in listValues:
+        groupes.setdefault(value, []).append(ressource)
+    return groupes
+
+
+def groupesAComparer(listSource, listCible, ordre=None):
+    # ordre {valeur: rang} fixe l'ordre des valeurs source (sinon celui de leur première apparition)
+    groupesCible = grouperValeurs(listCible)
+    groupesSource = grouperValeurs(listSource)
+    valeursS = list(groupesSource) if ordre is None else sorted(groupesSource, key=ordre.__getitem__)
+    for valueS in valeursS:
+        ressourcesS = groupesSource[valueS]
+        for valueC, ressourcesC in groupesCible.items():
+            yield valueS, ressourcesS, valueC, ressourcesC
+
+
+def grouperCandidats(candidats):
+    parSource = {}
+    for ressourceS, ressourceC in candidats:
+        parSource.setdefault(ressourceS, []).append(ressourceC)
+    # Ordre stable d'une exécution à l'autre, appartenance en O(1)
+    return {rs: dict.fromkeys(sorted(rcs, key=str)) for rs, rcs in sorted(parSource.items(), key=lambda x: str(x[0]))}
+
+
+def indexerLitteraux(listValues):
+    valeurs = {}
+    ressources = []
+    for ressource, value in listValues:
+        if isinstance(value, Literal):
+            i = valeurs.setdefault(str(value), len(valeurs))
+            if i == len(ressources):
+                ressources.append([])
+            ressources[i].append(ressource)
+    return valeurs, ressources
+
+
+class ScoresTfIdf:
+    """
+    Matrice creuse des similarités TF-IDF entre les littéraux distincts source et cible d'une propriété.
+    Toutes les entrées non nulles sont gardées : le seuil ne s'applique qu'aux scores agrégés.
+    """
+
+    def __init__(self, listSource, listCible):
+        self.valeursS, self.ressourcesS = indexerLitteraux(listSource)
+        self.valeursC, self.ressourcesC = indexerLitteraux(listCible)
+        self.matrice = TfIdfBatch(list(self.valeursS), list(self.valeursC))
+        # Colonnes triées dans chaque ligne : recherche dichotomique dans nbGeneres
+        self.matrice.sort_indices()
+        self.lignes = {}
+
+    def score(self, valueS, valueC):
+        i = self.valeursS[str(valueS)]
+        ligne = self.lignes.get(i)
+        if ligne is None:
+            debut, fin = self.matrice.indptr[i], self.matrice.indptr[i + 1]
+            ligne = dict(zip(self.matrice.indices[debut:fin].tolist(), self.matrice.data[debut:fin].tolist()))
+            self.lignes[i] = ligne
+        return ligne.get(self.valeursC[str(valueC)], 0.0)
+
+    def couples(self, candidats=None, sources=None):
+        # Seules les entrées non nulles de la matrice sont parcourues
+        coo = self.matrice.tocoo()
+        for i, j, score in zip(coo.row.tolist(), coo.col.tolist(), coo.data.tolist()):
+            for ressourceS in self.ressourcesS[i]:
+                if sources is not None and ressourceS not in sources:
+                    continue
+                for ressourceC in self.ressourcesC[j]:
+                    if candidats is None or ressourceC in candidats.get(ressourceS, ()):
+                        yield ressourceS, ressourceC, score
+
+    def nbGeneres(self, indicesS, indicesC):
+        """Nombre de couples (i, j) de indicesS x indicesC que couples génère"""
+        indptr, indices = self.matrice.indptr, self.matrice.indices
+        n = 0
+        for i in indicesS:
+            debut, fin = indptr[i], indptr[i + 1]
+            for j in indicesC:
+                k = bisect.bisect_left(indices, j, debut, fin)
+                if k < fin and indices[k] == j:
+                    n += 1
+        return n
+
+
+class ScoresJaccardLsh:
+    """
+    Couples de littéraux distincts source et cible dont les signatures MinHash se rencontrent (jointure LSH réglée
+    pour seuil), avec leur Jaccard exact ; les autres couples comptent pour 0 dans l'agrégation.
+    """
+
+    def __init__(self, listSource, listCible, seuil, nbPermutations=128):
+        self.valeursS, self.ressourcesS = indexerLitteraux(listSource)
+        self.valeursC, self.ressourcesC = indexerLitteraux(listCible)
+        self.scores = list(minhash.jointure(list(self.valeursS), list(self.valeursC), seuil, nbPermutations,
+                                            garder=0.0))
+        self.generes = {(i, j) for i, j, score in self.scores}
+
+    def couples(self, candidats=None, sources=None):
+        for i, j, score in self.scores:
+            for ressourceS in self.ressourcesS[i]:
+                if sources is not None and ressourceS not in sources:
+                    continue
+                for ressourceC in self.ressourcesC[j]:
+                    if candidats is None or ressourceC in candidats.get(ressourceS, ()):
+                        yield ressourceS, ressourceC, score
+
+    def nbGeneres(self, indicesS, indicesC):
+        """Nombre de couples (i, j) de indicesS x indicesC que couples génère"""
+        return sum(1 for i in indicesS for j in indicesC if (i, j) in self.generes)
+
+
+class CouplesManquants:
+    """
+    Pour les comparaisons en lot (TF-IDF ou MinHash seuls), qui ne génèrent que certains couples de littéraux :
+    nombre, par propriété, des couples de littéraux d'un couple de ressources absents du lot. Comme dans la
+    moyenne des autres mesures, ils comptent pour un score nul (voir aggregation.Agregateur).
+    """
+
+    def __init__(self, extractions, batchs):
+        self.indices = {}
+        for prop, listSource, listCible in extractions:
+            batch = batchs.get(prop)
+            if batch is None or typePropriete(prop, listSource, listCible) is not None:
+                continue
+            indicesS = {}
+            for ressource, value in listSource:
+                if isinstance(value, Literal):
+                    indicesS.setdefault(str(ressource), []).append(batch.valeursS[str(value)])
+            indicesC = {}
+            for ressource, value in listCible:
+                if isinstance(value, Literal):
+                    indicesC.setdefault(str(ressource), []).append(batch.valeursC[str(value)])
+            self.indices[prop] = (batch, indicesS, indicesC)
+
+    def __call__(self, ressourceS, ressourceC):
+        manquants = {}
+        for prop, (batch, indicesS, indicesC) in self.indices.items():
+            valeursS = indicesS.get(str(ressourceS))
+            valeursC = indicesC.get(str(ressourceC))
+            if valeursS and valeursC:
+                n = len(valeursS) * len(valeursC) - batch.nbGeneres(valeursS, valeursC)
+                if n:
+                    manquants[prop] = n
+        return manquants
+
+
+def comparaisonEnLot(measuresList):
+    """Vrai si les littéraux sont comparés en lot : TF-IDF seul, ou Jaccard seule avec permutationsMinHash"""
+    return set(measuresList) == {7} or (permutationsMinHash is not None and set(measuresList) == {6})
+
+
+def calculerLots(extractions, measuresList, seuil):
+    """Matrices TF-IDF ou jointures MinHash-LSH par propriété, calculées une fois pour tous les lots ; None sinon"""
+    if 7 in measuresList:
+        return {prop: ScoresTfIdf(listSource, listCible) for prop, listSource, listCible in extractions}
+    return lotsApproches(extractions, measuresList, seuil)
+
+
+def lotsApproches(extractions, measuresList, seuil):
+    """Jointures MinHash-LSH par propriété si elles remplacent Jaccard (seule mesure), None sinon"""
+    if permutationsMinHash is None or set(measuresList) != {6}:
+        return None
+    return {prop: ScoresJaccardLsh(listSource, listCible, seuil, permutationsMinHash)
+            for prop, listSource, listCible in extractions}
+
+
+def compare(propertiesList, seuilChoosed, measuresList, blocage=None, tailleMaxBloc=None,
+            agregation="moyenne", poids=None, budgetMemoire=None, nbProcessus=1, tailleLot=None, bornes=False,
+            suivi=None, k=None, unAUn=None, fragment=None, cascade=False):
+    """
+    k et unAUn choisissent les couples gardés parmi ceux qui atteignent le seuil (voir selection.selectionner) ;
+    avec k, les sources sont agrégées par lots (tailleLot, sinon budgetMemoire ou couplesParLot couples par lot)
+    dont les couples passent aussitôt dans les tas de topK : toute la table des couples n'est jamais en mémoire.
+    cascade abandonne d'abord les couples qui ne peuvent pas atteindre le seuil, lot de sources par lot
+    (voir scorerEnCascade) ; les scores des autres sont inchangés.
+    fragment (indice, nombre) ne compare que les sources de ce fragment (voir fragments.numeroFragment) ;
+    TF-IDF reste calculé sur toutes les valeurs, les scores sont donc ceux de la comparaison complète.
+    suivi (suivi.Suivi) reçoit l'avancement de la comparaison et permet de l'interrompre : Annulation est
+    alors levée. L'avancement n'est détaillé qu'en série ; en parallèle, seules les étapes sont signalées.
+    L'instrumentation (instr) est remise à zéro : son rapport ne porte que sur cette comparaison.
+    """
+    instr.reinitialiser()
+    if suivi is not None:
+        suivi.commencer("extraction")
+        if magasinColonnes is not None:
+            suivi.nommer = lambda r: str(magasinColonnes.uri(r))
+    extractions = extraireProprietes(propertiesList)
+    sources = None
+    if fragment is not None:
+        sources = sourcesFragment(extractions, *fragment)
+    if suivi is not None and blocage is not None:
+        suivi.commencer("blocage")
+    # Blocage : seules les paires candidates atteignent useMeasure
+    candidats = None
+    if blocage is not None:
+        with instr.etape("blocage"):
+            ensemble = blocking.genererCandidats(extractions, blocage, tailleMaxBloc)
+            candidats = grouperCandidats(ensemble)
+        ressourcesS = {r for prop, listSource, listCible in extractions for r, v in listSource}
+        ressourcesC = {r for prop, listSource, listCible in extractions for r, v in listCible}
+        instr.compter("couplesCandidats", len(ensemble))
+        instr.compter("couplesElaguesBlocage", len(ressourcesS) * len(ressourcesC) - len(ensemble))
+    # Mesures bornées : arrêt anticipé des couples qui ne peuvent pas atteindre le seuil
+    seuilMesures = seuilChoosed if bornes else None
+    batchs = None
+    if cascade and cascadeApplicable(measuresList, seuilChoosed):
+        if 7 in measuresList:
+            batchs = {prop: ScoresTfIdf(listSource, listCible) for prop, listSource, listCible in extractions}
+
+        def scorerRetenus(lot):
+            return scorerEnCascade(extractions, measuresList, candidats, seuilChoosed, lot, batchs, seuilMesures,
+                                   agregation, poids)
+    else:
+        def scorerRetenus(lot):
+            return scorerCouples(extractions, measuresList, candidats, seuilChoosed, lot, batchs, seuilMesures)
+
+    def scorerSuivi(lot):
+        scores = scorerRetenus(lot)
+        if suivi is not None:
+            scores = suivi.suivre(scores)
+        return compterScores(scores)
+
+    def scorerCompte(lot):
+        # En parallèle : scores comptés dans les processus fils (voir parallel)
+        return compterScores(scorerRetenus(lot))
+
+    def selectionner(resultats):
+        resultats = compterAgreges(resultats)
+        if magasinColonnes is not None:
+            # Retour aux URI avant la sélection, dont les égalités se départagent sur les URI
+            uri = magasinColonnes.uri
+            resultats = ((uri(ressourceS), uri(ressourceC), score)
+                         for ressourceS, ressourceC, score in resultats if score >= seuilChoosed)
+        return selection.selectionner(resultats, seuilChoosed, k, unAUn)
+
+    if suivi is not None:
+        suivi.commencer("comparaison", estimerScores(extractions, candidats))
+    enLot = comparaisonEnLot(measuresList)
+    if batchs is None and (nbProcessus != 1 or k is not None or enLot):
+        # Les matrices TF-IDF sont calculées une fois avant le fork et les lots pour garder les mêmes scores qu'en série
+        batchs = calculerLots(extractions, measuresList, seuilChoosed)
+    # En lot, seuls certains couples de littéraux sont générés : les autres comptent pour 0 à l'agrégation,
+    # et le seuil ne s'applique qu'aux scores agrégés
+    manquants = CouplesManquants(extractions, batchs) if enLot else None
+    if (nbProcessus != 1 or k is not None) and sources is None:
+        sources = {r for prop, listSource, listCible in extractions for r, v in listSource}
+    if k is not None:
+        # Top-k : agrégation lot de sources par lot, chaque lot réduit à ses k meilleures cibles par source
+        # puis versé dans les tas bornés de selection.topK ; en mémoire, k couples par source plus les couples
+        # agrégés d'un lot par processus
+        if tailleLot is None:
+            nbCibles = len({r for prop, listSource, listCible in extractions for r, v in listCible})
+            tailleLot = max(1, (budgetMemoire or couplesParLot) // max(1, nbCibles))
+        with instr.etape("comparaison"):
+            listFinaleMeasure = selectionner(parallel.resultatsParLots(scorerSuivi, sources, agregation, poids,
+                                                                       nbProcessus, tailleLot, manquants, k,
+                                                                       seuilChoosed))
     else:
-        list = property.split("#")
-        namespace = list[len(list) - 1]
-        list.remove(namespace)
-        uriProperty = "#".join(list) + "#"
-
-    req = None
-    if (uriProperty == "http://data.doremus.org/ontology#"):
-        req = """
-            PREFIX mus: <http://data.doremus.org/ontology#>
-            PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    
-            SELECT ?resource ?object
-            WHERE{
-                ?resource mus:%s ?object.
-                ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-            }
-        """
-    elif (uriProperty == "http://erlangen-crm.org/current/"):
-        req = """
-            PREFIX ecrm: <http://erlangen-crm.org/current/>
-            PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    
-            SELECT ?resource ?object
-            WHERE{
-                ?resource ecrm:%s ?object.
-                ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-            }
-        """
-    elif (uriProperty == "http://www.w3.org/2001/XMLSchema#"):
-        req = """
-            PREFIX xsd: <http://www.w3.org/2001/XMLSchema#>
-            PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    
-            SELECT ?resource ?object
-            WHERE{
-                ?resource xsd:%s ?object.
-                ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-            }
-        """
-    elif (uriProperty == "http://erlangen-crm.org/efrbroo/"):
-        req = """
-            PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    
-            SELECT ?resource ?object
-            WHERE{
-                ?resource efrbroo:%s ?object.
-                ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-            }
-        """
-    elif (uriProperty == "http://purl.org/dc/terms/"):
-        req = """
-            PREFIX dcterms: <http://purl.org/dc/terms/>
-            PREFIX efrbroo: <http://erlangen-crm.org/efrbroo/>
-            PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    
-            SELECT ?resource ?object
-            WHERE{
-                ?resource dcterms:%s ?object.
-                ?resource rdf:type efrbroo:F22_Self-Contained_Expression
-            }
-        """
-    req = req % namespace
-    results = graph.query(req)
-    # for r in results:
-    #     (r)
-    return results
-
-
-def compare(propertiesList, seuilChoosed, measuresList):
+        # L'étape comparaison inclut l'ajout incrémental de chaque score à l'agrégateur
+        with instr.etape("comparaison"):
+            if nbProcessus == 1:
+                agregateur = Agregateur(agregation, poids, budgetMemoire,
+                                        manquants=manquants).consommer(scorerSuivi(sources))
+            else:
+                agregateur = parallel.agregerEnParallele(scorerCompte, sources, agregation, poids, budgetMemoire,
+                                                         nbProcessus, tailleLot, manquants)
+        if suivi is not None:
+            suivi.commencer("agregation")
+        with instr.etape("agregation"):
+            listFinaleMeasure = selectionner(agregateur.resultats())
+    instr.compter("couplesRetenus", len(listFinaleMeasure))
+    if suivi is not None:
+        suivi.terminer(listFinaleMeasure)
+
+    return listFinaleMeasure
+
+
+def compareIncremental(propertiesList, seuilChoosed, measuresList, magasin, blocage=None, tailleMaxBloc=None,
+                       agregation="moyenne", poids=None, bornes=False, k=None, unAUn=None):
+    """
+    Comme compare, en réutilisant les scores du magasin (incremental.MagasinScores) de l'exécution précédente :
+    seuls les couples dont une ressource a été ajoutée ou modifiée sont mesurés, ceux des ressources
+    supprimées sont retirés, puis tous les couples stockés sont réagrégés.
+    TF-IDF dépend de tout le corpus : avec cette mesure, tout changement entraîne une comparaison complète.
+    """
+    instr.reinitialiser()
+    # Les identifiants du magasin en colonnes changent d'une lecture à l'autre : le magasin de scores garde les URI
+    extractions = versUris(extraireProprietes(propertiesList))
+    seuilMesures = seuilChoosed if bornes else None
+    config = incremental.signature(
+        proprietes=sorted(str(p) for p in propertiesList), mesures=sorted(measuresList), classe=classeExpression,
+        seuil=seuilChoosed if bornes or permutationsMinHash is not None else None,
+        blocage=None if blocage is None else [getattr(cle, "__name__", repr(cle)) for cle in blocage],
+        tailleMaxBloc=tailleMaxBloc, types=[proprietesTypees.get(str(p)) for p in propertiesList],
+        tolerances=tolerances, fenetre=fenetreVoisinage, minhash=permutationsMinHash)
+    with instr.etape("differences"):
+        empreintesS = incremental.empreintesRessources(extractions, 1)
+        empreintesC = incremental.empreintesRessources(extractions, 2)
+        if magasin.signature() != config:
+            magasin.reinitialiser(config)
+        modifieesS, supprimeesS = incremental.differences(magasin.empreintes("source"), empreintesS)
+        modifieesC, supprimeesC = incremental.differences(magasin.empreintes("cible"), empreintesC)
+        if 7 in measuresList and (modifieesS or supprimeesS or modifieesC or supprimeesC):
+            modifieesS, modifieesC = set(empreintesS), set(empreintesC)
+    instr.compter("ressourcesModifiees", len(modifieesS) + len(modifieesC))
+    instr.compter("ressourcesSupprimees", len(supprimeesS) + len(supprimeesC))
+    try:
+        magasin.supprimerCouples(modifieesS | supprimeesS, modifieesC | supprimeesC)
+        if modifieesS or modifieesC:
+            candidats = None
+            if blocage is not None:
+                with instr.etape("blocage"):
+                    candidats = grouperCandidats(blocking.genererCandidats(extractions, blocage, tailleMaxBloc))
+            batchs = calculerLots(extractions, measuresList, seuilChoosed)
+            manquants = CouplesManquants(extractions, batchs) if comparaisonEnLot(measuresList) else None
+            # Sources modifiées contre toutes les cibles, puis sources inchangées contre cibles modifiées
+            sourcesInchangees = {str(r) for prop, listSource, listCible in extractions for r, v in listSource} - \
+                modifieesS
+            with instr.etape("comparaison"):
+                scores = scorerCouples(extractions, measuresList, candidats, seuilChoosed,
+                                       {r for prop, listSource, listCible in extractions for r, v in listSource
+                                        if str(r) in modifieesS}, batchs, seuilMesures)
+                nb = magasin.ajouterScores(compterScores(scores), manquants)
+                if modifieesC and sourcesInchangees:
+                    extractionsC = [(prop, listSource, [(r, v) for r, v in listCible if str(r) in modifieesC])
+                                    for prop, listSource, listCible in extractions]
+                    scores = scorerCouples(extractionsC, measuresList, candidats, seuilChoosed,
+                                           {r for prop, listSource, listCible in extractions for r, v in listSource
+                                            if str(r) in sourcesInchangees}, batchs, seuilMesures)
+                    # Avec TF-IDF seul, les couples viennent de la matrice complète : les cibles inchangées sont écartées
+                    nb += magasin.ajouterScores((s for s in compterScores(scores) if str(s[1]) in modifieesC),
+                                                manquants)
+            instr.compter("scoresStockes", nb)
+        magasin.majEmpreintes("source", empreintesS, modifieesS, supprimeesS)
+        magasin.majEmpreintes("cible", empreintesC, modifieesC, supprimeesC)
+        magasin.valider()
+    except BaseException:
+        magasin.annuler()
+        raise
+    with instr.etape("agregation"):
+        resultats = ((URIRef(ressourceS), URIRef(ressourceC), moyenne) for ressourceS, ressourceC, moyenne
+                     in incremental.agreger(magasin.accumulateurs(), agregation, poids))
+        listFinaleMeasure = selection.selectionner(compterAgreges(resultats), seuilChoosed, k, unAUn)
+    instr.compter("couplesRetenus", len(listFinaleMeasure))
+    return listFinaleMeasure
+
+
+def sourcesFragment(extractions, indice, nombre):
+    """Ressources sources dont l'URI tombe dans le fragment indice parmi nombre"""
+    nom = str if magasinColonnes is None else (lambda r: str(magasinColonnes.uri(r)))
+    return {r for r in {r for prop, listSource, listCible in extractions for r, v in listSource}
+            if fragments.numeroFragment(nom(r), nombre) == indice}
+
+
+def evaluerMinHash(propertiesList, seuilChoosed, nbPermutations=128, **options):
+    """
+    Rappel de la jointure MinHash-LSH contre la jointure exacte de Jaccard : sur les couples de littéraux
+    distincts de chaque propriété (la jointure elle-même), puis, avec la précision, sur les couples de ressources
+    retenus par compare avec Jaccard seule (les couples de valeurs non joints y comptent pour 0).
+    options est transmis à compare.
+    """
+    global permutationsMinHash
+    valeursExactes = set()
+    valeursApprochees = set()
+    dureeExacte = dureeApprochee = 0.0
+    for prop, listSource, listCible in extraireProprietes(propertiesList):
+        valeursS = list(indexerLitteraux(listSource)[0])
+        valeursC = list(indexerLitteraux(listCible)[0])
+        debut = time.perf_counter()
+        valeursExactes.update((str(prop), i, j) for i, j, score in minhash.jointureExacte(valeursS, valeursC,
+                                                                                          seuilChoosed))
+        dureeExacte += time.perf_counter() - debut
+        debut = time.perf_counter()
+        valeursApprochees.update((str(prop), i, j) for i, j, score in minhash.jointure(valeursS, valeursC,
+                                                                                       seuilChoosed, nbPermutations))
+        dureeApprochee += time.perf_counter() - debut
+    precedent = permutationsMinHash
+    try:
+        permutationsMinHash = None
+        exacts = compare(propertiesList, seuilChoosed, [6], **options)
+        permutationsMinHash = nbPermutations
+        approches = compare(propertiesList, seuilChoosed, [6], **options)
+    finally:
+        permutationsMinHash = precedent
+    bandes, lignes = minhash.parametres(seuilChoosed, nbPermutations)
+    approchesHorsExacts = {(str(c[0]), str(c[1])) for c in approches} - {(str(c[0]), str(c[1])) for c in exacts}
+    return {"seuil": seuilChoosed, "permutations": nbPermutations, "bandes": bandes, "lignes": lignes,
+            "valeursExactes": len(valeursExactes), "valeursApprochees": len(valeursApprochees),
+            "rappelValeurs": len(valeursExactes & valeursApprochees) / len(valeursExactes) if valeursExactes else 1.0,
+            "dureeJointureExacte": dureeExacte, "dureeJointureApprochee": dureeApprochee,
+            "couplesExacts": len(exacts), "couplesApproches": len(approches),
+            "couplesApprochesHorsExacts": len(approchesHorsExacts),
+            "rappelCouples": minhash.rappel(approches, exacts),
+            "precisionCouples": minhash.precision(approches, exacts)}
+
+
+def estimerScores(extractions, candidats=None):
+    """Nombre de couples de valeurs que scorerCouples aura à mesurer (majorant : les nœuds anonymes sont ignorés)"""
+    total = 0
+    for prop, listSource, listCible in extractions:
+        if candidats is None:
+            total += len(listSource) * len(listCible)
+            continue
+        nbValeursCible = {}
+        for ressourceC, valueC in listCible:
+            nbValeursCible[ressourceC] = nbValeursCible.get(ressourceC, 0) + 1
+        for ressourceS, valueS in listSource:
+            total += sum(nbValeursCible.get(ressourceC, 0) for ressourceC in candidats.get(ressourceS, ()))
+    return total
+
+
+def compterAgreges(resultats):
+    for resultat in resultats:
+        instr.compter("couplesAgreges")
+        yield resultat
+
+
+def compterScores(scores):
+    for score in scores:
+        instr.compter("scores")
+        yield score
+
+
+def scorerCouples(extractions, measuresList, candidats=None, seuilBatch=0.0, sources=None, batchs=None,
+                  seuilMesures=None, paires=None):
+    """
+    Génère les scores (ressourceS, ressourceC, prop, score) de chaque couple de valeurs comparables.
+    Si TF-IDF est la seule mesure, les littéraux sont comparés en lot et seuls les scores non nuls générés ;
+    de même pour Jaccard seule avec permutationsMinHash (jointure approchée MinHash-LSH réglée pour seuilBatch).
+    Les couples de littéraux non générés comptent pour 0 à l'agrégation (voir CouplesManquants).
+    sources restreint les ressources sources traitées ; batchs donne des matrices TF-IDF déjà calculées.
+    seuilMesures est transmis à useMeasure pour utiliser les mesures bornées.
+    paires ({prop: couples de valeurs}, voir elaguerCascade) restreint les valeurs mesurées sans blocage.
+    """
     jaro=False
     jaroWinkler=False
     identity=False
@@ -181,6 +732,7 @@ def compare(propertiesList, seuilChoosed, measuresList):
     qGrams=False
     monge_elkan=False
     jaccard=False
+    tfidf=False
     for measure in measuresList:
        if measure==0:
            jaro=True
@@ -196,79 +748,248 @@ def compare(propertiesList, seuilChoosed, measuresList):
             monge_elkan=True
        elif measure==6:
            jaccard=True
-    valuesCompare = []
-    listFinaleMeasure = []
-    for prop in propertiesList:
-        listSource = getSubObjSource(prop, grapheSource)
-        listCible = getSubObjSource(prop, grapheCible)
+       elif measure==7:
+           tfidf=True
+    seulTfidf = tfidf and not (jaro or jaroWinkler or identity or levenshtein or qGrams or monge_elkan or jaccard)
+    seulJaccardLsh = permutationsMinHash is not None and set(measuresList) == {6}
+    for prop, listSource, listCible in extractions:
+        typeValeur = typePropriete(prop, listSource, listCible)
+        if typeValeur is not None:
+            if sources is not None:
+                listSource = [(r, v) for r, v in listSource if r in sources]
+            yield from scorerTypes(prop, listSource, listCible, typeValeur, candidats)
+            continue
+        # Rang des valeurs sur toutes les sources : les scores d'un couple sont sommés dans le même ordre
+        # quel que soit le lot (en série, en parallèle ou par fragment), donc avec les mêmes arrondis
+        ordre = None
+        if sources is not None:
+            ordre = {}
+            for r, v in listSource:
+                ordre.setdefault(v, len(ordre))
+        batch = None
+        if batchs is not None:
+            batch = batchs[prop]
+        elif tfidf:
+            batch = ScoresTfIdf(listSource, listCible)
+        elif seulJaccardLsh:
+            batch = ScoresJaccardLsh(listSource, listCible, seuilBatch, permutationsMinHash)
+        if sources is not None:
+            listSource = [(r, v) for r, v in listSource if r in sources]
+        if jaro or jaroWinkler or qGrams or monge_elkan or jaccard:
+            # Pré-traitement : un profil par valeur distincte, partagé par toutes les mesures
+            with instr.etape("profils"):
+                instr.compter("profils", profils.preparer(
+                    str(v) for listValues in (listSource, listCible) for r, v in listValues if isinstance(v, Literal)))
+        if monge_elkan and candidats is None and paires is None:
+            # Sans blocage, presque tous les couples de jetons servent : la matrice est calculée d'un bloc
+            moteurMongeElkan(mesureInterneMongeElkan).preparer(
+                list(dict.fromkeys(str(v) for r, v in listSource if isinstance(v, Literal))),
+                list(dict.fromkeys(str(v) for r, v in listCible if isinstance(v, Literal))))
+        if seulTfidf or seulJaccardLsh:
+            for ressourceS, ressourceC, res in batch.couples(candidats, sources):
+                yield ressourceS, ressourceC, prop, res
+            # Il ne reste que les valeurs URI du vocabulaire à comparer une à une
+            listSource = [(r, v) for r, v in listSource if isinstance(v, URIRef)]
+            listCible = [(r, v) for r, v in listCible if isinstance(v, URIRef)]
 
-        for ressourceS,valueS in listSource:
-            for ressourceC, valueC in listCible:
-                sommeMeasure=0
-                compteur=0
-                if (not isinstance(valueC, BNode) and not isinstance(valueS, BNode)):
-                    if isinstance(valueC, rdflib.term.Literal) and isinstance(valueS, rdflib.term.Literal):
-                        res = useMeasure(str(valueS), str(valueC), jaro, jaroWinkler, identity, levenshtein, qGrams,
-                                         monge_elkan,jaccard)
-                        valuesCompare.append((ressourceS, ressourceC, res))
-                    elif isinstance(valueS, URIRef) and isinstance(valueC, URIRef) and isValueMus(prop, valueS):
-                        valueSTokend = Tokenisation(valueS)
-                        valueCTokend = Tokenisation(valueC)
-                        res = useMeasure(valueSTokend, valueCTokend, jaro=0, jaroWinkler=0, identity=1, levenshtein=0,
-                                         qGrams=0, monge_elkan=0,jaccard=0)
-                        valuesCompare.append((ressourceS, ressourceC, res))
-
-    i=0
-    size=len(valuesCompare)
-    somme=0
-    compteur=0
-    while i < len(valuesCompare):
-        j = i + 1
-        valuei = valuesCompare[i]
-        ressourceSi = valuei[0]
-        ressourceCi = valuei[1]
-        somme = valuei[2]
-        compteur = 1
-        del valuesCompare[i]
-        while j < len(valuesCompare):
-            if i < (len(valuesCompare) - 1):
-                valuej = valuesCompare[j]
-                ressourceSj = valuej[0]
-                ressourceCj = valuej[1]
-                if (str(ressourceSi) == str(ressourceSj)) and (str(ressourceCj) == str(ressourceCi)):
-                    somme += valuej[2]
-                    compteur += 1
-                    del valuesCompare[j]
-            j += 1
-        moyenne = somme / compteur
-        print(moyenne)
-        if moyenne >= seuilChoosed:
-            listFinaleMeasure.append([ressourceSi, ressourceCi, moyenne])
-        i = i + 1
+        def scorerValeurs(valueS, valueC):
+            if (not isinstance(valueC, BNode) and not isinstance(valueS, BNode)):
+                if isinstance(valueC, rdflib.term.Literal) and isinstance(valueS, rdflib.term.Literal):
+                    return useMeasure(str(valueS), str(valueC), jaro, jaroWinkler, identity, levenshtein, qGrams,
+                                      monge_elkan,jaccard, batch.score(valueS, valueC) if batch else None,
+                                      seuilMesures)
+                elif isinstance(valueS, URIRef) and isinstance(valueC, URIRef) and isValueMus(prop, valueS):
+                    valueSTokend = Tokenisation(valueS)
+                    valueCTokend = Tokenisation(valueC)
+                    return useMeasure(valueSTokend, valueCTokend, jaro=0, jaroWinkler=0, identity=1, levenshtein=0,
+                                      qGrams=0, monge_elkan=0,jaccard=0)
+            return None
 
-    return listFinaleMeasure
+        if candidats is None:
+            # Chaque couple de valeurs distinctes n'est mesuré qu'une fois puis redistribué aux ressources
+            retenues = paires.get(prop, ()) if paires is not None else None
+            for valueS, ressourcesS, valueC, ressourcesC in groupesAComparer(listSource, listCible, ordre):
+                if retenues is not None and (valueS, valueC) not in retenues:
+                    continue
+                res = scorerValeurs(valueS, valueC)
+                if res is not None:
+                    for ressourceS in ressourcesS:
+                        for ressourceC in ressourcesC:
+                            yield ressourceS, ressourceC, prop, res
+        else:
+            for ressourceS, valueS, ressourceC, valueC in couplesAComparer(listSource, listCible, candidats):
+                res = scorerValeurs(valueS, valueC)
+                if res is not None:
+                    yield ressourceS, ressourceC, prop, res
+
+
+def cascadeApplicable(measuresList, seuil):
+    """La cascade n'élague rien sans seuil, ni quand les littéraux sont comparés en lot (TF-IDF ou MinHash seuls)"""
+    if seuil <= 0 or set(measuresList) == {7}:
+        return False
+    return not (permutationsMinHash is not None and set(measuresList) == {6})
+
+
+def mesuresUtilisees(measuresList, seuil=None):
+    """{nom: (mesure, arguments)} des mesures de chaînes qu'appelle useMeasure pour measuresList"""
+    choisies = {}
+    if 0 in measuresList:
+        choisies["jaro"] = (Jaro, ()) if seuil is None else (JaroBorne, (seuil,))
+    if 1 in measuresList:
+        choisies["jaroWinkler"] = (JaroWinkler, ()) if seuil is None else (JaroWinklerBorne, (seuil,))
+    if 2 in measuresList:
+        choisies["identity"] = (Identity, ())
+    if 3 in measuresList:
+        choisies["levenshtein"] = (Levenshtein, ()) if seuil is None else (LevenshteinBorne, (seuil,))
+    if 4 in measuresList:
+        choisies["qGrams"] = (QGrams, ()) if seuil is None else (QGramsBorne, (seuil,))
+    if 5 in measuresList:
+        choisies["monge_elkan"] = (Monge_elkan, (mesureInterneMongeElkan,))
+    if 6 in measuresList:
+        choisies["jaccard"] = (Jaccard, ())
+    return choisies
+
+
+def scorerEnCascade(extractions, measuresList, candidats, seuil, sources=None, batchs=None, seuilMesures=None,
+                    agregation="moyenne", poids=None):
+    """
+    Scores de scorerCouples pour les seuls couples retenus par elaguerCascade. Les sources sont bornées par lots
+    d'environ couplesParLotCascade couples : seules les paires de valeurs d'un lot sont en mémoire à la fois.
+    """
+    ordre = dict.fromkeys(r for prop, listSource, listCible in extractions for r, v in listSource)
+    if sources is not None:
+        ordre = [r for r in ordre if r in sources]
+    ordre = list(ordre)
+    nbCibles = len({r for prop, listSource, listCible in extractions for r, v in listCible})
+    taille = max(1, couplesParLotCascade // max(1, nbCibles))
+    for debut in range(0, len(ordre), taille):
+        lot = set(ordre[debut:debut + taille])
+        with instr.etape("cascade"):
+            couplesRetenus, pairesRetenues = elaguerCascade(extractions, measuresList, candidats, seuil, lot,
+                                                            batchs, seuilMesures, agregation, poids)
+        if candidats is not None:
+            # Avec blocage, il suffit de retirer les couples abandonnés des candidats (dans le même ordre)
+            candidatsLot = {rs: dict.fromkeys(rc for rc in rcs if (rs, rc) in couplesRetenus)
+                            for rs, rcs in candidats.items() if rs in lot}
+            yield from scorerCouples(extractions, measuresList, candidatsLot, seuil, lot, batchs, seuilMesures)
+            continue
+        for score in scorerCouples(extractions, measuresList, None, seuil, lot, batchs, seuilMesures,
+                                   pairesRetenues):
+            if (score[0], score[1]) in couplesRetenus:
+                yield score
 
-def useMeasure(valueS,valueC,jaro,jaroWinkler,identity,levenshtein,qGrams,monge_elkan,jaccard):
+
+def elaguerCascade(extractions, measuresList, candidats, seuil, sources=None, batchs=None, seuilMesures=None,
+                   agregation="moyenne", poids=None):
+    """
+    Cascade des mesures (cascade.elaguer) sur les couples que scorerCouples mesurerait.
+    Renvoie les couples de ressources qui peuvent encore atteindre seuil et, par propriété, les couples de
+    valeurs qu'il reste à mesurer pour eux ; le nombre de couples abandonnés à chaque niveau est compté
+    (compteurs elaguesCascade:<niveau>).
+    """
+    choisies = mesuresUtilisees(measuresList, seuilMesures)
+    mesures = {nom: (lambda s1, s2, f=f, args=args: compareLiteral(s1, s2, f, *args),
+                     lambda s1, s2, f=f, args=args: f(s1, s2, *args),
+                     cascade.majorant(f, *args))
+               for nom, (f, args) in choisies.items()}
+    paires = []
+    for prop, listSource, listCible in extractions:
+        typeValeur = typePropriete(prop, listSource, listCible)
+        if sources is not None:
+            listSource = [(r, v) for r, v in listSource if r in sources]
+        if typeValeur is not None:
+            # Nombres, catalogues et dates : scores exacts, bon marché
+            for ressourceS, ressourceC, p, res in scorerTypes(prop, listSource, listCible, typeValeur, candidats):
+                paire = cascade.Paire(prop, None, None, res, 1)
+                paire.couples.append((ressourceS, ressourceC))
+                paires.append(paire)
+            continue
+        batch = batchs[prop] if batchs is not None else None
+        if candidats is None:
+            groupes = ((valueS, valueC, [(rs, rc) for rs in ressourcesS for rc in ressourcesC])
+                       for valueS, ressourcesS, valueC, ressourcesC in groupesAComparer(listSource, listCible))
+        else:
+            parValeurs = {}
+            for ressourceS, valueS, ressourceC, valueC in couplesAComparer(listSource, listCible, candidats):
+                parValeurs.setdefault((valueS, valueC), []).append((ressourceS, ressourceC))
+            groupes = ((valueS, valueC, couples) for (valueS, valueC), couples in parValeurs.items())
+        for valueS, valueC, couples in groupes:
+            if isinstance(valueS, Literal) and isinstance(valueC, Literal):
+                tfidf = batch.score(valueS, valueC) if batch else None
+                paire = cascade.Paire(prop, (valueS, valueC), (str(valueS), str(valueC)), tfidf or 0.0,
+                                      len(mesures) + (tfidf is not None), mesures)
+            elif isinstance(valueS, URIRef) and isinstance(valueC, URIRef) and isValueMus(prop, valueS):
+                paire = cascade.Paire(prop, (valueS, valueC), None,
+                                      useMeasure(Tokenisation(valueS), Tokenisation(valueC), jaro=0, jaroWinkler=0,
+                                                 identity=1, levenshtein=0, qGrams=0, monge_elkan=0, jaccard=0), 1)
+            else:
+                continue
+            paire.couples = couples
+            paires.append(paire)
+    couplesRetenus, rapport = cascade.elaguer(paires, mesures, seuil, agregation, poids)
+    for niveau in rapport:
+        nom = niveau["niveau"]
+        if niveau["propriete"] is not None:
+            nom = re.split("[/#]", str(niveau["propriete"]))[-1] + ":" + nom
+        instr.compter("elaguesCascade:" + nom, niveau["elagues"])
+        instr.compter("mesuresCascade:" + nom, niveau["evalues"])
+    pairesRetenues = {}
+    for paire in paires:
+        if paire.valeurs is not None and any(couple in couplesRetenus for couple in paire.couples):
+            pairesRetenues.setdefault(paire.prop, set()).add(paire.valeurs)
+    return couplesRetenus, pairesRetenues
+
+
+def scorerTypes(prop, listSource, listCible, typeValeur, candidats=None):
+    """
+    Nombres, catalogues et dates : seuls les couples voisins dans la tolérance sont mesurés (voisinage trié),
+    avec ou sans blocage ; le blocage ne fait que retirer les couples non candidats.
+    """
+    tolerance = tolerances[typeValeur]
+    for ressourceS, valueS, ressourceC, valueC, res in voisinage.voisins(listSource, listCible, typeValeur,
+                                                                         tolerance, fenetreVoisinage):
+        if candidats is None or ressourceC in candidats.get(ressourceS, ()):
+            yield ressourceS, ressourceC, prop, res
+
+
+def useMeasure(valueS,valueC,jaro,jaroWinkler,identity,levenshtein,qGrams,monge_elkan,jaccard,tfidf=None,seuil=None):
+    """Moyenne des mesures choisies ; avec seuil, les variantes bornées ramènent à 0 les scores sous le seuil"""
     compteur=0
     sommeMeasure=0
+    # Score TF-IDF déjà calculé en lot pour ce couple
+    if tfidf is not None:
+        sommeMeasure += tfidf
+        compteur += 1
     if jaro:
-        sommeMeasure += compareLiteral(valueS,valueC, Jaro)
+        if seuil is None:
+            sommeMeasure += compareLiteral(valueS,valueC, Jaro)
+        else:
+            sommeMeasure += compareLiteral(valueS,valueC, JaroBorne, seuil)
         compteur += 1
     if jaroWinkler:
-        sommeMeasure += compareLiteral(valueS,valueC, JaroWinkler)
+        if seuil is None:
+            sommeMeasure += compareLiteral(valueS,valueC, JaroWinkler)
+        else:
+            sommeMeasure += compareLiteral(valueS,valueC, JaroWinklerBorne, seuil)
         compteur += 1
 
     if identity:
         sommeMeasure += compareLiteral(valueS,valueC, Identity)
         compteur += 1
     if levenshtein:
-        sommeMeasure += compareLiteral(valueS,valueC, Levenshtein)
+        if seuil is None:
+            sommeMeasure += compareLiteral(valueS,valueC, Levenshtein)
+        else:
+            sommeMeasure += compareLiteral(valueS,valueC, LevenshteinBorne, seuil)
         compteur += 1
     if qGrams:
-        sommeMeasure += compareLiteral(valueS,valueC, QGrams)
+        if seuil is None:
+            sommeMeasure += compareLiteral(valueS,valueC, QGrams)
+        else:
+            sommeMeasure += compareLiteral(valueS,valueC, QGramsBorne, seuil)
         compteur += 1
     if monge_elkan:
-        sommeMeasure += compareLiteral(valueS,valueC, Monge_elkan)
+        sommeMeasure += compareLiteral(valueS,valueC, Monge_elkan, mesureInterneMongeElkan)
         compteur += 1
     if jaccard:
         sommeMeasure += compareLiteral(valueS,valueC, Jaccard)
@@ -276,49 +997,44 @@ def useMeasure(valueS,valueC,jaro,jaroWinkler,identity,levenshtein,qGrams,monge_
     return sommeMeasure/compteur
 
 
-def compareLiteral(value1, value2, measure):
-    return measure(value1, value2)
-def openResultFile(dicRessourceIdentique):
+def compareLiteral(value1, value2, measure, *args):
+    if isinstance(value1, str) and isinstance(value2, str):
+        return instr.mesurer(measure.__name__, memo.cacheScores.score, measure, value1, value2, *args)
+    return instr.mesurer(measure.__name__, measure, value1, value2, *args)
+
+
+def statistiquesCache():
+    return memo.cacheScores.statistiques()
+
+
+def openResultFile(dicRessourceIdentique, chemin='resultat.ttl'):
     # Afficher les préfixes
-    with open('resultat.ttl', 'w') as file:
+    with instr.etape("ecriture"), open(chemin, 'w') as file:
         file.write("@prefix owl: < http: // www.w3.org / 2002 / 07 / owl  # >\n")
         for key in dicRessourceIdentique:
             file.write("<"+str(key[0])+">" + "owl:sameAs" + "<"+str(key[1])+">" + "\n")
 
-def calculPrecisionRappel():
-    true_positives = 0
-    fileRef = open('referenceFile', 'r')
-    fileResult = open('resultat.ttl', 'r')
-    lignesRef = fileRef.readlines()
-    lignesRes = fileResult.readlines()
-    ressourcesSimRes = []
-    ressourcesSimRef = []
-    # Pour le fichier résultat
-    for line in lignesRes:
-        match = re.match(r"<(.+)>owl:sameAs<(.+)>", line)
-        if match:
-            r1 = match.group(1)
-            r2 = match.group(2)
-            ressourcesSimRes.append((r1, r2))
-    # Pour le fichier référence
-    i = 0
-    while i < len(lignesRef):
-        if "<entity1" in lignesRef[i]:
-            # Utilisation d'une regex pour extraire les URIs
-            r1 = re.search('rdf:resource="(.*?)"', lignesRef[i]).group(1)
-            r2 = re.search('rdf:resource="(.*?)"', lignesRef[i + 1]).group(1)
-            ressourcesSimRef.append((r1, r2))
-        i += 1
-    # Calcul TP, FP, FN
-    total1 = len(ressourcesSimRef)
-    total2 = len(ressourcesSimRes)
-    for couple in ressourcesSimRes:
-        if couple in ressourcesSimRef:
-            true_positives += 1         
-    precision = true_positives / total1
-    recall = true_positives / total2
-    f_measure=2 * (precision * recall) / (precision + recall)
-    return [precision, recall,f_measure]
 
+def rapportBlocage(propertiesList, blocage=blocking.clesParDefaut, tailleMaxBloc=None, fichierRef='referenceFile'):
+    with open(fichierRef, 'r') as fileRef:
+        reference = lireReference(fileRef.readlines())
+    extractions = versUris(extraireProprietes(propertiesList))
+    candidats = blocking.genererCandidats(extractions, blocage, tailleMaxBloc)
+    return blocking.rapportBlocage(candidats, extractions, reference)
+
+
+def evaluerSeuils(propertiesList, measuresList, fichierRef='referenceFile', **options):
+    """
+    Compare une seule fois en gardant tous les couples agrégés, puis évalue chaque seuil contre la référence.
+    Renvoie (couples, évaluation) ; options est transmis à compare (blocage, nbProcessus...).
+    """
+    couples = compare(propertiesList, 0.0, measuresList, **options)
+    return couples, evaluation.evaluer(couples, evaluation.chargerReference(fichierRef))
 
 
+def calculPrecisionRappel(fichierRef='referenceFile', fichierResultat='resultat.ttl'):
+    reference = evaluation.chargerReference(fichierRef)
+    resultat = evaluation.chargerResultat(fichierResultat)
+    vraisPositifs = len(resultat & reference)
+    precision, recall, f_measure = evaluation.mesuresQualite(vraisPositifs, len(resultat), len(reference))
+    return [precision, recall, f_measure]
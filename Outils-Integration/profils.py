@@ -0,0 +1,96 @@
+import zlib
+from collections import Counter, OrderedDict
+
+# Taille des q-grammes de QGrams, Jaccard et MinHash
+q = 3
+# Nombre maximal de profils gardés et taille approximative maximale du cache en octets
+# (les moins récemment utilisés sont oubliés)
+profilsMax = 200000
+profilsOctetsMax = 256 * 1024 * 1024
+
+
+def ngrams(chaine, n):
+    """Même résultat que nltk.ngrams sur une chaîne : tuples de n caractères consécutifs"""
+    return zip(*(chaine[i:] for i in range(n)))
+
+
+class Profil:
+    """
+    Pré-traitements d'une chaîne partagés par toutes les mesures : forme en minuscules, jetons, multi-ensemble
+    et ensemble des q-grammes (de la forme en minuscules), positions et décompte des caractères.
+    Le vecteur des q-grammes hachés (crc32, stable d'un processus à l'autre) n'est calculé qu'à la demande.
+    """
+
+    __slots__ = ("texte", "longueur", "minuscule", "jetons", "nbGrammes", "grammes", "ensembleGrammes",
+                 "positions", "caracteres", "_vecteur")
+
+    def __init__(self, texte):
+        self.texte = texte
+        self.longueur = len(texte)
+        self.minuscule = texte.lower()
+        self.jetons = texte.split()
+        grammes = list(ngrams(self.minuscule, q))
+        self.nbGrammes = len(grammes)
+        self.grammes = Counter(grammes)
+        self.ensembleGrammes = frozenset(self.grammes)
+        positions = {}
+        for j, c in enumerate(texte):
+            positions.setdefault(c, []).append(j)
+        self.positions = positions
+        self.caracteres = Counter({c: len(p) for c, p in positions.items()})
+        self._vecteur = None
+
+    @property
+    def vecteur(self):
+        """{hachage du q-gramme: nombre d'occurrences}"""
+        if self._vecteur is None:
+            self._vecteur = {zlib.crc32("".join(g).encode()): n for g, n in self.grammes.items()}
+        return self._vecteur
+
+
+_profils = OrderedDict()
+_octets = 0
+
+
+def octetsProfil(p):
+    """
+    Taille approximative d'un profil et de son entrée dans le cache, vecteur compris : relevée avec tracemalloc
+    sur les littéraux DOREMUS (un peu surestimée, de 5 à 70 Ko selon la longueur)
+    """
+    return 400 + 12 * p.longueur + 250 * len(p.grammes) + 180 * len(p.positions)
+
+
+def octets():
+    """Taille approximative des profils en cache"""
+    return _octets
+
+
+def profil(texte):
+    """Profil de la chaîne, construit une seule fois tant qu'il reste dans le cache"""
+    global _octets
+    p = _profils.get(texte)
+    if p is None:
+        p = Profil(texte)
+        _profils[texte] = p
+        _octets += octetsProfil(p)
+        # Le profil demandé reste en cache même s'il dépasse seul la borne en octets
+        while len(_profils) > 1 and (len(_profils) > profilsMax or _octets > profilsOctetsMax):
+            _octets -= octetsProfil(_profils.popitem(last=False)[1])
+    else:
+        _profils.move_to_end(texte)
+    return p
+
+
+def preparer(valeurs):
+    """Étape de pré-traitement : un profil par valeur distincte avant les comparaisons ; renvoie leur nombre"""
+    n = 0
+    for texte in dict.fromkeys(valeurs):
+        profil(texte)
+        n += 1
+    return n
+
+
+def vider():
+    global _octets
+    _profils.clear()
+    _octets = 0
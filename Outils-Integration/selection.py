@@ -0,0 +1,115 @@
+import heapq
+
+
+def topK(resultats, k, seuil=0.0):
+    """
+    Garde les k meilleures cibles de chaque source parmi les (ressourceS, ressourceC, score) au moins égaux
+    à seuil. Un tas de taille k par source : la mémoire reste bornée par k fois le nombre de sources.
+    """
+    tas = {}
+    for ressourceS, ressourceC, score in resultats:
+        if score < seuil:
+            continue
+        meilleurs = tas.get(ressourceS)
+        if meilleurs is None:
+            meilleurs = []
+            tas[ressourceS] = meilleurs
+        entree = (score, str(ressourceC), ressourceC)
+        if len(meilleurs) < k:
+            heapq.heappush(meilleurs, entree)
+        elif entree > meilleurs[0]:
+            heapq.heapreplace(meilleurs, entree)
+    return [[ressourceS, ressourceC, score]
+            for ressourceS, meilleurs in tas.items()
+            for score, cle, ressourceC in sorted(meilleurs, reverse=True)]
+
+
+def unAUnGlouton(couples):
+    """Affectation gloutonne : couples pris par score décroissant tant que source et cible sont libres"""
+    sourcesPrises = set()
+    ciblesPrises = set()
+    retenus = []
+    for ressourceS, ressourceC, score in sorted(couples, key=lambda c: (-c[2], str(c[0]), str(c[1]))):
+        if ressourceS in sourcesPrises or ressourceC in ciblesPrises:
+            continue
+        sourcesPrises.add(ressourceS)
+        ciblesPrises.add(ressourceC)
+        retenus.append([ressourceS, ressourceC, score])
+    return retenus
+
+
+def composantes(couples):
+    """Regroupe les couples par composante connexe du graphe biparti sources-cibles (union-find)"""
+    parent = {}
+
+    def racine(x):
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for ressourceS, ressourceC, score in couples:
+        s, c = ("s", ressourceS), ("c", ressourceC)
+        parent.setdefault(s, s)
+        parent.setdefault(c, c)
+        rs, rc = racine(s), racine(c)
+        if rs != rc:
+            parent[rs] = rc
+    groupes = {}
+    for couple in couples:
+        groupes.setdefault(racine(("s", couple[0])), []).append(couple)
+    return list(groupes.values())
+
+
+def unAUnOptimal(couples):
+    """
+    Affectation de somme des scores maximale, composante par composante, par couplage biparti de poids optimal
+    sur une matrice creuse (scipy) : la mémoire suit le nombre de couples, pas sources x cibles.
+    """
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import min_weight_full_bipartite_matching
+
+    retenus = []
+    for groupe in composantes(couples):
+        if len(groupe) == 1:
+            retenus.append(list(groupe[0]))
+            continue
+        sources = {r: i for i, r in enumerate(dict.fromkeys(c[0] for c in groupe))}
+        cibles = {r: j for j, r in enumerate(dict.fromkeys(c[1] for c in groupe))}
+        meilleurs = {}
+        for ressourceS, ressourceC, score in groupe:
+            cle = (sources[ressourceS], cibles[ressourceC])
+            meilleurs[cle] = max(meilleurs.get(cle, score), score)
+        # Chaque source a aussi sa propre cible fictive (colonne len(cibles) + i) pour rester sans partenaire :
+        # un couplage complet des sources existe toujours. Les poids sont décalés de 1 (fictif : 0 + 1),
+        # ce qui ajoute la même constante à tout couplage complet et garde l'optimum.
+        nbSources = len(sources)
+        lignes = [i for i, j in meilleurs] + list(range(nbSources))
+        colonnes = [j for i, j in meilleurs] + [len(cibles) + i for i in range(nbSources)]
+        poids = [score + 1.0 for score in meilleurs.values()] + [1.0] * nbSources
+        matrice = csr_matrix((poids, (lignes, colonnes)), shape=(nbSources, len(cibles) + nbSources))
+        lignes, colonnes = min_weight_full_bipartite_matching(matrice, maximize=True)
+        inverseS = list(sources)
+        inverseC = list(cibles)
+        for i, j in zip(lignes.tolist(), colonnes.tolist()):
+            if j < len(cibles):
+                retenus.append([inverseS[i], inverseC[j], meilleurs[(i, j)]])
+    return sorted(retenus, key=lambda c: (-c[2], str(c[0]), str(c[1])))
+
+
+def selectionner(resultats, seuil, k=None, unAUn=None):
+    """
+    Couples retenus parmi les (ressourceS, ressourceC, score) agrégés : score >= seuil, puis au plus k cibles
+    par source si k est donné, puis affectation un-à-un si unAUn vaut "glouton" ou "optimal".
+    """
+    if unAUn not in (None, "glouton", "optimal"):
+        raise ValueError("Affectation un-à-un inconnue : " + str(unAUn))
+    if k is not None:
+        couples = topK(resultats, k, seuil)
+    else:
+        couples = [[ressourceS, ressourceC, score] for ressourceS, ressourceC, score in resultats if score >= seuil]
+    if unAUn == "glouton":
+        return unAUnGlouton(couples)
+    if unAUn == "optimal":
+        return unAUnOptimal(couples)
+    return couples
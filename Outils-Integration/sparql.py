@@ -0,0 +1,239 @@
+import argparse
+import hashlib
+import http.client
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from rdflib import BNode, Literal, URIRef
+from rdflib.namespace import RDF
+
+from extraction import classeF22
+from instrumentation import instr
+
+dossierCache = os.environ.get("OUTILS_INTEGRATION_CACHE_SPARQL", ".cache_sparql")
+typeResultats = "application/sparql-results+json"
+
+
+def estPointAcces(chemin):
+    return str(chemin).startswith(("http://", "https://"))
+
+
+def requete(classe, proprietes, taillePage, decalage):
+    """Page des (sujet, propriété, objet) des ressources de la classe, dans un ordre total pour OFFSET"""
+    # Comme extraction.indexerProprietes : toutes les propriétés sauf rdf:type si aucune n'est donnée
+    if proprietes is None:
+        filtre = "FILTER (?p != <%s>)" % RDF.type
+    else:
+        filtre = "FILTER (?p IN (%s))" % ", ".join("<%s>" % p for p in sorted(proprietes))
+    return ("SELECT ?s ?p ?o WHERE { ?s a <%s> . ?s ?p ?o . %s } ORDER BY ?s ?p ?o LIMIT %d OFFSET %d"
+            % (classe, filtre, taillePage, decalage))
+
+
+def terme(valeur):
+    """Terme rdflib d'une liaison du format de résultats SPARQL JSON"""
+    if valeur["type"] == "uri":
+        return URIRef(valeur["value"])
+    if valeur["type"] == "bnode":
+        return BNode(valeur["value"])
+    if "xml:lang" in valeur:
+        return Literal(valeur["value"], lang=valeur["xml:lang"])
+    if "datatype" in valeur:
+        return Literal(valeur["value"], datatype=URIRef(valeur["datatype"]))
+    return Literal(valeur["value"])
+
+
+class PoolConnexions:
+    """Connexions HTTP persistantes (keep-alive) vers un point d'accès, réutilisées d'une requête à l'autre"""
+
+    def __init__(self, url, taille=4, delai=60):
+        self.url = urlsplit(url)
+        self.delai = delai
+        self.libres = queue.LifoQueue()
+        self.creees = 0
+        self.taille = taille
+        self.verrou = threading.Lock()
+
+    def _nouvelle(self):
+        classe = http.client.HTTPSConnection if self.url.scheme == "https" else http.client.HTTPConnection
+        return classe(self.url.hostname, self.url.port, timeout=self.delai)
+
+    def prendre(self):
+        with self.verrou:
+            if self.libres.empty() and self.creees < self.taille:
+                self.creees += 1
+                return self._nouvelle()
+        return self.libres.get()
+
+    def rendre(self, connexion):
+        self.libres.put(connexion)
+
+    def interroger(self, texte, essais=3):
+        """Envoie la requête en POST et renvoie le JSON des résultats ; une connexion fermée est rouverte"""
+        corps = urlencode({"query": texte})
+        entetes = {"Content-Type": "application/x-www-form-urlencoded", "Accept": typeResultats,
+                   "Connection": "keep-alive"}
+        connexion = self.prendre()
+        try:
+            for essai in range(essais):
+                try:
+                    connexion.request("POST", self.url.path or "/", corps, entetes)
+                    reponse = connexion.getresponse()
+                    donnees = reponse.read()
+                except (http.client.HTTPException, OSError):
+                    connexion.close()
+                    connexion = self._nouvelle()
+                    if essai == essais - 1:
+                        raise
+                    continue
+                if reponse.status != 200:
+                    raise OSError("point d'accès %s : HTTP %d %s" % (self.url.geturl(), reponse.status,
+                                                                    donnees[:200].decode("utf-8", "replace")))
+                return json.loads(donnees)
+        finally:
+            self.rendre(connexion)
+
+    def fermer(self):
+        while not self.libres.empty():
+            self.libres.get().close()
+
+
+def _cheminCache(url, texte):
+    return os.path.join(dossierCache, hashlib.sha256((url + "\n" + texte).encode()).hexdigest() + ".json")
+
+
+def page(pool, url, texte, cache=True):
+    """Résultats d'une page, relus du cache local s'ils y sont"""
+    chemin = _cheminCache(url, texte)
+    if cache and os.path.exists(chemin):
+        try:
+            with open(chemin) as f:
+                instr.compter("pagesSparqlCache")
+                return json.load(f)
+        except ValueError:
+            # Page de cache corrompue : on la redemande
+            pass
+    resultats = pool.interroger(texte)
+    instr.compter("pagesSparqlDistantes")
+    if cache:
+        os.makedirs(dossierCache, exist_ok=True)
+        temporaire = "%s.%d.%d.tmp" % (chemin, os.getpid(), threading.get_ident())
+        with open(temporaire, "w") as f:
+            json.dump(resultats, f)
+        os.replace(temporaire, chemin)
+    return resultats
+
+
+def extraireDistant(url, classe=classeF22, proprietes=None, taillePage=10000, connexions=4, cache=True):
+    """
+    Extraction {propriété: [(ressource, objet)]} des ressources de la classe sur un point d'accès SPARQL,
+    page par page (LIMIT/OFFSET sur un ordre total), connexions pages à la fois sur des connexions persistantes.
+    Renvoie (extraction, rapport) comme streaming.extraireEnFlux.
+    """
+    debut = time.perf_counter()
+    pool = PoolConnexions(url, connexions)
+    index = {}
+    nbPages = 0
+    decalage = 0
+    fini = False
+    try:
+        with ThreadPoolExecutor(max_workers=connexions) as executor:
+            # Vague de pages consécutives ; une page incomplète marque la fin des résultats
+            while not fini:
+                textes = [requete(classe, proprietes, taillePage, decalage + i * taillePage)
+                          for i in range(connexions)]
+                decalage += connexions * taillePage
+                for resultats in executor.map(lambda texte: page(pool, url, texte, cache), textes):
+                    if fini:
+                        break
+                    liaisons = resultats["results"]["bindings"]
+                    nbPages += 1
+                    for liaison in liaisons:
+                        index.setdefault(liaison["p"]["value"], []).append(
+                            (terme(liaison["s"]), terme(liaison["o"])))
+                    fini = len(liaisons) < taillePage
+    finally:
+        pool.fermer()
+    rapport = {
+        "pointAcces": url,
+        "pages": nbPages,
+        "triplesGardes": sum(len(v) for v in index.values()),
+        "ressources": len({s for couples in index.values() for s, o in couples}),
+        "duree": time.perf_counter() - debut,
+    }
+    return index, rapport
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+    # Point d'accès de test : requêtes en GET (?query=) ou en POST (formulaire ou application/sparql-query)
+    protocol_version = "HTTP/1.1"
+    graphe = None
+    verrou = None
+
+    def do_GET(self):
+        self._repondre(parse_qs(urlsplit(self.path).query).get("query", [None])[0])
+
+    def do_POST(self):
+        corps = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8")
+        if self.headers.get("Content-Type", "").startswith("application/sparql-query"):
+            self._repondre(corps)
+        else:
+            self._repondre(parse_qs(corps).get("query", [None])[0])
+
+    def _repondre(self, texte):
+        if texte is None:
+            statut, donnees, type = 400, b"parametre query manquant", "text/plain"
+        else:
+            try:
+                with self.verrou:
+                    resultats = self.graphe.query(texte).serialize(format="json")
+                statut, donnees, type = 200, resultats, typeResultats
+            except Exception as e:
+                statut, donnees, type = 400, str(e).encode("utf-8"), "text/plain"
+        self.send_response(statut)
+        self.send_header("Content-Type", type)
+        self.send_header("Content-Length", str(len(donnees)))
+        self.end_headers()
+        self.wfile.write(donnees)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serveur(graphe, hote="127.0.0.1", port=0):
+    """Point d'accès SPARQL local interrogeant un graphe rdflib (port 0 : port libre, lu dans server_address)"""
+    gestionnaire = type("Gestionnaire", (_Gestionnaire,), {"graphe": graphe, "verrou": threading.Lock()})
+    return ThreadingHTTPServer((hote, port), gestionnaire)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(description="Point d'accès SPARQL local servant des fichiers RDF (tests)")
+    parser.add_argument("fichiers", nargs="+")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=3030)
+    args = parser.parse_args(arguments)
+    import rdflib
+    from rdflib.util import guess_format
+
+    from loader import chargerGraphe
+
+    graphe = rdflib.Graph()
+    for fichier in args.fichiers:
+        graphe += chargerGraphe(fichier, guess_format(fichier) or "turtle")
+    service = serveur(graphe, args.hote, args.port)
+    print("http://%s:%d/sparql" % service.server_address, file=sys.stderr)
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
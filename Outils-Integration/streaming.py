@@ -0,0 +1,259 @@
+import pickle
+import re
+import time
+
+import rdflib as rdf
+from rdflib.namespace import RDF
+from rdflib.plugins.parsers.notation3 import RDFSink, SinkParser
+from rdflib.plugins.parsers.ntriples import W3CNTriplesParser
+from rdflib.util import guess_format
+
+from extraction import classeF22
+from instrumentation import picMemoire
+
+# Taille approximative (en caractères) des blocs Turtle donnés au parseur
+tailleBlocTurtle = 4 * 1024 * 1024
+
+# Lecture en deux passes : la première ne relève que les sujets typés, la seconde ne garde que leurs triplets.
+# Rien n'est mis en attente, même si les types suivent les autres triplets (N-Triples triés par prédicat...)
+deuxPasses = False
+
+
+def setDeuxPasses(actif):
+    global deuxPasses
+    deuxPasses = actif
+
+
+class FiltreFlux:
+    """
+    Reçoit les triplets un à un et ne garde que ceux dont le prédicat est sélectionné.
+    Les triplets d'un sujet déjà typé sont retenus dès leur lecture ; seuls ceux des sujets dont le type
+    n'a pas encore été lu sont mis en attente, jusqu'à ce type (ils sont écartés en fin de lecture s'il ne vient pas).
+    typees : sujets typés connus d'avance (première passe, voir extraireEnFlux) ; les autres sont alors
+    écartés dès leur lecture et rien n'est mis en attente.
+    """
+
+    def __init__(self, classe=classeF22, proprietes=None, typees=None):
+        self.classe = rdf.URIRef(classe)
+        self.proprietes = set(str(p) for p in proprietes) if proprietes is not None else None
+        self.complet = typees is not None
+        self.typees = set(typees) if typees is not None else set()
+        self.enAttente = {}
+        self.retenus = {}
+        self.lus = 0
+
+    def triple(self, s, p, o):
+        self.lus += 1
+        if p == RDF.type:
+            if o == self.classe and s not in self.typees:
+                self.typees.add(s)
+                for pAttente, oAttente in self.enAttente.pop(s, ()):
+                    self.retenir(s, pAttente, oAttente)
+            return
+        if self.proprietes is not None and str(p) not in self.proprietes:
+            return
+        if s in self.typees:
+            self.retenir(s, p, o)
+        elif not self.complet:
+            self.enAttente.setdefault(s, []).append((p, o))
+
+    def retenir(self, s, p, o):
+        self.retenus.setdefault(str(p), []).append((s, o))
+
+    def index(self):
+        """Renvoie l'extraction {propriété: [(ressource, objet)]} attendue par compare"""
+        return self.retenus
+
+
+class FiltreColonnes(FiltreFlux):
+    """
+    Comme FiltreFlux, mais les triplets retenus sont internés dans un magasin en colonnes
+    (colonnes.MagasinColonnes). Les triplets en attente ne le sont qu'une fois leur sujet typé : ceux qui sont
+    écartés en fin de lecture n'ont laissé aucune chaîne dans le magasin.
+    """
+
+    def __init__(self, magasin, cote, classe=classeF22, proprietes=None, typees=None):
+        super().__init__(classe, proprietes, typees)
+        self.magasin = magasin
+        self.cote = cote
+        self.gardes = 0
+
+    def retenir(self, s, p, o):
+        self.magasin.ajouter(self.cote, s, p, o)
+        self.gardes += 1
+
+    def terminer(self):
+        """Abandonne les triplets en attente (sujet sans le type attendu) ; renvoie le nombre de triplets gardés"""
+        self.enAttente = {}
+        return self.gardes
+
+
+class _GrapheFiltrant(rdf.Graph):
+    # Graphe factice : le parseur Turtle y ajoute ses triplets, qui partent directement au filtre
+    def __init__(self, filtre):
+        super().__init__()
+        self.filtre = filtre
+
+    def add(self, triple):
+        self.filtre.triple(*triple)
+        return self
+
+
+# Éléments lexicaux Turtle qui changent l'état du découpage : chaînes, IRI, commentaires, crochets, échappements
+_lexemesTurtle = re.compile(r'"""|\'\'\'|["\'<#\[\]()]|\\.')
+_finChaine = {
+    '"': re.compile(r'(?:[^"\\]|\\.)*"'),
+    "'": re.compile(r"(?:[^'\\]|\\.)*'"),
+    '"""': re.compile(r'(?:[^\\]|\\.)*?"""'),
+    "'''": re.compile(r"(?:[^\\]|\\.)*?'''"),
+}
+
+
+def _blocsTurtle(fichier, taille=None):
+    # Coupe uniquement en fin de ligne après un point terminant une instruction : hors chaîne (longue ou non),
+    # IRI, commentaire, liste ( ) et nœud anonyme [ ]. Si la ligne ne se lit pas (chaîne courte non fermée...),
+    # le reste du fichier part en un seul bloc : le parseur le lit entier et signale l'erreur éventuelle.
+    if taille is None:
+        taille = tailleBlocTurtle
+    bloc = []
+    longueur = 0
+    chaine = None
+    profondeur = 0
+    decoupable = True
+    for ligne in fichier:
+        bloc.append(ligne)
+        longueur += len(ligne)
+        if not decoupable:
+            continue
+        fin = len(ligne)
+        position = 0
+        while True:
+            if chaine is not None:
+                m = _finChaine[chaine].match(ligne, position)
+                if m is None:
+                    if len(chaine) == 1:
+                        decoupable = False
+                    break
+                chaine = None
+                position = m.end()
+                continue
+            m = _lexemesTurtle.search(ligne, position)
+            if m is None:
+                break
+            lexeme = m.group()
+            position = m.end()
+            if lexeme[0] == "\\":
+                continue
+            if lexeme[0] in "\"'":
+                chaine = lexeme
+            elif lexeme == "<":
+                position = ligne.find(">", position) + 1
+                if position == 0:
+                    decoupable = False
+                    break
+            elif lexeme == "#":
+                fin = m.start()
+                break
+            elif lexeme in "[(":
+                profondeur += 1
+            else:
+                profondeur -= 1
+        if decoupable and chaine is None and profondeur == 0 and longueur >= taille and \
+                ligne[:fin].rstrip().endswith("."):
+            yield "".join(bloc)
+            bloc = []
+            longueur = 0
+    if bloc:
+        yield "".join(bloc)
+
+
+def _lireTurtle(chemin, filtre):
+    graphe = _GrapheFiltrant(filtre)
+    parseur = SinkParser(RDFSink(graphe), baseURI=graphe.absolutize(chemin), turtle=True)
+    parseur.startDoc()
+    with open(chemin, "r", encoding="utf-8") as f:
+        for bloc in _blocsTurtle(f):
+            parseur.feed(bloc)
+    parseur.endDoc()
+
+
+def _lireNTriples(chemin, filtre):
+    with open(chemin, "rb") as f:
+        W3CNTriplesParser(sink=filtre).parse(f, bnode_context={})
+
+
+def _lire(chemin, filtre, format=None):
+    format = format or guess_format(chemin) or "turtle"
+    if format in ("nt", "ntriples", "nt11"):
+        _lireNTriples(chemin, filtre)
+    elif format == "turtle":
+        _lireTurtle(chemin, filtre)
+    else:
+        raise ValueError("Format non supporté en flux : " + format)
+    return format
+
+
+def _sujetsTypes(chemin, classe, format):
+    # Première passe : aucun triplet retenu, seulement les sujets du type attendu
+    filtre = FiltreFlux(classe, ())
+    _lire(chemin, filtre, format)
+    return filtre.typees
+
+
+def extraireEnFlux(chemin, classe=classeF22, proprietes=None, format=None, passes=None):
+    """
+    Lit un fichier N-Triples ou Turtle au fil de l'eau sans construire de graphe.
+    passes : 1 ou 2 (par défaut selon deuxPasses) ; en une passe, seuls les triplets des sujets dont le type
+    n'est pas encore lu restent en attente.
+    Renvoie (extraction, rapport) ; le rapport donne les triplets lus/gardés, la durée et le pic mémoire.
+    """
+    debut = time.perf_counter()
+    passes = passes or (2 if deuxPasses else 1)
+    typees = _sujetsTypes(chemin, classe, format) if passes == 2 else None
+    filtre = FiltreFlux(classe, proprietes, typees)
+    format = _lire(chemin, filtre, format)
+    index = filtre.index()
+    rapport = {
+        "fichier": chemin,
+        "format": format,
+        "passes": passes,
+        "triplesLus": filtre.lus,
+        "triplesGardes": sum(len(v) for v in index.values()),
+        "triplesEcartes": sum(len(v) for v in filtre.enAttente.values()),
+        "ressources": len(filtre.typees),
+        "duree": time.perf_counter() - debut,
+        "picMemoire": picMemoire(),
+    }
+    return index, rapport
+
+
+def extraireEnColonnes(chemin, magasin, cote, classe=classeF22, proprietes=None, format=None, passes=None):
+    """Lecture en flux ajoutée au magasin en colonnes pour le côté cote ("source" ou "cible") ; renvoie le rapport"""
+    debut = time.perf_counter()
+    passes = passes or (2 if deuxPasses else 1)
+    typees = _sujetsTypes(chemin, classe, format) if passes == 2 else None
+    filtre = FiltreColonnes(magasin, cote, classe, proprietes, typees)
+    format = _lire(chemin, filtre, format)
+    ecartes = sum(len(v) for v in filtre.enAttente.values())
+    gardes = filtre.terminer()
+    return {
+        "fichier": chemin,
+        "format": format,
+        "passes": passes,
+        "triplesLus": filtre.lus,
+        "triplesGardes": gardes,
+        "triplesEcartes": ecartes,
+        "ressources": len(filtre.typees),
+        "duree": time.perf_counter() - debut,
+        "picMemoire": picMemoire(),
+    }
+
+
+def sauverExtraction(index, chemin):
+    with open(chemin, "wb") as f:
+        pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def chargerExtraction(chemin):
+    with open(chemin, "rb") as f:
+        return pickle.load(f)
@@ -0,0 +1,82 @@
+import heapq
+import threading
+
+
+class Annulation(Exception):
+    """Levée dans le thread de liage quand l'utilisateur a demandé l'arrêt"""
+
+
+class Suivi:
+    """
+    Avancement d'un liage partagé entre le thread qui calcule et celui qui affiche.
+    Le thread de liage fait passer ses scores par suivre() ; l'interface lit etat() et peut annuler().
+    Les meilleurs scores sont ceux des couples de valeurs, provisoires tant que l'agrégation n'est pas faite.
+    """
+
+    def __init__(self, nbMeilleurs=10, pas=1000):
+        self.nbMeilleurs = nbMeilleurs
+        self.pas = pas
+        self.verrou = threading.Lock()
+        self.arret = threading.Event()
+        self.etape = None
+        self.scores = 0
+        self.estimes = 0
+        self.meilleurs = []
+        self.termine = False
+        # Nom affiché d'une ressource (les identifiants entiers d'un magasin en colonnes sont traduits en URI)
+        self.nommer = str
+
+    def annuler(self):
+        self.arret.set()
+
+    def verifier(self):
+        if self.arret.is_set():
+            raise Annulation()
+
+    def commencer(self, etape, estimes=None):
+        self.verifier()
+        with self.verrou:
+            self.etape = etape
+            if estimes is not None:
+                self.estimes = estimes
+
+    def suivre(self, scores):
+        """Relaie les scores (ressourceS, ressourceC, prop, score) en comptant et en gardant les meilleurs"""
+        n = 0
+        meilleurs = []
+        for score in scores:
+            yield score
+            ressourceS, ressourceC, prop, valeur = score
+            entree = (valeur, ressourceS, ressourceC, str(prop))
+            if len(meilleurs) < self.nbMeilleurs:
+                heapq.heappush(meilleurs, entree)
+            elif entree > meilleurs[0]:
+                heapq.heapreplace(meilleurs, entree)
+            n += 1
+            # Synchronisation par paquets pour ne pas payer le verrou à chaque score
+            if n == self.pas:
+                self._publier(n, meilleurs)
+                n = 0
+        self._publier(n, meilleurs)
+
+    def _publier(self, n, meilleurs):
+        with self.verrou:
+            self.scores += n
+            self.meilleurs = [(v, self.nommer(s), self.nommer(c), p) for v, s, c, p in meilleurs]
+        self.verifier()
+
+    def terminer(self, resultats):
+        """Remplace les scores provisoires par les meilleurs couples agrégés"""
+        with self.verrou:
+            self.meilleurs = heapq.nlargest(self.nbMeilleurs, ((v, str(s), str(c), None) for s, c, v in resultats))
+            self.termine = True
+
+    def etat(self):
+        with self.verrou:
+            return {
+                "etape": self.etape,
+                "scores": self.scores,
+                "estimes": self.estimes,
+                "meilleurs": sorted(self.meilleurs, reverse=True),
+                "termine": self.termine,
+            }
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Les modules d'Outils-Integration s'importent à plat, comme depuis lier.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
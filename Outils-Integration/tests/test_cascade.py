@@ -0,0 +1,64 @@
+import random
+
+import pytest
+from rdflib import Literal, URIRef
+
+import cascade
+import parseRdf
+from aggregation import Agregateur
+from measures import Jaro, QGrams
+
+titre = URIRef("http://erlangen-crm.org/current/P102_has_title")
+note = URIRef("http://erlangen-crm.org/current/P3_has_note")
+
+
+def extractions(graine=0):
+    alea = random.Random(graine)
+    mots = ["sonate", "sonata", "concerto", "quatuor", "quartet", "trio", "symphonie", "prelude", "fugue"]
+    resultat = []
+    for prop in (titre, note):
+        valeurs = [" ".join(alea.sample(mots, 2)) for _ in range(15)]
+        listSource = [(URIRef("http://example.org/s%d" % i), Literal(v))
+                      for i in range(25) for v in alea.sample(valeurs, alea.randint(1, 2))]
+        listCible = [(URIRef("http://example.org/c%d" % i), Literal(v))
+                     for i in range(20) for v in alea.sample(valeurs, alea.randint(1, 2))]
+        resultat.append((prop, listSource, listCible))
+    return resultat
+
+
+def agreges(scores, seuil):
+    return {(str(s), str(c)): v for s, c, v in Agregateur().consommer(scores).resultats() if v >= seuil}
+
+
+@pytest.mark.parametrize("couplesParLot", [1, 60, 100000])
+def test_cascade_par_lots_memes_couples(monkeypatch, couplesParLot):
+    monkeypatch.setattr(parseRdf, "couplesParLotCascade", couplesParLot)
+    donnees = extractions()
+    attendus = agreges(parseRdf.scorerCouples(donnees, [0, 4], seuilBatch=0.6), 0.6)
+    obtenus = agreges(parseRdf.scorerEnCascade(donnees, [0, 4], None, 0.6), 0.6)
+    assert attendus
+    assert obtenus.keys() == attendus.keys()
+    for couple, score in obtenus.items():
+        assert score == pytest.approx(attendus[couple])
+
+
+@pytest.mark.parametrize("mode", ["moyenne", "pondere", "max"])
+def test_bornes_incrementales_comme_recalculees(mode):
+    mesures = {"jaro": (Jaro, Jaro, cascade.majorant(Jaro)), "qGrams": (QGrams, QGrams, cascade.majorant(QGrams))}
+    poids = {str(titre): 2.0, str(note): 0.5}
+    paires = []
+    for prop, listSource, listCible in extractions(1):
+        for (rs, vs), (rc, vc) in zip(listSource, listCible):
+            paire = cascade.Paire(prop, (vs, vc), (str(vs), str(vc)), 0.0, len(mesures), mesures)
+            paire.majorants = {nom: m[2](str(vs), str(vc)) for nom, m in mesures.items()}
+            paire.couples = [(rs, rc), (rs, "tous")]
+            paires.append(paire)
+    bornes = cascade.Bornes(paires, mode, poids)
+    for paire in paires[::3]:
+        avant = paire.majorant()
+        paire.exact += mesures["jaro"][0](*paire.chaines)
+        del paire.majorants["jaro"]
+        bornes.ajuster(paire, avant)
+    recalculees = cascade.Bornes(paires, mode, poids)
+    for couple in recalculees.couples:
+        assert bornes.majorant(couple) == pytest.approx(recalculees.majorant(couple))
@@ -0,0 +1,19 @@
+import generateur
+import parseRdf
+
+
+def test_generer_part_du_jeu_fourni(tmp_path, monkeypatch):
+    # Ni le répertoire courant ni les graphes chargés par parseRdf n'entrent dans le jeu généré
+    monkeypatch.chdir(tmp_path)
+    un = generateur.generer(1, str(tmp_path / "x1"))
+    parseRdf.setFichierSource(str(tmp_path / "x1" / "source.nt"))
+    parseRdf.setFichierCible(str(tmp_path / "x1" / "cible.nt"))
+    try:
+        deux = generateur.generer(2, str(tmp_path / "x2"))
+    finally:
+        parseRdf.setFichierSource(generateur.sourceParDefaut)
+        parseRdf.setFichierCible(generateur.cibleParDefaut)
+    assert un["ressourcesSource"] > 0
+    assert deux["ressourcesSource"] == 2 * un["ressourcesSource"]
+    assert deux["ressourcesCible"] == 2 * un["ressourcesCible"]
+    assert deux["alignements"] == 2 * un["alignements"]
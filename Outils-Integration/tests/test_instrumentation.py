@@ -0,0 +1,39 @@
+import time
+
+from instrumentation import Instrumentation
+
+
+def test_reinitialiser_vide_les_compteurs():
+    instr = Instrumentation()
+    with instr.etape("comparaison"):
+        instr.compter("scores", 3)
+    instr.reinitialiser()
+    with instr.etape("comparaison"):
+        instr.compter("scores", 2)
+    assert instr.etapes["comparaison"]["appels"] == 1
+    assert instr.compteurs["scores"] == 2
+
+
+def test_reinitialiser_garde_l_echantillonnage_en_cours():
+    instr = Instrumentation(actif=True)
+    with instr.profil(intervalle=0.001):
+        instr.reinitialiser()
+        time.sleep(0.05)
+    assert "profil" in instr.rapport()
+    instr.reinitialiser()
+    assert "profil" not in instr.rapport()
+
+
+def test_fusionner_un_instantane():
+    instr = Instrumentation()
+    with instr.etape("lectureColonnes"):
+        instr.compter("octetsColonnes", 10)
+    chargement = instr.instantane()
+    instr.reinitialiser()
+    instr.mesurer("Jaro", max, 1, 2)
+    instr.fusionner(chargement)
+    assert set(instr.etapes) == {"lectureColonnes"}
+    assert instr.compteurs["octetsColonnes"] == 10
+    instr.actif = True
+    instr.mesurer("Jaro", max, 1, 2)
+    assert instr.etapes["mesure:Jaro"]["appels"] == 1
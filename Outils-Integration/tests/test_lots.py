@@ -0,0 +1,80 @@
+import random
+
+import pytest
+from rdflib import Literal, URIRef
+
+import parseRdf
+from aggregation import Agregateur
+
+titre = URIRef("http://erlangen-crm.org/current/P102_has_title")
+note = URIRef("http://erlangen-crm.org/current/P3_has_note")
+
+
+def extractions(graine=0):
+    # Deux propriétés : un couple peut n'avoir de score non nul que pour l'une d'elles
+    alea = random.Random(graine)
+    mots = ["sonate", "concerto", "quatuor", "trio", "symphonie", "prelude", "fugue", "suite", "messe", "xyz"]
+    resultat = []
+    for prop in (titre, note):
+        valeurs = [" ".join(alea.sample(mots, 2)) for _ in range(12)] + ["qqq", "www"]
+        listSource = [(URIRef("http://example.org/s%d" % i), Literal(v))
+                      for i in range(20) for v in alea.sample(valeurs, alea.randint(1, 3))]
+        listCible = [(URIRef("http://example.org/c%d" % i), Literal(v))
+                     for i in range(15) for v in alea.sample(valeurs, alea.randint(1, 2))]
+        resultat.append((prop, listSource, listCible))
+    return resultat
+
+
+def moyennesDenses(donnees, batchs):
+    # Moyenne sur tous les couples de littéraux, comme pour les autres mesures
+    sommes = {}
+    for prop, listSource, listCible in donnees:
+        for ressourceS, valueS in listSource:
+            for ressourceC, valueC in listCible:
+                acc = sommes.setdefault((str(ressourceS), str(ressourceC)), [0.0, 0])
+                acc[0] += batchs[prop].score(valueS, valueC)
+                acc[1] += 1
+    return {couple: somme / nombre for couple, (somme, nombre) in sommes.items()}
+
+
+def test_tfidf_en_lot_moyenne_sur_tous_les_couples_de_valeurs():
+    pytest.importorskip("sklearn")
+    donnees = extractions()
+    batchs = parseRdf.calculerLots(donnees, [7], 0.5)
+    manquants = parseRdf.CouplesManquants(donnees, batchs)
+    agreges = Agregateur(manquants=manquants).consommer(parseRdf.scorerCouples(donnees, [7], batchs=batchs))
+    attendus = moyennesDenses(donnees, batchs)
+    obtenus = {(str(s), str(c)): v for s, c, v in agreges.resultats()}
+    assert obtenus
+    for couple, score in obtenus.items():
+        assert score == pytest.approx(attendus[couple])
+    # Les couples absents n'ont aucun score non nul
+    assert all(attendus[couple] == 0.0 for couple in set(attendus) - set(obtenus))
+
+
+def test_tfidf_meme_resultat_au_seuil_et_au_seuil_nul():
+    pytest.importorskip("sklearn")
+    donnees = extractions(1)
+    resultats = []
+    for seuil in (0.0, 0.4):
+        batchs = parseRdf.calculerLots(donnees, [7], seuil)
+        agreges = Agregateur(manquants=parseRdf.CouplesManquants(donnees, batchs)).consommer(
+            parseRdf.scorerCouples(donnees, [7], seuilBatch=seuil, batchs=batchs))
+        resultats.append({(str(s), str(c)): v for s, c, v in agreges.resultats() if v >= 0.4})
+    assert resultats[0] == resultats[1]
+
+
+def test_minhash_ne_depasse_pas_jaccard_exact(monkeypatch):
+    pytest.importorskip("numpy")
+    donnees = extractions(2)
+    exacts = {(str(s), str(c)): v for s, c, v in
+              Agregateur().consommer(parseRdf.scorerCouples(donnees, [6])).resultats()}
+    monkeypatch.setattr(parseRdf, "permutationsMinHash", 64)
+    batchs = parseRdf.calculerLots(donnees, [6], 0.5)
+    agreges = Agregateur(manquants=parseRdf.CouplesManquants(donnees, batchs)).consommer(
+        parseRdf.scorerCouples(donnees, [6], seuilBatch=0.5, batchs=batchs))
+    approches = {(str(s), str(c)): v for s, c, v in agreges.resultats()}
+    assert approches
+    # Les couples de valeurs non joints comptent pour 0 : jamais au-dessus du score exact
+    for couple, score in approches.items():
+        assert score <= exacts[couple] + 1e-12
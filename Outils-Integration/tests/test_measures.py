@@ -0,0 +1,59 @@
+import random
+
+import pytest
+
+from measures import Jaro, JaroPlusieurs, JaroWinkler, QGrams, QGramsBorne
+
+
+def test_qgrams_chaines_identiques():
+    assert QGrams("abcdefghij", "abcdefghij") == 1.0
+    assert QGrams("abcd", "abcd") == 1.0
+    assert QGrams("Symphonie", "symphonie") == 1.0
+
+
+def test_qgrams_chaines_courtes():
+    assert QGrams("ab", "ab") == 1.0
+    assert QGrams("ab", "ac") == 0.0
+    assert QGrams("ab", "abcdef") == 0.0
+
+
+def test_qgrams_chaines_vides():
+    assert QGrams("", "") == 1.0
+    assert QGrams("", "abc") == 0.0
+    assert QGrams("abc", "") == 0.0
+
+
+def test_qgrams_repetitions():
+    # Les q-grammes répétés ne comptent qu'autant de fois qu'ils apparaissent des deux côtés
+    assert QGrams("aaaaa", "aaa") == 1.0
+    assert QGrams("aaaaaa", "aaab") == 0.5
+
+
+def test_qgrams_entre_0_et_1_et_bornee_exacte():
+    alea = random.Random(0)
+    for _ in range(2000):
+        s1 = "".join(alea.choice("abc ") for _ in range(alea.randint(0, 12)))
+        s2 = "".join(alea.choice("abc ") for _ in range(alea.randint(0, 12)))
+        score = QGrams(s1, s2)
+        assert 0.0 <= score <= 1.0
+        assert score == QGrams(s2, s1)
+        for seuil in (0.0, 0.5, 0.8):
+            assert QGramsBorne(s1, s2, seuil) == (score if score >= seuil else 0.0)
+
+
+def test_jaro_identique_a_nltk():
+    distance = pytest.importorskip("nltk.metrics.distance")
+    alea = random.Random(0)
+    for _ in range(3000):
+        s1 = "".join(alea.choice("abcAé ") for _ in range(alea.randint(0, 15)))
+        s2 = "".join(alea.choice("abcAé ") for _ in range(alea.randint(0, 15)))
+        assert Jaro(s1, s2) == distance.jaro_similarity(s1, s2)
+        assert JaroWinkler(s1, s2) == distance.jaro_winkler_similarity(s1, s2)
+
+
+def test_jaro_plusieurs_egal_aux_paires():
+    alea = random.Random(1)
+    valeurs = ["".join(alea.choice("abcd") for _ in range(alea.randint(0, 10))) for _ in range(50)]
+    for valeur in valeurs[:10]:
+        assert JaroPlusieurs(valeur, valeurs) == [Jaro(valeur, autre) for autre in valeurs]
+        assert JaroPlusieurs(valeur, valeurs, winkler=True) == [JaroWinkler(valeur, autre) for autre in valeurs]
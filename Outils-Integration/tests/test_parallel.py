@@ -0,0 +1,66 @@
+import random
+
+from rdflib import Literal, URIRef
+
+import parallel
+import parseRdf
+import selection
+from aggregation import Agregateur
+from instrumentation import instr
+
+prop = URIRef("http://erlangen-crm.org/current/P102_has_title")
+
+
+def extractions(nbSources=40, nbCibles=15, graine=0):
+    # Valeurs partagées entre ressources, dans un ordre différent d'une ressource à l'autre
+    alea = random.Random(graine)
+    mots = ["sonate", "concerto", "quatuor", "trio", "symphonie", "prelude", "fugue", "suite", "messe"]
+    valeurs = [" ".join(alea.sample(mots, 3)) for _ in range(25)]
+    listSource = [(URIRef("http://example.org/s%d" % i), Literal(v))
+                  for i in range(nbSources) for v in alea.sample(valeurs, 4)]
+    listCible = [(URIRef("http://example.org/c%d" % i), Literal(v))
+                 for i in range(nbCibles) for v in alea.sample(valeurs, 3)]
+    return [(prop, listSource, listCible)]
+
+
+def test_parallele_identique_a_la_serie():
+    if not parallel.forkDisponible():
+        return
+    donnees = extractions()
+    mesures = [0, 3, 4]
+    serie = list(Agregateur().consommer(parseRdf.scorerCouples(donnees, mesures)).resultats())
+    sources = {r for p, listSource, listCible in donnees for r, v in listSource}
+    enParallele = list(parallel.agregerEnParallele(
+        lambda lot: parseRdf.scorerCouples(donnees, mesures, sources=lot), sources, nbProcessus=2,
+        tailleLot=3).resultats())
+    assert sorted((str(s), str(c), v) for s, c, v in serie) == sorted((str(s), str(c), v) for s, c, v in enParallele)
+
+
+def test_resultats_par_lots_gardent_le_top_k():
+    donnees = extractions(graine=1)
+    mesures = [0, 4]
+    sources = {r for p, listSource, listCible in donnees for r, v in listSource}
+    agreges = Agregateur().consommer(parseRdf.scorerCouples(donnees, mesures)).resultats()
+    attendus = sorted(map(tuple, selection.topK(agreges, 2, 0.5)))
+    for nbProcessus in (1, 2):
+        lots = list(parallel.resultatsParLots(lambda lot: parseRdf.scorerCouples(donnees, mesures, sources=lot),
+                                              sources, nbProcessus=nbProcessus, tailleLot=7, k=2, seuil=0.5))
+        assert all(score >= 0.5 for s, c, score in lots)
+        assert max(sum(1 for s, c, v in lots if s == source) for source in sources) <= 4
+        assert sorted(map(tuple, selection.topK(lots, 2, 0.5))) == attendus
+
+
+def test_instrumentation_des_processus_fils_fusionnee():
+    if not parallel.forkDisponible():
+        return
+    donnees = extractions(nbSources=12)
+    sources = {r for p, listSource, listCible in donnees for r, v in listSource}
+    compteurs = []
+    for nbProcessus in (1, 2):
+        instr.reinitialiser()
+        with instr.etape("comparaison"):
+            parallel.agregerEnParallele(lambda lot: parseRdf.compterScores(parseRdf.scorerCouples(donnees, [0],
+                                                                                                  sources=lot)),
+                                        sources, nbProcessus=nbProcessus, tailleLot=5)
+        compteurs.append(instr.compteurs["scores"])
+    assert compteurs[0] == compteurs[1] > 0
@@ -0,0 +1,26 @@
+import profils
+
+
+def test_cache_borne_en_octets(monkeypatch):
+    profils.vider()
+    monkeypatch.setattr(profils, "profilsOctetsMax", 100000)
+    textes = ["note numéro %d " % i * 20 for i in range(200)]
+    for texte in textes:
+        profils.profil(texte)
+        assert profils.octets() <= profils.profilsOctetsMax
+    assert 0 < len(profils._profils) < len(textes)
+    # Les plus récents restent en cache
+    assert textes[-1] in profils._profils
+    assert profils.octets() == sum(profils.octetsProfil(p) for p in profils._profils.values())
+    profils.vider()
+    assert profils.octets() == 0
+
+
+def test_profil_plus_gros_que_la_borne_garde(monkeypatch):
+    profils.vider()
+    monkeypatch.setattr(profils, "profilsOctetsMax", 10)
+    p = profils.profil("une note bien plus longue que la borne")
+    assert profils.profil("une note bien plus longue que la borne") is p
+    profils.profil("autre")
+    assert list(profils._profils) == ["autre"]
+    profils.vider()
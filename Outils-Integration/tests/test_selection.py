@@ -0,0 +1,17 @@
+import pytest
+
+import selection
+
+
+def test_un_a_un_optimal_sans_couplage_complet():
+    pytest.importorskip("scipy")
+    # Deux sources ne peuvent viser que c1 : l'une reste sans cible
+    couples = [["s1", "c1", 0.9], ["s2", "c1", 0.8], ["s2", "c2", 0.7], ["s3", "c1", 0.6]]
+    assert selection.unAUnOptimal(couples) == [["s1", "c1", 0.9], ["s2", "c2", 0.7]]
+
+
+def test_un_a_un_optimal_prefere_la_somme_au_glouton():
+    pytest.importorskip("scipy")
+    couples = [["s1", "c1", 0.9], ["s1", "c2", 0.8], ["s2", "c1", 0.85]]
+    assert selection.unAUnGlouton(couples) == [["s1", "c1", 0.9]]
+    assert selection.unAUnOptimal(couples) == [["s2", "c1", 0.85], ["s1", "c2", 0.8]]
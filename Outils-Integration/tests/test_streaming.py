@@ -0,0 +1,103 @@
+import rdflib
+
+import colonnes
+import streaming
+
+classe = "http://example.org/F22"
+note = "http://example.org/note"
+titre = "http://example.org/titre"
+
+turtle = '''@prefix ex: <http://example.org/> .
+# Un commentaire qui finit par un point.
+
+ex:a a ex:F22 ;
+    ex:note """Première ligne .
+
+Deuxième paragraphe, après une ligne vide .
+""" ;
+    ex:titre "Titre # pas un commentaire ." .
+
+ex:b ex:note \'\'\'Chaîne longue .
+
+entre apostrophes\'\'\' ;
+    ex:titre ( "un ."
+
+        "deux" ) ;
+    ex:note [ ex:titre "anonyme ." ;
+
+        ex:note "imbriqué" ] .
+ex:b a ex:F22 .
+
+<http://example.org/c#x> ex:note "pas typé" .
+'''
+
+
+def normaliser(index):
+    return {p: sorted((str(s), "_" if isinstance(o, rdflib.BNode) else str(o)) for s, o in v)
+            for p, v in index.items()}
+
+
+def extractionRdflib(chemin, format):
+    graphe = rdflib.Graph().parse(chemin, format=format)
+    typees = set(graphe.subjects(rdflib.RDF.type, rdflib.URIRef(classe)))
+    index = {}
+    for s, p, o in graphe:
+        if s in typees and str(p) in (note, titre):
+            index.setdefault(str(p), []).append((s, o))
+    return index
+
+
+def test_blocs_turtle_coupes_entre_instructions(tmp_path):
+    chemin = tmp_path / "donnees.ttl"
+    chemin.write_text(turtle, encoding="utf-8")
+    with open(chemin, encoding="utf-8") as f:
+        blocs = list(streaming._blocsTurtle(f, taille=1))
+    assert "".join(blocs) == turtle
+    # Chaque bloc finit sur une instruction complète
+    for bloc in blocs:
+        assert bloc.rstrip().endswith(".")
+    assert len(blocs) == 5
+
+
+def test_flux_turtle_petits_blocs_comme_rdflib(tmp_path, monkeypatch):
+    chemin = tmp_path / "donnees.ttl"
+    chemin.write_text(turtle, encoding="utf-8")
+    monkeypatch.setattr(streaming, "tailleBlocTurtle", 1)
+    attendu = normaliser(extractionRdflib(str(chemin), "turtle"))
+    for passes in (1, 2):
+        index, rapport = streaming.extraireEnFlux(str(chemin), classe, [note, titre], passes=passes)
+        assert normaliser(index) == attendu
+        assert rapport["passes"] == passes
+
+
+def test_flux_ntriples_type_apres_les_triplets(tmp_path):
+    chemin = tmp_path / "donnees.nt"
+    chemin.write_text(
+        '<http://example.org/a> <%s> "n1" .\n'
+        '<http://example.org/b> <%s> "n2" .\n'
+        '<http://example.org/a> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <%s> .\n'
+        '<http://example.org/a> <%s> "n3" .\n' % (note, note, classe, note), encoding="utf-8")
+    index, rapport = streaming.extraireEnFlux(str(chemin), classe, [note])
+    assert normaliser(index) == {note: [("http://example.org/a", "n1"), ("http://example.org/a", "n3")]}
+    assert rapport["triplesEcartes"] == 1
+    index, rapport = streaming.extraireEnFlux(str(chemin), classe, [note], passes=2)
+    assert normaliser(index) == {note: [("http://example.org/a", "n1"), ("http://example.org/a", "n3")]}
+    assert rapport["triplesEcartes"] == 0
+
+
+def test_colonnes_n_internent_pas_les_triplets_ecartes(tmp_path):
+    chemin = tmp_path / "donnees.nt"
+    chemin.write_text(
+        '<http://example.org/a> <%s> "n1" .\n'
+        '<http://example.org/b> <%s> "n2" .\n'
+        '<http://example.org/a> <http://www.w3.org/1999/02/22-rdf-syntax-ns#type> <%s> .\n'
+        '<http://example.org/a> <%s> "n3" .\n' % (note, note, classe, note), encoding="utf-8")
+    for passes in (1, 2):
+        magasin = colonnes.MagasinColonnes()
+        rapport = streaming.extraireEnColonnes(str(chemin), magasin, "source", classe, [note], passes=passes)
+        assert rapport["triplesGardes"] == 2
+        assert rapport["triplesEcartes"] == (1 if passes == 1 else 0)
+        assert sorted((magasin.ressources[s], str(v)) for s, v in magasin.extraction(note, "source")) == \
+            [("http://example.org/a", "n1"), ("http://example.org/a", "n3")]
+        assert magasin.lexiques.chercher("n2") is None
+        assert magasin.ressources.chercher("http://example.org/b") is None
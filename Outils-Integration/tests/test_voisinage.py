@@ -0,0 +1,43 @@
+from rdflib import Literal, URIRef
+
+import parseRdf
+import voisinage
+
+prop = URIRef("http://example.org/p")
+
+
+def ressources(cote, valeurs):
+    return [(URIRef("http://example.org/%s%d" % (cote, i)), Literal(v)) for i, v in enumerate(valeurs)]
+
+
+def scores(typeValeur, listSource, listCible, candidats=None):
+    return sorted((str(s), str(c), res) for s, c, p, res in
+                  parseRdf.scorerTypes(prop, listSource, listCible, typeValeur, candidats))
+
+
+def tousLesCouples(listSource, listCible):
+    return parseRdf.grouperCandidats({(s, c) for s, v in listSource for c, w in listCible})
+
+
+def test_scores_types_identiques_avec_et_sans_blocage(monkeypatch):
+    monkeypatch.setitem(parseRdf.tolerances, "date", 2)
+    monkeypatch.setitem(parseRdf.tolerances, "nombre", 1)
+    cas = {
+        "date": (ressources("s", ["1730", "1913-04", "1614/1619", "1800", "inconnue"]),
+                 ressources("c", ["1731", "1913", "1620", "1950", "1728-12-31"])),
+        "nombre": (ressources("s", ["4", "Op. 12", "7,5", "100"]),
+                   ressources("c", ["5", "12", "8", "3", "40"])),
+    }
+    for typeValeur, (listSource, listCible) in cas.items():
+        sansBlocage = scores(typeValeur, listSource, listCible)
+        assert sansBlocage
+        assert scores(typeValeur, listSource, listCible, tousLesCouples(listSource, listCible)) == sansBlocage
+        # Le blocage ne fait que retirer des couples, sans changer les scores des autres
+        candidats = parseRdf.grouperCandidats({(s, c) for s, v in listSource[:2] for c, w in listCible})
+        avecBlocage = scores(typeValeur, listSource, listCible, candidats)
+        assert avecBlocage == [x for x in sansBlocage if URIRef(x[0]) in candidats]
+
+
+def test_comparer_hors_tolerance():
+    assert voisinage.comparer("nombre", "4", "5", 1) == 0.5
+    assert voisinage.comparer("nombre", "4", "9", 1) is None
@@ -0,0 +1,158 @@
+import bisect
+import calendar
+import datetime
+import re
+
+from rdflib import Literal, URIRef
+
+# Types de littéraux reconnus d'après leur datatype quand la propriété n'est pas déclarée
+W3CDTF = URIRef("http://purl.org/dc/terms/W3CDTF")
+xsd = "http://www.w3.org/2001/XMLSchema#"
+typesDatatype = {
+    W3CDTF: "date",
+    URIRef(xsd + "date"): "date",
+    URIRef(xsd + "gYear"): "date",
+    URIRef(xsd + "gYearMonth"): "date",
+    URIRef(xsd + "integer"): "nombre",
+    URIRef(xsd + "int"): "nombre",
+    URIRef(xsd + "decimal"): "nombre",
+    URIRef(xsd + "float"): "nombre",
+    URIRef(xsd + "double"): "nombre",
+}
+
+joursParAn = 365.2425
+motifNombre = re.compile(r"\d+(?:[.,]\d+)?")
+motifCatalogue = re.compile(r"\s*([^\d]*?)[\s.:]*(\d+)")
+motifDate = re.compile(r"(\d{4})(?:-?(\d{2}))?(?:-?(\d{2}))?$")
+
+
+def normaliserNombre(valeur):
+    """"4", "Op. 4", "12,5" -> intervalle réduit à un point"""
+    m = motifNombre.search(valeur)
+    if m is None:
+        return None
+    n = float(m.group(0).replace(",", "."))
+    return n, n, None
+
+
+def normaliserCatalogue(valeur):
+    """"RV 728", "BWV 1046a", "K. 525" -> numéro, avec le nom du catalogue comme clé de regroupement"""
+    m = motifCatalogue.match(valeur)
+    if m is None:
+        return None
+    nom = re.sub(r"[\s.]", "", m.group(1)).upper()
+    n = float(m.group(2))
+    return n, n, nom
+
+
+def _borneDate(texte, fin):
+    m = motifDate.match(texte.strip())
+    if m is None:
+        return None
+    annee = int(m.group(1))
+    mois = int(m.group(2)) if m.group(2) else (12 if fin else 1)
+    if not 1 <= mois <= 12:
+        return None
+    dernierJour = calendar.monthrange(annee, mois)[1]
+    # Une date partielle couvre toute l'année ou tout le mois ; un jour invalide (31 avril) est ramené au dernier
+    jour = min(int(m.group(3)), dernierJour) if m.group(3) else (dernierJour if fin else 1)
+    if jour < 1:
+        return None
+    return (datetime.date(annee, mois, jour).toordinal() - 1) / joursParAn + 1
+
+
+def normaliserDate(valeur):
+    """"1730", "1913-04", "1614/1619", "16190101/16191231" -> intervalle en années"""
+    parties = valeur.split("/")
+    if len(parties) > 2:
+        return None
+    debut = _borneDate(parties[0], False)
+    fin = _borneDate(parties[-1], True)
+    if debut is None or fin is None or fin < debut:
+        return None
+    return debut, fin, None
+
+
+normaliseurs = {"nombre": normaliserNombre, "catalogue": normaliserCatalogue, "date": normaliserDate}
+
+
+def typeDatatype(listSource, listCible):
+    """Type commun des littéraux des deux côtés d'après leur datatype, None s'ils n'en ont pas tous un reconnu"""
+    types = {typesDatatype.get(v.datatype) if isinstance(v, Literal) else None
+             for listValues in (listSource, listCible) for r, v in listValues}
+    if len(types) == 1:
+        return types.pop()
+    return None
+
+
+def ecart(a, b):
+    """Écart entre deux intervalles normalisés, 0 s'ils se chevauchent ; None si leurs clés diffèrent"""
+    if a[2] != b[2]:
+        return None
+    return max(0.0, b[0] - a[1], a[0] - b[1])
+
+
+def score(d, tolerance):
+    """1 pour des valeurs compatibles, décroissant avec l'écart jusqu'à la tolérance, None au-delà"""
+    if d is None or d > tolerance:
+        return None
+    return 1.0 - d / (tolerance + 1)
+
+
+def comparer(typeValeur, valeurS, valeurC, tolerance=0):
+    """Score d'un couple de valeurs, None hors tolérance comme dans voisins"""
+    a = normaliseurs[typeValeur](str(valeurS))
+    b = normaliseurs[typeValeur](str(valeurC))
+    if a is None or b is None:
+        return None
+    return score(ecart(a, b), tolerance)
+
+
+def normaliserListe(listValues, normaliser):
+    """Groupe les (ressource, valeur) par clé de regroupement : {clé: [(début, fin, ressource, valeur)]}"""
+    normalisees = {}
+    groupes = {}
+    for ressource, valeur in listValues:
+        if not isinstance(valeur, Literal):
+            continue
+        texte = str(valeur)
+        if texte not in normalisees:
+            normalisees[texte] = normaliser(texte)
+        n = normalisees[texte]
+        if n is not None:
+            groupes.setdefault(n[2], []).append((n[0], n[1], ressource, valeur))
+    return groupes
+
+
+def voisins(listSource, listCible, typeValeur, tolerance=0, fenetre=None):
+    """
+    Voisinage trié : chaque côté est trié par valeur normalisée et chaque valeur source n'est comparée
+    qu'aux valeurs cibles à moins de tolerance (au plus les fenetre plus proches si fenetre est donné).
+    Génère (ressourceS, valeurS, ressourceC, valeurC, score) ; coût O(n log n) plus le nombre de couples voisins.
+    """
+    normaliser = normaliseurs[typeValeur]
+    groupesS = normaliserListe(listSource, normaliser)
+    groupesC = normaliserListe(listCible, normaliser)
+    # Clés dans un ordre fixe : l'ordre des scores d'un couple ne dépend pas des sources traitées
+    for cle in sorted(groupesS, key=lambda c: (c is not None, c or "")):
+        elementsS = groupesS[cle]
+        elementsC = groupesC.get(cle)
+        if not elementsC:
+            continue
+        elementsC.sort(key=lambda e: e[0])
+        debuts = [e[0] for e in elementsC]
+        # Un intervalle cible peut commencer avant la fenêtre et la recouvrir : on élargit de sa longueur maximale
+        longueurMax = max(e[1] - e[0] for e in elementsC)
+        for debutS, finS, ressourceS, valeurS in elementsS:
+            i = bisect.bisect_left(debuts, debutS - tolerance - longueurMax)
+            j = bisect.bisect_right(debuts, finS + tolerance)
+            proches = []
+            for debutC, finC, ressourceC, valeurC in elementsC[i:j]:
+                d = max(0.0, debutC - finS, debutS - finC)
+                if d <= tolerance:
+                    proches.append((d, ressourceC, valeurC))
+            if fenetre is not None and len(proches) > fenetre:
+                proches.sort(key=lambda p: (p[0], str(p[1])))
+                proches = proches[:fenetre]
+            for d, ressourceC, valeurC in proches:
+                yield ressourceS, valeurS, ressourceC, valeurC, score(d, tolerance)